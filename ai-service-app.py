@@ -0,0 +1,242 @@
+"""HTTP entry point for the SkillSwap AI recommendation service."""
+import logging
+import os
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request
+
+from batch import recommend_batch
+from db import connect
+from events import ChangeFeed
+from geo import MAX_RADIUS_KM
+from minhash import MinHashLSH
+from model import RecommenderModel
+from snapshot import (
+    SnapshotError, builder_lock, current_snapshot, open_snapshot, snapshot_built_at, write_snapshot,
+)
+
+REFRESH_INTERVAL = int(os.environ.get('MODEL_REFRESH_INTERVAL', 300))
+LSH_MIN_USERS = int(os.environ.get('LSH_MIN_USERS', 100000))
+LSH_BANDS = int(os.environ.get('LSH_BANDS', 64))
+LSH_ROWS = int(os.environ.get('LSH_ROWS', 2))
+ALS_FACTORS = int(os.environ.get('ALS_FACTORS', 32))
+ALS_ITERATIONS = int(os.environ.get('ALS_ITERATIONS', 10))
+ALS_WORKERS = int(os.environ.get('ALS_WORKERS', os.cpu_count()))
+# Directory of model snapshots shared by the workers on a host; unset to
+# build each worker's model from MySQL
+MODEL_PATH = os.environ.get('MODEL_PATH')
+SNAPSHOT_VERIFY = os.environ.get('SNAPSHOT_VERIFY', '1') != '0'
+MAX_LIMIT = 100
+MAX_BATCH_USERS = 10000
+
+logger = logging.getLogger('ai-recommender')
+
+_feed = ChangeFeed()
+
+
+def _build_model():
+    with connect() as conn:
+        return RecommenderModel.load(
+            conn, lsh_min_users=LSH_MIN_USERS, lsh_bands=LSH_BANDS, lsh_rows=LSH_ROWS,
+            factor_options={'factors': ALS_FACTORS, 'iterations': ALS_ITERATIONS, 'workers': ALS_WORKERS},
+        )
+
+
+def _replayable(path):
+    """True if the change events since ``path`` was built can be replayed onto it."""
+    if path is None:
+        return False
+    try:
+        return _feed.covers(snapshot_built_at(path))
+    except SnapshotError:
+        # Written by a release with another snapshot format
+        return False
+
+
+def _snapshot_stale(path):
+    return not _replayable(path) or time.time() - snapshot_built_at(path) >= REFRESH_INTERVAL
+
+
+def _load_snapshot():
+    """Map the current snapshot, building a new one first if it is stale.
+
+    Only the worker holding the builder lock queries MySQL; the others keep
+    serving the snapshot they have while it writes a new one. A worker with
+    no model yet waits for it too if the events since the current snapshot
+    can no longer be replayed.
+    """
+    os.makedirs(MODEL_PATH, exist_ok=True)
+    path = current_snapshot(MODEL_PATH)
+    if _snapshot_stale(path):
+        wait = _feed.model is None and not _replayable(path)
+        with builder_lock(MODEL_PATH, wait=wait) as acquired:
+            if acquired and _snapshot_stale(current_snapshot(MODEL_PATH)):
+                started = time.time()
+                write_snapshot(_build_model(), MODEL_PATH, built_at=started)
+        path = current_snapshot(MODEL_PATH)
+    current = _feed.model
+    if current is not None and current.snapshot is not None and current.snapshot.path == path:
+        return current
+    if current is not None and not _replayable(path):
+        # Missing events; keep the live model until a new snapshot is written
+        return current
+    return open_snapshot(path, verify=SNAPSHOT_VERIFY)
+
+
+def load_model():
+    """Load the model from a snapshot or MySQL and swap it in.
+
+    Change events published after its data was read are replayed onto it
+    before the swap, so no update is lost between reloads.
+    """
+    if MODEL_PATH:
+        model = _load_snapshot()
+        if model is _feed.model:
+            return model
+        since = model.snapshot.built_at
+    else:
+        since = time.time()
+        model = _build_model()
+    _feed.install(model, since=since)
+    logger.info('Loaded model %s (%d users x %d skills)', model.version, *model.matrix.shape)
+    return model
+
+
+def _as_int(value):
+    """A JSON integer, or a string holding one, as an int; None for anything else."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(REFRESH_INTERVAL)
+        try:
+            load_model()
+        except Exception:
+            logger.exception('Model refresh failed')
+
+
+def create_app():
+    logging.basicConfig(level=logging.INFO)
+    app = Flask(__name__)
+
+    @app.get('/health')
+    def health():
+        model = _feed.model
+        if model is None:
+            return jsonify({'status': 'LOADING'}), 503
+        users, skills = model.matrix.shape
+        return jsonify({
+            'status': 'OK',
+            'model_version': model.version,
+            'users': users,
+            'skills': skills,
+            'applied_events': model.applied_events,
+            'snapshot_age_seconds': round(model.snapshot.age, 1) if model.snapshot else None,
+        })
+
+    @app.get('/recommendations/<int:user_id>')
+    def recommendations(user_id):
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        limit = min(request.args.get('limit', 5, type=int), MAX_LIMIT)
+        within_km = request.args.get('within_km', type=float)
+        boost_km = request.args.get('boost_km', type=float)
+        for radius in (within_km, boost_km):
+            if radius is not None and not 0 < radius <= MAX_RADIUS_KM:
+                return jsonify({'error': f'Radius must be between 0 and {MAX_RADIUS_KM} km'}), 400
+        return jsonify({
+            'recommendations': model.recommender.get_recommendations(user_id, limit, within_km, boost_km),
+            'model_version': model.version,
+        })
+
+    @app.post('/recommendations/batch')
+    def recommendations_batch():
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        body = request.get_json(silent=True) or {}
+        user_ids = body.get('user_ids')
+        if not isinstance(user_ids, list) or len(user_ids) > MAX_BATCH_USERS:
+            return jsonify({'error': f'user_ids must be a list of at most {MAX_BATCH_USERS} ids'}), 400
+        limit = _as_int(body.get('limit', 5))
+        if limit is None:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, MAX_LIMIT))
+        # Parse every id up front: once streaming starts the 200 has been sent
+        parsed = [_as_int(user_id) for user_id in user_ids]
+        if None in parsed:
+            bad = user_ids[parsed.index(None)]
+            return jsonify({'error': f'user_ids must be integers, got {bad!r}'}), 400
+        lines = recommend_batch(model.recommender, parsed, limit)
+        return Response((line + '\n' for line in lines), mimetype='application/x-ndjson')
+
+    @app.get('/matches/<int:user_id>')
+    def matches(user_id):
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        limit = request.args.get('limit', type=int)
+        return jsonify({'matches': model.reciprocal.reciprocal_matches(user_id, limit)})
+
+    @app.get('/trending')
+    def trending():
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        limit = min(request.args.get('limit', 10, type=int), MAX_LIMIT)
+        return jsonify({'trending': model.trending.top(limit)})
+
+    @app.get('/categories')
+    def categories():
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        return jsonify({'categories': model.recommender.categories.summary(), 'model_version': model.version})
+
+    @app.get('/autocomplete')
+    def autocomplete():
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        limit = min(request.args.get('limit', 10, type=int), MAX_LIMIT)
+        return jsonify({'skills': model.autocomplete.search(request.args.get('q', ''), limit)})
+
+    @app.get('/similar/<int:user_id>')
+    def similar(user_id):
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        limit = min(request.args.get('limit', 10, type=int), MAX_LIMIT)
+        index = model.lsh
+        if index is None or request.args.get('exact', type=int):
+            index = model.bitsets
+        return jsonify({
+            'similar': [
+                {'user_id': other_id, 'similarity': similarity}
+                for other_id, similarity in index.similar_users(user_id, limit)
+            ],
+            'approximate': isinstance(index, MinHashLSH),
+            'model_version': model.version,
+        })
+
+    # Subscribe first, so events published while the model loads are replayed
+    _feed.start()
+    load_model()
+    threading.Thread(target=_refresh_loop, daemon=True).start()
+    return app
+
+
+if __name__ == '__main__':
+    create_app().run(host='0.0.0.0', port=int(os.environ.get('PORT', 9000)))
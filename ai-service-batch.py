@@ -0,0 +1,128 @@
+"""Recommendations for many users at once, streamed as JSON Lines.
+
+Used by the email digest and "weekly matches" jobs. User ids come from a
+file, stdin or every active user in the model; they are read lazily in
+chunks and fanned out over a fork-based process pool that shares the loaded
+SkillRecommender copy-on-write. Output keeps the input order, one line per
+user:
+
+    {"user_id": 7, "recommendations": [...]}
+
+    python batch.py --all --limit 10 --workers 8 > digest.jsonl
+    mysql -N -e 'SELECT id FROM users' | python batch.py --users - > out.jsonl
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import sys
+import time
+from itertools import islice
+
+from collaborative import TradeFactors
+from db import connect
+from matrix import SkillMatrix
+from recommender import SkillRecommender
+from related import RelatedSkills
+
+CHUNK_SIZE = 512
+PROGRESS_EVERY = 50000
+
+logger = logging.getLogger('batch')
+
+
+def chunked(user_ids, size=CHUNK_SIZE):
+    """Group an iterable of user ids into lists without materialising it."""
+    user_ids = iter(user_ids)
+    while True:
+        chunk = list(islice(user_ids, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _recommend_chunk(recommender, user_ids, limit):
+    return [
+        json.dumps({'user_id': user_id, 'recommendations': recommender.get_recommendations(user_id, limit)})
+        for user_id in user_ids
+    ]
+
+
+# Worker state for the process pool (inherited through fork)
+_recommender = None
+
+
+def _chunk_worker(args):
+    return _recommend_chunk(_recommender, *args)
+
+
+def recommend_batch(recommender, user_ids, limit=5, workers=1, chunk_size=CHUNK_SIZE):
+    """Yield one JSON line per user id, in input order."""
+    chunks = chunked(user_ids, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _recommend_chunk(recommender, chunk, limit)
+        return
+    global _recommender
+    _recommender = recommender
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        for lines in pool.imap(_chunk_worker, ((chunk, limit) for chunk in chunks)):
+            yield from lines
+
+
+def read_user_ids(stream):
+    """Parse one user id per line, skipping blanks."""
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield int(line.split()[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream recommendations for many users as JSON Lines')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--all', action='store_true', help='every active user in the model')
+    source.add_argument('--users', metavar='FILE', help="file with one user id per line, '-' for stdin")
+    parser.add_argument('--limit', type=int, default=5, help='recommendations per user')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='user ids per pool task')
+    parser.add_argument('--output', metavar='FILE', help='write here instead of stdout')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    started = time.perf_counter()
+    with connect() as conn:
+        matrix = SkillMatrix.load(conn)
+        factors = TradeFactors.load(conn, matrix, workers=args.workers)
+        related = RelatedSkills.load(conn, matrix)
+    recommender = SkillRecommender(matrix, factors, related)
+    logger.info('Loaded %d users x %d skills in %.1fs', *matrix.shape, time.perf_counter() - started)
+
+    source = None
+    if args.all:
+        user_ids = matrix.user_ids.tolist()
+    else:
+        source = sys.stdin if args.users == '-' else open(args.users)
+        user_ids = read_user_ids(source)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    started = time.perf_counter()
+    count = 0
+    try:
+        for line in recommend_batch(recommender, user_ids, args.limit, args.workers, args.chunk_size):
+            out.write(line + '\n')
+            count += 1
+            if count % PROGRESS_EVERY == 0:
+                logger.info('%d users, %.0f users/s', count, count / (time.perf_counter() - started))
+    finally:
+        for stream in (source, out):
+            if stream not in (None, sys.stdin, sys.stdout):
+                stream.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info('Recommended for %d users in %.1fs (%.0f users/s, %d workers)',
+                count, elapsed, count / elapsed if elapsed else 0, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,418 @@
+"""Benchmark the recommendation engines on synthetic populations.
+
+Populations are generated rather than read from MySQL: skills fall into
+the categories of the seed data in database-init.sql, skill popularity is
+Zipfian, each user lists a handful of offered and sought skills, and a
+trade history with reviews drives ratings, trade counts and trending.
+Most users live around one of a few hundred city centres of Zipfian size;
+the rest have no known location. Completed trades, with the requester's
+review where there is one, are the interactions the trade factors are
+fitted to. Skill descriptions mix words of the skill's category with words
+shared by a small family of skills across categories.
+
+For every population size the suite records build time and peak RSS for
+each engine (for ``collaborative``, the ALS training time), the bytes per
+user_skills row held by the matrix planes, then latency percentiles and
+throughput for sampled queries. Swap cycles are searched on the
+population's own trade graph, whose edge counts and size are recorded
+with the search times. Served recommendations are checked against a
+brute-force ranking of every user_skills row for a sample of users.
+
+Results go to a JSON file so runs can be compared between releases:
+
+    python benchmark.py --users 10000 --users 100000 --output results.json
+    python benchmark.py --users 1000000 --engines recommendations trending
+    python benchmark.py --users 100000 --engines collaborative --workers 8
+    python benchmark.py --users 100000 --engines related
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import platform
+import resource
+import time
+
+import numpy as np
+
+from batch import recommend_batch
+from collaborative import TradeFactors
+from cycles import find_cycles, trade_graph
+from geo import haversine_km
+from matrix import PROFICIENCY_LEVELS, SKILL_TYPES, SkillMatrix
+from minhash import MinHashLSH
+from reciprocal import ReciprocalIndex
+from recommender import (
+    CATEGORY_SCORE, COLLABORATIVE_WEIGHT, EXACT_OFFER_SCORE, EXACT_SEEK_SCORE, MIN_AFFINITY, PROXIMITY_SCORE,
+    RELATED_SCORE, SkillRecommender, bonus_scores,
+)
+from related import RelatedSkills, build_related
+from similarity import SkillBitsets
+from trending import TrendingSkills
+
+SEED_CATEGORIES = (
+    'Design', 'Programming', 'Analytics', 'Marketing', 'Visual Arts', 'Media',
+    'Music', 'Languages', 'Lifestyle', 'Health', 'Creative',
+)
+ENGINES = (
+    'recommendations', 'nearby', 'collaborative', 'related', 'batch', 'trending', 'similar', 'similar_lsh', 'matches', 'cycles',
+)
+DAY = 86400
+NEARBY_KM = 25
+
+
+def synthetic_locations(users, rng, cities=300, located=0.8, spread_km=15):
+    """Latitude and longitude per user, NaN for users without a location."""
+    lat_centres = np.degrees(np.arcsin(rng.uniform(-0.8, 0.9, size=cities)))
+    lon_centres = rng.uniform(-180, 180, size=cities)
+    sizes = 1 / np.arange(1, cities + 1)
+    city = rng.choice(cities, size=users, p=sizes / sizes.sum())
+    spread = spread_km / 111.2
+    lat = np.clip(lat_centres[city] + rng.normal(0, spread, users), -89.9, 89.9)
+    lon = (lon_centres[city] + rng.normal(0, spread, users) / np.cos(np.radians(lat)) + 180) % 360 - 180
+    unknown = rng.random(users) >= located
+    lat[unknown] = lon[unknown] = np.nan
+    return lat, lon
+
+
+def synthetic_population(users, skills=None, skills_per_user=5, trades_per_user=2, zipf=1.1, seed=0, now=None):
+    """Generate tables shaped like the MySQL query results.
+
+    Returns a dict with ``users`` (id, username, full_name, latitude,
+    longitude), ``skills``, ``user_skills`` (id, user_id,
+    skill_id, skill_type, proficiency_level), ``ratings``, ``trade_counts``,
+    ``trades`` (id, requester_skill_id, provider_skill_id, created_at) and
+    ``interactions`` (user_id, skill_id, rating given or None).
+    """
+    rng = np.random.default_rng(seed)
+    now = time.time() if now is None else now
+    skills = skills or max(200, users // 50)
+
+    categories = rng.choice(len(SEED_CATEGORIES), size=skills)
+    skill_rows = [(i + 1, f'{SEED_CATEGORIES[c]} skill {i + 1}', SEED_CATEGORIES[c]) for i, c in enumerate(categories)]
+    lat, lon = synthetic_locations(users, rng)
+    user_rows = [
+        (i + 1, f'user{i + 1}', f'User {i + 1}', None if y != y else y, None if x != x else x)
+        for i, (y, x) in enumerate(zip(lat.tolist(), lon.tolist()))
+    ]
+
+    # Zipfian popularity over a random permutation of skills
+    popularity = 1 / np.arange(1, skills + 1) ** zipf
+    popularity = popularity[rng.permutation(skills)] / popularity.sum()
+    counts = rng.poisson(skills_per_user - 1, size=users) + 1
+    owner = np.repeat(np.arange(1, users + 1), counts)
+    skill = rng.choice(skills, size=len(owner), p=popularity) + 1
+    kind = rng.integers(0, 2, size=len(owner))
+    _, unique = np.unique(np.stack([owner, skill, kind]), axis=1, return_index=True)
+    owner, skill, kind = owner[unique], skill[unique], kind[unique]
+    level = rng.choice(3, size=len(owner), p=(0.4, 0.4, 0.2))
+    user_skill_ids = np.arange(1, len(owner) + 1)
+
+    # Trades between random user_skills rows of different users
+    n_trades = users * trades_per_user
+    requester = rng.integers(0, len(owner), size=n_trades)
+    provider = rng.integers(0, len(owner), size=n_trades)
+    keep = owner[requester] != owner[provider]
+    requester, provider = requester[keep], provider[keep]
+    created_at = now - rng.uniform(0, 60 * DAY, size=len(requester))
+    completed = rng.random(len(requester)) < 0.6
+    done = np.concatenate([owner[requester[completed]], owner[provider[completed]]])
+    trade_counts = np.bincount(done, minlength=users + 1)
+
+    # Providers of completed trades are reviewed most of the time
+    was_reviewed = rng.random(int(completed.sum())) < 0.7
+    reviewed = provider[completed][was_reviewed]
+    ratings = rng.choice(np.arange(1, 6), size=len(reviewed), p=(0.03, 0.07, 0.2, 0.35, 0.35))
+    rating_sum = np.bincount(owner[reviewed], weights=ratings, minlength=users + 1)
+    rating_count = np.bincount(owner[reviewed], minlength=users + 1)
+
+    # Each participant of a completed trade interacted with both skills
+    given = np.zeros(int(completed.sum()), dtype=np.int64)
+    given[was_reviewed] = ratings
+    sides = ((requester[completed], given), (provider[completed], np.zeros_like(given)))
+    interactions = [
+        (user_id, skill_id, rating or None)
+        for participants, rated in sides
+        for traded in (requester[completed], provider[completed])
+        for user_id, skill_id, rating in zip(owner[participants].tolist(), skill[traded].tolist(), rated.tolist())
+    ]
+
+    return {
+        'users': user_rows,
+        'skills': skill_rows,
+        'user_skills': list(zip(
+            user_skill_ids.tolist(), owner.tolist(), skill.tolist(),
+            [SKILL_TYPES[k] for k in kind], [PROFICIENCY_LEVELS[v] for v in level],
+        )),
+        'ratings': [(int(u), rating_sum[u] / rating_count[u]) for u in np.flatnonzero(rating_count)],
+        'trade_counts': [(int(u), int(trade_counts[u])) for u in np.flatnonzero(trade_counts)],
+        'trades': list(zip(
+            range(1, len(requester) + 1), user_skill_ids[requester].tolist(),
+            user_skill_ids[provider].tolist(), created_at.tolist(),
+        )),
+        'interactions': interactions,
+    }
+
+
+def synthetic_texts(population, seed=0, topic_words=60, family_size=5, described=0.3):
+    """Description rows shaped like the related.py queries.
+
+    Returns ``skill_texts`` (id, name, description) and ``user_skill_texts``
+    (skill_id, description) for a ``described`` share of user_skills rows.
+    """
+    rng = np.random.default_rng(seed)
+    skills = population['skills']
+    topics = {category: [f'{category.split()[0].lower()}{j}' for j in range(topic_words)] for category in SEED_CATEGORIES}
+    popularity = 1 / np.arange(1, topic_words + 1)
+    popularity /= popularity.sum()
+    family = rng.integers(0, max(1, len(skills) // family_size), size=len(skills) + 1)
+
+    def describe(skill_ids, family_words, topic_count):
+        topic_picks = rng.choice(topic_words, size=(len(skill_ids), topic_count), p=popularity)
+        family_picks = rng.integers(0, 4, size=(len(skill_ids), family_words))
+        return [
+            ' '.join([f'family{family[skill_id]}w{w}' for w in fw] + [topics[skills[skill_id - 1][2]][t] for t in tw])
+            for skill_id, fw, tw in zip(skill_ids, family_picks.tolist(), topic_picks.tolist())
+        ]
+
+    skill_ids = [row[0] for row in skills]
+    rows = population['user_skills']
+    picked = np.flatnonzero(rng.random(len(rows)) < described)
+    described_ids = [rows[i][2] for i in picked.tolist()]
+    return {
+        'skill_texts': [(row[0], row[1], text) for row, text in zip(skills, describe(skill_ids, 3, 5))],
+        'user_skill_texts': list(zip(described_ids, describe(described_ids, 2, 4))),
+    }
+
+
+def reference_ranking(matrix, factors=None, related=None, categories=None):
+    """Brute-force recommendations: score every user_skills row, no postings.
+
+    Returns ``rank(user_id, limit)`` giving (user_id, score) pairs ranked the
+    way SkillRecommender.get_recommendations must rank them, with ``factors``
+    blended in, seeks expanded by ``related`` and other categories weighted
+    by the affinities in ``categories`` if given.
+    """
+    m = matrix
+    bonus = bonus_scores(m.user_rating, m.total_trades)
+    planes = {skill_type: m.plane(skill_type).tocoo() for skill_type in SKILL_TYPES}
+
+    def rank(user_id, limit, within_km=None, boost_km=None):
+        row = m.user_index[user_id]
+        distances = haversine_km(m.user_lat[row], m.user_lon[row], m.user_lat, m.user_lon)
+        offered, _ = m.row_skills('offering', row)
+        sought, _ = m.row_skills('seeking', row)
+        category_weights = np.zeros(len(m.categories))
+        if categories is not None:
+            category_weights = CATEGORY_SCORE * categories.affinity(np.unique(m.skill_category[offered]))
+            category_weights[category_weights < CATEGORY_SCORE * MIN_AFFINITY] = 0
+        category_weights[m.skill_category[np.concatenate([offered, sought])]] = CATEGORY_SCORE
+        predicted = None if factors is None else factors.preferences(row, len(m.skill_ids))
+        totals = np.full(len(m.user_ids), -np.inf)
+        for skill_type, exact, exact_score in (('offering', sought, EXACT_OFFER_SCORE),
+                                               ('seeking', offered, EXACT_SEEK_SCORE)):
+            entries = planes[skill_type]
+            weight = category_weights[m.skill_category[entries.col]]
+            if skill_type == 'offering' and related is not None:
+                similar = np.zeros(len(m.skill_ids))
+                for col in sought.tolist():
+                    cols, similarities = related.related(col)
+                    similar[cols] = np.maximum(similar[cols], RELATED_SCORE * similarities)
+                weight = np.maximum(weight, similar[entries.col])
+            weight = np.where(np.isin(entries.col, exact), exact_score, weight)
+            keep = (weight > 0) & (entries.row != row)
+            if within_km is not None:
+                keep &= distances[entries.row] <= within_km
+            owners = entries.row[keep]
+            scores = weight[keep] + ((entries.data[keep] - 1) + bonus[owners])
+            if predicted is not None:
+                scores = scores + COLLABORATIVE_WEIGHT * predicted[entries.col[keep]]
+            if boost_km:
+                scores = scores + np.where(distances[owners] <= boost_km, PROXIMITY_SCORE, 0)
+            np.maximum.at(totals, owners, scores)
+        scored = np.flatnonzero(totals > -np.inf)
+        ranked = scored[np.lexsort((m.user_ids[scored], -totals[scored]))[:limit]]
+        return [(int(m.user_ids[r]), float(totals[r])) for r in ranked]
+
+    return rank
+
+
+def check_parity(recommender, user_ids, limit, **options):
+    """Count users whose served ranking differs from the brute-force one."""
+    rank = reference_ranking(recommender.matrix, recommender.factors, recommender.related, recommender.categories)
+    mismatches = sum(
+        [(r['user_id'], r['score']) for r in recommender.get_recommendations(user_id, limit, **options)]
+        != rank(user_id, limit, **options)
+        for user_id in user_ids
+    )
+    return {'users': len(user_ids), 'mismatches': mismatches}
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def latency_stats(timings):
+    """Percentiles in milliseconds plus single-threaded throughput."""
+    timings = np.asarray(timings) * 1000
+    return {
+        'queries': len(timings),
+        'p50_ms': round(float(np.percentile(timings, 50)), 3),
+        'p95_ms': round(float(np.percentile(timings, 95)), 3),
+        'p99_ms': round(float(np.percentile(timings, 99)), 3),
+        'mean_ms': round(float(timings.mean()), 3),
+        'max_ms': round(float(timings.max()), 3),
+        'queries_per_second': round(float(len(timings) / (timings.sum() / 1000)), 1),
+    }
+
+
+def time_queries(query, args):
+    timings = []
+    for arg in args:
+        started = time.perf_counter()
+        query(arg)
+        timings.append(time.perf_counter() - started)
+    return latency_stats(timings)
+
+
+class Stage:
+    """Context manager recording wall time and peak RSS of a build step."""
+
+    def __init__(self, results, name):
+        self.results = results
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.results[self.name] = {
+            'seconds': round(time.perf_counter() - self.started, 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        }
+
+
+def run_population(users, engines, queries=1000, limit=10, seed=0, verify=100, workers=1):
+    build, latency, parity = {}, {}, {}
+    with Stage(build, 'generate'):
+        population = synthetic_population(users, seed=seed)
+    # Keep the collector from rescanning millions of generated tuples
+    gc.freeze()
+    with Stage(build, 'matrix'):
+        matrix = SkillMatrix(
+            population['users'], population['skills'], (row[1:] for row in population['user_skills']),
+            population['ratings'], population['trade_counts'],
+        )
+
+    rng = np.random.default_rng(seed)
+    sample = matrix.user_ids[rng.choice(len(matrix.user_ids), size=min(queries, users), replace=False)].tolist()
+
+    if {'recommendations', 'nearby', 'batch'} & set(engines):
+        with Stage(build, 'recommender'):
+            recommender = SkillRecommender(matrix)
+    if 'recommendations' in engines:
+        latency['recommendations'] = time_queries(lambda user_id: recommender.get_recommendations(user_id, limit), sample)
+        parity['recommendations'] = check_parity(recommender, sample[:verify], limit)
+    if 'nearby' in engines:
+        for name, options in (('within', {'within_km': NEARBY_KM}), ('boost', {'boost_km': NEARBY_KM})):
+            latency[f'nearby_{name}'] = time_queries(
+                lambda user_id: recommender.get_recommendations(user_id, limit, **options), sample,
+            )
+            parity[f'nearby_{name}'] = check_parity(recommender, sample[:verify], limit, **options)
+    if 'collaborative' in engines:
+        with Stage(build, 'factors'):
+            factors = TradeFactors(matrix, population['interactions'], workers=workers)
+        blended = SkillRecommender(matrix, factors)
+        # Users with completed trades are the ones the blend changes
+        traded = matrix.user_ids[factors.user_factors.any(axis=1)]
+        traded = traded[rng.choice(len(traded), size=min(queries, len(traded)), replace=False)].tolist()
+        latency['collaborative'] = time_queries(lambda user_id: blended.get_recommendations(user_id, limit), traded)
+        parity['collaborative'] = check_parity(blended, traded[:verify], limit)
+    if 'related' in engines:
+        texts = synthetic_texts(population, seed)
+        with Stage(build, 'related'):
+            related = RelatedSkills(matrix, build_related(texts['skill_texts'], texts['user_skill_texts']))
+        expanded = SkillRecommender(matrix, related=related)
+        latency['related'] = time_queries(lambda user_id: expanded.get_recommendations(user_id, limit), sample)
+        parity['related'] = check_parity(expanded, sample[:verify], limit)
+    if 'batch' in engines:
+        started = time.perf_counter()
+        count = sum(1 for _ in recommend_batch(recommender, sample, limit))
+        latency['batch'] = {'users': count, 'users_per_second': round(count / (time.perf_counter() - started), 1)}
+
+    if 'trending' in engines:
+        with Stage(build, 'trending'):
+            trending = TrendingSkills(
+                population['skills'], [(row[0], row[2]) for row in population['user_skills']], population['trades'],
+            )
+        latency['trending'] = time_queries(lambda _: trending.top(limit), range(len(sample)))
+
+    if 'similar' in engines or 'similar_lsh' in engines:
+        with Stage(build, 'bitsets'):
+            bitsets = SkillBitsets(matrix)
+    if 'similar' in engines:
+        latency['similar'] = time_queries(lambda user_id: bitsets.similar_users(user_id, limit), sample[:100])
+    if 'similar_lsh' in engines:
+        with Stage(build, 'lsh'):
+            lsh = MinHashLSH(bitsets)
+        latency['similar_lsh'] = time_queries(lambda user_id: lsh.similar_users(user_id, limit), sample)
+
+    if 'matches' in engines:
+        with Stage(build, 'reciprocal'):
+            reciprocal = ReciprocalIndex(matrix)
+        latency['matches'] = time_queries(lambda user_id: reciprocal.reciprocal_matches(user_id, limit), sample)
+
+    if 'cycles' in engines:
+        with Stage(build, 'trade_graph'):
+            graph = trade_graph(matrix, seed=seed)
+        with Stage(build, 'cycles'):
+            _, latency['cycles'] = find_cycles(graph, workers=workers)
+        latency['cycles']['graph_bytes'] = graph.data.nbytes + graph.indices.nbytes + graph.indptr.nbytes
+
+    entries = matrix.offering.nnz + matrix.seeking.nnz
+    return {
+        'users': users,
+        'skills': len(population['skills']),
+        'user_skills': len(population['user_skills']),
+        'matrix_bytes': matrix.nbytes,
+        'bytes_per_row': round(matrix.nbytes / max(entries, 1), 2),
+        'trades': len(population['trades']),
+        'interactions': len(population['interactions']),
+        'build': build,
+        'latency': latency,
+        'parity': parity,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark recommendation engines on synthetic populations')
+    parser.add_argument('--users', type=int, action='append', help='population size, repeatable (default 10000)')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+    parser.add_argument('--queries', type=int, default=1000, help='sampled users per latency measurement')
+    parser.add_argument('--limit', type=int, default=10, help='results requested per query')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verify', type=int, default=100, help='sampled users checked against a brute-force ranking')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='processes training the trade factors')
+    parser.add_argument('--output', default='benchmark-results.json')
+    args = parser.parse_args()
+
+    results = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'engines': list(args.engines),
+        'populations': [],
+    }
+    for users in args.users or [10000]:
+        population = run_population(users, args.engines, args.queries, args.limit, args.seed, args.verify, args.workers)
+        results['populations'].append(population)
+        print(json.dumps(population))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
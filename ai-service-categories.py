@@ -0,0 +1,101 @@
+"""Per-category counts and offer -> seek co-occurrence.
+
+``CategoryStats`` keeps, for every skill category, the number of skills,
+of users holding any skill in it and of users offering or seeking in it,
+plus a category x category matrix counting the users who offer in X and
+also seek in Y. Everything is computed once from the SkillMatrix planes
+and then kept current by ``add_entry`` as user_skills rows arrive, so
+``/categories`` is served from memory instead of a GROUP BY over
+user_skills.
+
+``affinity`` turns the matrix into the share of offerers of some categories
+who also seek each category; the recommender uses it to weight matches
+outside the user's own categories.
+"""
+import numpy as np
+from scipy import sparse
+
+ALSO_SEEK = 3
+
+
+class CategoryStats:
+    def __init__(self, matrix):
+        self.matrix = m = matrix
+        n = len(m.categories)
+        self.n_skills = len(m.skill_ids)
+        self.skill_counts = np.bincount(m.skill_category, minlength=n).astype(np.int64)
+        by_category = sparse.csr_matrix(
+            (np.ones(self.n_skills), (np.arange(self.n_skills), m.skill_category)), shape=(self.n_skills, n),
+        )
+        offers = (m.offering @ by_category > 0).astype(np.int64)
+        seeks = (m.seeking @ by_category > 0).astype(np.int64)
+        self.offer_counts = np.asarray(offers.sum(axis=0)).ravel()
+        self.seek_counts = np.asarray(seeks.sum(axis=0)).ravel()
+        self.user_counts = np.asarray((offers + seeks > 0).sum(axis=0)).ravel().astype(np.int64)
+        self.cooccurrence = (offers.T @ seeks).toarray().astype(np.int64)
+
+    def _grow(self):
+        """Catch up with skills and categories added to the matrix since."""
+        m = self.matrix
+        n, known = len(m.categories), len(self.skill_counts)
+        if n > known:
+            for name in ('skill_counts', 'offer_counts', 'seek_counts', 'user_counts'):
+                setattr(self, name, np.concatenate([getattr(self, name), np.zeros(n - known, dtype=np.int64)]))
+            self.cooccurrence = np.pad(self.cooccurrence, ((0, n - known), (0, n - known)))
+        if len(m.skill_ids) > self.n_skills:
+            self.skill_counts += np.bincount(m.skill_category[self.n_skills:], minlength=n)
+            self.n_skills = len(m.skill_ids)
+
+    def _row_categories(self, skill_type, row):
+        cols, _ = self.matrix.row_skills(skill_type, row)
+        return np.bincount(self.matrix.skill_category[cols], minlength=len(self.skill_counts))
+
+    def add_entry(self, row, col, skill_type):
+        """Count a user_skills row just added to the matrix.
+
+        Call with the matrix lock held, after ``SkillMatrix.add_entry``.
+        """
+        self._grow()
+        category = self.matrix.skill_category[col]
+        offered = self._row_categories('offering', row)
+        sought = self._row_categories('seeking', row)
+        if offered[category] + sought[category] == 1:
+            self.user_counts[category] += 1
+        if skill_type == 'offering' and offered[category] == 1:
+            self.offer_counts[category] += 1
+            self.cooccurrence[category, sought > 0] += 1
+        elif skill_type == 'seeking' and sought[category] == 1:
+            self.seek_counts[category] += 1
+            self.cooccurrence[offered > 0, category] += 1
+
+    def affinity(self, categories):
+        """Highest share of the offerers of ``categories`` who also seek each category."""
+        self._grow()
+        shares = np.zeros(len(self.skill_counts))
+        if len(categories):
+            shares = self.cooccurrence[categories] / np.maximum(self.offer_counts[categories], 1)[:, None]
+            shares = shares.max(axis=0)
+        return shares
+
+    def summary(self):
+        """Categories by skill count, with the categories their offerers most often seek."""
+        with self.matrix.lock:
+            self._grow()
+            names = list(self.matrix.categories)
+            counts = [getattr(self, name).copy() for name in ('skill_counts', 'user_counts', 'offer_counts', 'seek_counts')]
+            shares = self.cooccurrence / np.maximum(self.offer_counts, 1)[:, None]
+        skill_counts, user_counts, offer_counts, seek_counts = counts
+        result = []
+        for i in sorted(range(len(names)), key=lambda i: (-skill_counts[i], names[i])):
+            also = [j for j in np.argsort(-shares[i], kind='stable')[:ALSO_SEEK + 1].tolist() if j != i and shares[i, j] > 0]
+            result.append({
+                'category': names[i],
+                'skill_count': int(skill_counts[i]),
+                'user_count': int(user_counts[i]),
+                'offering_count': int(offer_counts[i]),
+                'seeking_count': int(seek_counts[i]),
+                'also_seek': [
+                    {'category': names[j], 'share': round(float(shares[i, j]), 4)} for j in also[:ALSO_SEEK]
+                ],
+            })
+        return result
@@ -0,0 +1,176 @@
+"""Implicit-feedback collaborative filtering over completed trades.
+
+Every completed trade is an interaction between each participant and both
+skills exchanged, weighted by the rating that participant gave the trade
+(NEUTRAL_RATING when they left no review). ``TradeFactors`` fits user and
+skill factors with alternating least squares for implicit feedback (Hu,
+Koren & Volinsky): observed pairs have preference 1 and confidence
+1 + ALPHA x their summed weight, all other pairs preference 0 and
+confidence 1.
+
+Each half-step solves one small linear system per user (or skill). Rows
+are cut into blocks of about BLOCK_ENTRIES interactions; within a block,
+rows with the same number of interactions are stacked so their systems are
+assembled and solved as one batch. Blocks are spread over a fork-based
+process pool that shares the fixed side's factors copy-on-write. Training
+runs in batch when the model is built; the factors are then served from
+memory next to the SkillMatrix.
+"""
+import logging
+import multiprocessing
+import time
+from itertools import islice
+
+import numpy as np
+from scipy import sparse
+
+from db import stream
+from matrix import BUILD_CHUNK, _id_lookup
+
+FACTORS = 32
+ITERATIONS = 10
+REGULARIZATION = 0.1
+ALPHA = 10.0
+NEUTRAL_RATING = 3
+MAX_RATING = 5
+BLOCK_ENTRIES = 4096
+
+INTERACTIONS_SQL = """
+    SELECT t.user_id, us.skill_id, r.rating
+    FROM (
+        SELECT id, requester_id AS user_id, requester_skill_id, provider_skill_id
+        FROM trades WHERE status = 'completed'
+        UNION ALL
+        SELECT id, provider_id, requester_skill_id, provider_skill_id
+        FROM trades WHERE status = 'completed'
+    ) t
+    JOIN user_skills us ON us.id IN (t.requester_skill_id, t.provider_skill_id)
+    LEFT JOIN reviews r ON r.trade_id = t.id AND r.reviewer_id = t.user_id
+"""
+
+logger = logging.getLogger('collaborative')
+
+
+def interaction_weights(matrix, interactions):
+    """users x skills CSR of summed interaction weights (rating / MAX_RATING).
+
+    ``interactions`` yields (user_id, skill_id, rating or None); pairs whose
+    user or skill is not in the matrix are dropped.
+    """
+    user_rows, skill_cols = _id_lookup(matrix.user_ids), _id_lookup(matrix.skill_ids)
+    rows, cols, weights = [], [], []
+    interactions = iter(interactions)
+    while True:
+        chunk = list(islice(interactions, BUILD_CHUNK))
+        if not chunk:
+            break
+        user_ids, skill_ids, ratings = zip(*chunk)
+        rows.append(user_rows(user_ids))
+        cols.append(skill_cols(skill_ids))
+        weights.append(np.array([NEUTRAL_RATING if r is None else r for r in ratings], dtype=np.float32))
+    shape = (len(matrix.user_ids), len(matrix.skill_ids))
+    if not rows:
+        return sparse.csr_matrix(shape, dtype=np.float32)
+    rows, cols, weights = np.concatenate(rows), np.concatenate(cols), np.concatenate(weights)
+    known = (rows >= 0) & (cols >= 0)
+    plane = sparse.csr_matrix(
+        (weights[known] / MAX_RATING, (rows[known], cols[known])), shape=shape, dtype=np.float32,
+    )
+    plane.sum_duplicates()
+    return plane
+
+
+def row_blocks(indptr, budget=BLOCK_ENTRIES):
+    """(start, stop) row ranges of about ``budget`` entries each.
+
+    Rows longer than the budget get a block of their own.
+    """
+    n_rows = len(indptr) - 1
+    cuts = np.searchsorted(indptr, np.arange(0, indptr[-1], budget), side='right') - 1
+    heavy = np.flatnonzero(np.diff(indptr) > budget)
+    cuts = np.unique(np.concatenate([[0, n_rows], cuts, heavy, heavy + 1]))
+    return list(zip(cuts[:-1].tolist(), cuts[1:].tolist()))
+
+
+# Worker state for the process pool (inherited through fork)
+_plane = None
+_fixed = None
+_gram = None
+
+
+def _solve_block(block):
+    """Least-squares factors for rows start..stop against the fixed side."""
+    start, stop = block
+    indptr = _plane.indptr[start:stop + 1]
+    counts = np.diff(indptr)
+    solved = np.zeros((stop - start, _fixed.shape[1]), dtype=np.float32)
+    # Rows with the same number of interactions form one dense batch:
+    # A = YtY + reg I + Yt (C - I) Y and b = Yt C p for each
+    for count in np.unique(counts[counts > 0]).tolist():
+        rows = np.flatnonzero(counts == count)
+        entries = indptr[rows, None] + np.arange(count)
+        fixed = _fixed[_plane.indices[entries]].astype(np.float64)
+        confidence = 1 + ALPHA * _plane.data[entries].astype(np.float64)
+        a = _gram + np.matmul(fixed.transpose(0, 2, 1) * (confidence - 1)[:, None, :], fixed)
+        b = np.matmul(confidence[:, None, :], fixed)
+        solved[rows] = np.linalg.solve(a, b.transpose(0, 2, 1))[..., 0]
+    return solved
+
+
+def _half_step(plane, fixed, regularization, workers):
+    global _plane, _fixed, _gram
+    _plane, _fixed = plane, fixed
+    gram = fixed.T.astype(np.float64) @ fixed
+    _gram = gram + regularization * np.eye(len(gram))
+    blocks = row_blocks(plane.indptr)
+    if workers <= 1:
+        return np.concatenate([_solve_block(block) for block in blocks])
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        return np.concatenate(pool.map(_solve_block, blocks, chunksize=max(1, len(blocks) // (4 * workers))))
+
+
+def fit_als(weights, factors=FACTORS, iterations=ITERATIONS, regularization=REGULARIZATION, workers=1, seed=0):
+    """Alternating least squares on a users x skills weight matrix.
+
+    Returns float32 (user_factors, skill_factors); users and skills without
+    interactions keep zero factors.
+    """
+    rng = np.random.default_rng(seed)
+    by_skill = weights.T.tocsr()
+    user_factors = np.zeros((weights.shape[0], factors), dtype=np.float32)
+    skill_factors = (rng.standard_normal((weights.shape[1], factors)) * 0.01).astype(np.float32)
+    for _ in range(iterations):
+        user_factors = _half_step(weights, skill_factors, regularization, workers)
+        skill_factors = _half_step(by_skill, user_factors, regularization, workers)
+    return user_factors, skill_factors
+
+
+class TradeFactors:
+    """User and skill factors fitted to completed-trade interactions."""
+
+    def __init__(self, matrix, interactions, factors=FACTORS, iterations=ITERATIONS,
+                 regularization=REGULARIZATION, workers=1, seed=0):
+        started = time.perf_counter()
+        weights = interaction_weights(matrix, interactions)
+        self.user_factors, self.skill_factors = fit_als(weights, factors, iterations, regularization, workers, seed)
+        self.interactions = weights.nnz
+        self.train_seconds = time.perf_counter() - started
+        logger.info('Fitted %d factors on %d interactions in %.1fs (%d workers)',
+                    factors, self.interactions, self.train_seconds, workers)
+
+    @classmethod
+    def load(cls, conn, matrix, **options):
+        return cls(matrix, stream(conn, INTERACTIONS_SQL), **options)
+
+    def preferences(self, row, n_skills):
+        """Predicted preference of user ``row`` for skill columns 0..n_skills, clipped to [0, 1].
+
+        None for users without factors: no completed trades at training
+        time, or added since.
+        """
+        if row >= len(self.user_factors) or not self.user_factors[row].any():
+            return None
+        predicted = np.zeros(n_skills)
+        known = min(n_skills, len(self.skill_factors))
+        predicted[:known] = np.clip(self.skill_factors[:known] @ self.user_factors[row], 0, 1)
+        return predicted
@@ -0,0 +1,287 @@
+"""Batch detection of multi-party swap cycles in the trade graph.
+
+The trade graph has an edge A -> B when A offers a skill that B seeks (A
+can teach B). A cycle A -> B -> C -> A is a three-way swap in which every
+participant teaches one person and learns from another. Popular skills have
+thousands of teachers, so linking every learner to all of them would grow
+the graph with the square of the user count; each learner is instead linked
+to at most ``TEACHERS_PER_SKILL`` teachers per sought skill, drawn with
+probability proportional to proficiency. The graph then grows linearly
+with the sought user_skills rows.
+
+Strongly connected components are computed first; users in components of
+fewer than three users cannot be on a proposable cycle and are dropped, as
+are edges between components. Cycles of length 3 up to ``max_length`` are
+then enumerated once each, starting from their smallest node: a backward
+BFS from the start bounds how far the search may wander and still close
+the loop, so the depth-limited search only visits useful nodes. Start
+nodes are grouped by component and fanned out over a process pool.
+
+Run nightly to refresh ``swap_proposals``:
+
+    python cycles.py --max-length 4 --workers 8
+    python cycles.py --synthetic 200000 --degree 5    # benchmark only
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from db import connect
+from matrix import SkillMatrix
+
+START_CHUNK = 2048
+TEACHERS_PER_SKILL = 8
+
+logger = logging.getLogger('cycles')
+
+
+def trade_graph(matrix, teachers_per_skill=TEACHERS_PER_SKILL, seed=0):
+    """Boolean user -> user adjacency: row teaches column.
+
+    Every learner of a skill gets up to ``teachers_per_skill`` of its
+    teachers, sampled with replacement in proportion to their proficiency.
+    """
+    rng = np.random.default_rng(seed)
+    offering, seeking = matrix.offering_by_skill, matrix.seeking_by_skill
+    teacher_rows, learner_rows = [], []
+    for col in range(min(offering.shape[1], seeking.shape[1])):
+        teachers = offering.indices[offering.indptr[col]:offering.indptr[col + 1]]
+        learners = seeking.indices[seeking.indptr[col]:seeking.indptr[col + 1]]
+        if not len(teachers) or not len(learners):
+            continue
+        if len(teachers) <= teachers_per_skill:
+            picked = np.tile(teachers, len(learners))
+            width = len(teachers)
+        else:
+            levels = offering.data[offering.indptr[col]:offering.indptr[col + 1]].astype(np.float64)
+            picked = rng.choice(teachers, size=len(learners) * teachers_per_skill, p=levels / levels.sum())
+            width = teachers_per_skill
+        teacher_rows.append(picked)
+        learner_rows.append(np.repeat(learners, width))
+    n = matrix.offering.shape[0]
+    if not teacher_rows:
+        return sparse.csr_matrix((n, n), dtype=np.int8)
+    rows, cols = np.concatenate(teacher_rows), np.concatenate(learner_rows)
+    keep = rows != cols
+    graph = sparse.csr_matrix((np.ones(int(keep.sum()), dtype=np.int8), (rows[keep], cols[keep])), shape=(n, n))
+    graph.sum_duplicates()
+    graph.data[:] = 1
+    return graph
+
+
+class SwapGraph:
+    """CSR adjacency restricted to edges inside components that can hold a cycle."""
+
+    def __init__(self, graph):
+        graph = graph.tocsr()
+        self.n_components, labels = connected_components(graph, directed=True, connection='strong')
+        sizes = np.bincount(labels)
+        self.labels = np.where(sizes[labels] >= 3, labels, -1)
+
+        rows = np.repeat(np.arange(graph.shape[0]), np.diff(graph.indptr))
+        keep = (self.labels[rows] >= 0) & (self.labels[rows] == self.labels[graph.indices])
+        inner = sparse.csr_matrix(
+            (np.ones(int(keep.sum()), dtype=np.int8), (rows[keep], graph.indices[keep])), shape=graph.shape,
+        )
+        self.out_indptr, self.out_indices = inner.indptr, inner.indices
+        reverse = inner.T.tocsr()
+        self.in_indptr, self.in_indices = reverse.indptr, reverse.indices
+
+    @property
+    def nnz(self):
+        return len(self.out_indices)
+
+    def successors(self, node):
+        return self.out_indices[self.out_indptr[node]:self.out_indptr[node + 1]].tolist()
+
+    def predecessors(self, node):
+        return self.in_indices[self.in_indptr[node]:self.in_indptr[node + 1]].tolist()
+
+    def start_nodes(self):
+        """Nodes on potential cycles, ordered by component."""
+        nodes = np.flatnonzero(self.labels >= 0)
+        return nodes[np.argsort(self.labels[nodes], kind='stable')]
+
+    def cycles_from(self, start, max_length=4, limit=50):
+        """Cycles whose smallest node is ``start``, shortest first.
+
+        Deepens one length at a time, so every cycle of one length is found
+        before any longer one and ``limit`` never cuts a shorter cycle.
+        """
+        # Hops needed to get back to start, only through nodes above it
+        distance = {start: 0}
+        frontier = [start]
+        for hops in range(1, max_length):
+            reached = []
+            for node in frontier:
+                for prev in self.predecessors(node):
+                    if prev > start and prev not in distance:
+                        distance[prev] = hops
+                        reached.append(prev)
+            frontier = reached
+
+        cycles = []
+        path = [start]
+        on_path = {start}
+
+        def extend(node, length):
+            successors = self.successors(node)
+            if len(path) == length:
+                if start in successors:
+                    cycles.append(tuple(path))
+                return
+            for nxt in successors:
+                if len(cycles) >= limit:
+                    return
+                if nxt not in on_path and distance.get(nxt, max_length) <= length - len(path):
+                    path.append(nxt)
+                    on_path.add(nxt)
+                    extend(nxt, length)
+                    on_path.discard(nxt)
+                    path.pop()
+
+        for length in range(3, max_length + 1):
+            if len(cycles) >= limit:
+                break
+            extend(start, length)
+        return cycles
+
+
+# Worker state for the process pool (inherited through fork)
+_swap_graph = None
+
+
+def _cycles_worker(args):
+    starts, max_length, limit = args
+    found = []
+    for start in starts:
+        found.extend(_swap_graph.cycles_from(int(start), max_length, limit))
+    return found
+
+
+def find_cycles(graph, max_length=4, per_start=50, workers=1):
+    """Enumerate swap cycles; returns (cycles, stats)."""
+    global _swap_graph
+    started = time.perf_counter()
+    _swap_graph = SwapGraph(graph)
+    prepared = time.perf_counter()
+
+    starts = _swap_graph.start_nodes()
+    tasks = [(starts[i:i + START_CHUNK], max_length, per_start) for i in range(0, len(starts), START_CHUNK)]
+    cycles = []
+    if workers <= 1:
+        for found in map(_cycles_worker, tasks):
+            cycles.extend(found)
+    else:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            for found in pool.map(_cycles_worker, tasks):
+                cycles.extend(found)
+
+    finished = time.perf_counter()
+    stats = {
+        'users': int(graph.shape[0]),
+        'edges': int(graph.nnz),
+        'cycle_edges': _swap_graph.nnz,
+        'components': int(_swap_graph.n_components),
+        'users_on_cycles': int(len(starts)),
+        'cycles': len(cycles),
+        'scc_seconds': round(prepared - started, 3),
+        'search_seconds': round(finished - prepared, 3),
+    }
+    return cycles, stats
+
+
+def select_proposals(cycles, per_user=3):
+    """Greedily keep the shortest cycles while capping proposals per user."""
+    counts = {}
+    selected = []
+    for cycle in sorted(cycles, key=len):
+        if all(counts.get(node, 0) < per_user for node in cycle):
+            selected.append(cycle)
+            for node in cycle:
+                counts[node] = counts.get(node, 0) + 1
+    return selected
+
+
+def proposal_legs(matrix, cycle):
+    """(teacher_id, learner_id, skill_id) for each hop of a cycle.
+
+    Each teacher is assigned the shared skill they are most proficient in.
+    """
+    legs = []
+    for teacher, learner in zip(cycle, cycle[1:] + cycle[:1]):
+        skills, levels = matrix.row_skills('offering', teacher)
+        sought, _ = matrix.row_skills('seeking', learner)
+        shared = np.isin(skills, sought)
+        best = skills[shared][np.argmax(levels[shared])]
+        legs.append((int(matrix.user_ids[teacher]), int(matrix.user_ids[learner]), int(matrix.skill_ids[best])))
+    return legs
+
+
+def write_proposals(conn, matrix, cycles):
+    """Expire previous open proposals and insert the new ones."""
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE swap_proposals SET status = 'expired' WHERE status = 'proposed'")
+        for cycle in cycles:
+            cursor.execute('INSERT INTO swap_proposals (cycle_length) VALUES (%s)', (len(cycle),))
+            proposal_id = cursor.lastrowid
+            cursor.executemany(
+                'INSERT INTO swap_proposal_legs (proposal_id, leg_order, teacher_id, learner_id, skill_id) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                [(proposal_id, leg_order, *leg) for leg_order, leg in enumerate(proposal_legs(matrix, cycle))],
+            )
+    conn.commit()
+
+
+def synthetic_graph(users, degree, seed=0):
+    """Random directed graph with roughly ``users * degree`` edges."""
+    rng = np.random.default_rng(seed)
+    edges = users * degree
+    rows = rng.integers(0, users, size=edges)
+    cols = rng.integers(0, users, size=edges)
+    graph = sparse.csr_matrix((np.ones(edges, dtype=np.int8), (rows, cols)), shape=(users, users))
+    graph.setdiag(0)
+    graph.eliminate_zeros()
+    graph.data[:] = 1
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect multi-party skill swap cycles')
+    parser.add_argument('--max-length', type=int, default=4, help='longest cycle to propose')
+    parser.add_argument('--per-start', type=int, default=50, help='cycles explored per start user')
+    parser.add_argument('--per-user', type=int, default=3, help='proposals kept per user')
+    parser.add_argument('--teachers-per-skill', type=int, default=TEACHERS_PER_SKILL,
+                        help='teachers linked to each learner per sought skill')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--synthetic', type=int, metavar='USERS', help='benchmark on a random graph instead')
+    parser.add_argument('--degree', type=int, default=5, help='average out-degree of the synthetic graph')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.synthetic:
+        graph = synthetic_graph(args.synthetic, args.degree)
+        cycles, stats = find_cycles(graph, args.max_length, args.per_start, args.workers)
+        stats['proposals'] = len(select_proposals(cycles, args.per_user))
+        print(json.dumps(stats))
+        return
+
+    with connect() as conn:
+        matrix = SkillMatrix.load(conn)
+        graph = trade_graph(matrix, args.teachers_per_skill)
+        cycles, stats = find_cycles(graph, args.max_length, args.per_start, args.workers)
+        proposals = select_proposals(cycles, args.per_user)
+        write_proposals(conn, matrix, proposals)
+    stats['proposals'] = len(proposals)
+    logger.info('Swap cycles: %s', json.dumps(stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""MySQL access for the SkillSwap recommendation service."""
+import os
+
+import pymysql
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'user': os.environ.get('DB_USER', 'skillswap_user'),
+    'password': os.environ.get('DB_PASSWORD', 'password'),
+    'database': os.environ.get('DB_NAME', 'skillswap'),
+    'charset': 'utf8mb4',
+}
+
+
+def connect(**overrides):
+    """Open a new connection using the service configuration."""
+    return pymysql.connect(**{**DB_CONFIG, **overrides})
+
+
+def stream(conn, sql, params=None, chunk_size=65536):
+    """Yield result rows without buffering the whole result set client-side."""
+    with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
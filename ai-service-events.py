@@ -0,0 +1,279 @@
+"""Apply change events published by the Express backend to the live model.
+
+The backend publishes JSON messages on the ``EVENTS_CHANNEL`` Redis channel:
+
+    {"type": "user_skill_added", "userId": 7, "userSkillId": 41, "skillId": 3, "skillName": "Python",
+     "category": "Programming", "skillType": "offering", "proficiencyLevel": "expert"}
+    {"type": "trade_created", "tradeId": 12, "requesterSkillId": 41, "providerSkillId": 58}
+    {"type": "trade_completed", "tradeId": 12, "requesterId": 7, "providerId": 9}
+    {"type": "review_created", "revieweeId": 9}
+
+Skill events carry everything the overlay needs; trade and review events
+only say whose aggregates changed, so those are re-read from MySQL. Trades
+are counted once per id, so applying any event twice is harmless.
+
+The backend also appends every event to the ``EVENTS_STREAM`` Redis
+stream. A freshly loaded model gets the events published since its data
+was read replayed onto it, from the events this worker received itself
+when it was subscribed by then and from the stream otherwise, before it
+replaces the old one. The stream is also replayed after the subscription
+drops and comes back.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import pymysql
+import redis
+
+from db import connect
+from matrix import USER_SQL, USER_STATS_SQL
+from trending import USER_SKILL_SQL
+
+EVENTS_CHANNEL = os.environ.get('EVENTS_CHANNEL', 'skillswap:events')
+EVENTS_STREAM = os.environ.get('EVENTS_STREAM', 'skillswap:events:log')
+REDIS_CONFIG = {
+    'host': os.environ.get('REDIS_HOST', 'localhost'),
+    'port': int(os.environ.get('REDIS_PORT', 6379)),
+    'password': os.environ.get('REDIS_PASSWORD') or None,
+}
+# Read by the backend's recommendation cache to key results by model
+MODEL_VERSION_KEY = 'skillswap:recommendations:model_version'
+RECONNECT_DELAY = 5
+# How long start() waits for the subscription before loading without it
+SUBSCRIBE_TIMEOUT = 10
+REPLAY_WINDOW = 10000
+# The stream is read from this many seconds before a model's data was read,
+# in case this host's clock is ahead of Redis's
+CLOCK_SKEW = 5
+STREAM_BATCH = 1000
+
+logger = logging.getLogger('events')
+
+
+def _stream_start(since):
+    """First stream id, in Redis milliseconds, that may hold an event from ``since`` on."""
+    return max(0, int((since - CLOCK_SKEW) * 1000))
+
+
+def _entry_ms(entry_id):
+    return int(entry_id.split('-')[0])
+
+
+class ChangeFeed:
+    """Redis subscriber that keeps a RecommenderModel current."""
+
+    def __init__(self, model=None):
+        self.model = model
+        # When the live model's data was read
+        self.since = None
+        self.recent = deque(maxlen=REPLAY_WINDOW)
+        self.lock = threading.Lock()
+        self.conn = None
+        self.redis = redis.Redis(**REDIS_CONFIG, decode_responses=True)
+        self.subscribed = threading.Event()
+        # Since when every published event has reached self.recent
+        self.subscribed_at = None
+
+    def start(self, timeout=SUBSCRIBE_TIMEOUT):
+        """Subscribe in the background; returns once Redis confirmed the subscription.
+
+        Start before reading the model's data so events published meanwhile
+        are held for replay. Returns False if not subscribed within ``timeout``.
+        """
+        threading.Thread(target=self._listen, daemon=True).start()
+        if not self.subscribed.wait(timeout):
+            logger.warning('Not subscribed to %s after %ss; events until then are missed', EVENTS_CHANNEL, timeout)
+            return False
+        return True
+
+    def _listen(self):
+        # Events published after the last message heard may have been missed
+        heard = disconnected_at = None
+        while True:
+            try:
+                pubsub = redis.Redis(**REDIS_CONFIG).pubsub()
+                pubsub.subscribe(EVENTS_CHANNEL)
+                for message in pubsub.listen():
+                    heard = time.time()
+                    if message['type'] == 'subscribe':
+                        logger.info('Subscribed to %s', EVENTS_CHANNEL)
+                        self._subscribed(disconnected_at)
+                    elif message['type'] == 'message':
+                        self.receive(message['data'])
+            except redis.RedisError:
+                logger.exception('Change feed disconnected')
+            except Exception:
+                logger.exception('Change feed failed')
+            if self.subscribed.is_set():
+                disconnected_at = heard
+            self.subscribed.clear()
+            time.sleep(RECONNECT_DELAY)
+
+    def _subscribed(self, disconnected_at):
+        with self.lock:
+            self.subscribed_at = time.time()
+            # Catch the live model up on what was published while disconnected,
+            # or since its data was read if it went live before the first subscription
+            missed_since = disconnected_at or self.since
+            if self.model is not None and missed_since is not None:
+                replayed = self._replay_stream(self.model, missed_since)
+                if replayed:
+                    logger.info('Replayed %d events missed while disconnected', replayed)
+        self.subscribed.set()
+
+    def _decode(self, data):
+        try:
+            event = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning('Ignoring non-JSON event: %r', data)
+            return None
+        if not isinstance(event, dict):
+            logger.warning('Ignoring malformed event: %r', event)
+            return None
+        return event
+
+    def receive(self, data):
+        event = self._decode(data)
+        if event is not None:
+            self.handle(event)
+
+    def handle(self, event):
+        with self.lock:
+            self.recent.append((time.time(), event))
+            if self.model is not None:
+                self.apply(self.model, event)
+
+    def _remembers(self, since):
+        """True if self.recent holds every event published from ``since`` on; hold the lock."""
+        if not self.subscribed.is_set() or self.subscribed_at is None or self.subscribed_at > since:
+            return False
+        return len(self.recent) < self.recent.maxlen or self.recent[0][0] <= since
+
+    def covers(self, since):
+        """True if the events published from ``since`` on can still be replayed.
+
+        They can if this worker has been subscribed since then, or if the
+        stream has not been trimmed past it. With Redis unreachable no model
+        can be brought up to date, so that counts as covered too.
+        """
+        with self.lock:
+            if self._remembers(since):
+                return True
+        try:
+            if not self.redis.exists(EVENTS_STREAM):
+                return True
+            trimmed = self.redis.xinfo_stream(EVENTS_STREAM).get('max-deleted-entry-id', '0-0')
+        except redis.RedisError:
+            logger.warning('Could not read %s; assuming it covers %s', EVENTS_STREAM, since)
+            return True
+        return _entry_ms(trimmed) < _stream_start(since)
+
+    def _replay_stream(self, model, since):
+        """Apply the events logged from ``since`` on to ``model``; returns how many."""
+        start = f'{_stream_start(since)}-0'
+        replayed = 0
+        try:
+            while True:
+                entries = self.redis.xrange(EVENTS_STREAM, min=start, count=STREAM_BATCH)
+                for _, fields in entries:
+                    event = self._decode(fields.get('data'))
+                    if event is not None:
+                        self.apply(model, event)
+                        replayed += 1
+                if len(entries) < STREAM_BATCH:
+                    return replayed
+                start = '(' + entries[-1][0]
+        except redis.RedisError:
+            logger.exception('Could not replay %s from %s', EVENTS_STREAM, since)
+            return replayed
+
+    def install(self, model, since):
+        """Replay events published from ``since`` on onto ``model`` and make it live."""
+        with self.lock:
+            replayed = 0
+            if not self._remembers(since):
+                replayed += self._replay_stream(model, since)
+            # Events received while the stream was read may not be in what
+            # was read; applying one twice is harmless
+            for received, event in self.recent:
+                if received >= since:
+                    self.apply(model, event)
+                    replayed += 1
+            self.model = model
+            self.since = since
+        if replayed:
+            logger.info('Replayed %d events onto model %s', replayed, model.version)
+        try:
+            self.redis.set(MODEL_VERSION_KEY, model.version)
+        except redis.RedisError:
+            logger.warning('Could not publish model version %s', model.version)
+
+    def apply(self, model, event):
+        kind = event.get('type')
+        try:
+            if kind == 'user_skill_added':
+                user = self._user(model, int(event['userId']))
+                if user is not None:
+                    model.add_user_skill(
+                        user,
+                        (int(event['skillId']), event['skillName'], event['category']),
+                        event['skillType'],
+                        event['proficiencyLevel'],
+                        event.get('userSkillId'),
+                    )
+            elif kind == 'trade_created':
+                skill_ids = (int(event['requesterSkillId']), int(event['providerSkillId']))
+                for user_skill_id in skill_ids:
+                    if not model.trending.knows_user_skill(user_skill_id):
+                        row = self._fetch_one(USER_SKILL_SQL, (user_skill_id,))
+                        if row is not None:
+                            model.trending.add_user_skill(*row)
+                model.add_trade(int(event['tradeId']), *skill_ids)
+            elif kind == 'trade_completed':
+                for user_id in (event['requesterId'], event['providerId']):
+                    model.update_user_stats(int(user_id), *self._stats(int(user_id)))
+            elif kind == 'review_created':
+                user_id = int(event['revieweeId'])
+                model.update_user_stats(user_id, *self._stats(user_id))
+        except (KeyError, TypeError, ValueError):
+            logger.warning('Ignoring malformed %s event: %r', kind, event)
+        except pymysql.Error:
+            # Reconnect on the next lookup rather than reusing a broken connection
+            logger.exception('MySQL lookup failed applying %s event', kind)
+            self._close()
+        except Exception:
+            # One bad event must not drop the subscription
+            logger.exception('Could not apply %s event: %r', kind, event)
+
+    def _close(self):
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except pymysql.Error:
+                pass
+
+    def _user(self, model, user_id):
+        m = model.matrix
+        row = m.user_index.get(user_id)
+        if row is not None:
+            return user_id, m.usernames[row], m.full_names[row]
+        return self._fetch_one(USER_SQL, (user_id,))
+
+    def _stats(self, user_id):
+        # No user_stats row yet means no reviews or completed trades
+        rating, trades = self._fetch_one(USER_STATS_SQL, {'user_id': user_id}) or (None, 0)
+        return rating, int(trades or 0)
+
+    def _fetch_one(self, sql, params):
+        if self.conn is None:
+            self.conn = connect(autocommit=True)
+        else:
+            self.conn.ping(reconnect=True)
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()
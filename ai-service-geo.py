@@ -0,0 +1,74 @@
+"""Radius queries over user coordinates.
+
+users.latitude/longitude are filled from the free-text location by the
+geocode_location() triggers in MySQL, which resolve names against the
+offline ``places`` gazetteer. ``GeoGrid`` buckets located users into fixed
+latitude/longitude cells kept as sorted cell keys, so a radius query only
+visits the cells overlapping the circle's bounding box and checks the exact
+great-circle distance for the users in them.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEGREES = 0.25
+MAX_RADIUS_KM = 500
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distances from one point to arrays of points."""
+    lat, lon, lats, lons = (np.radians(value) for value in (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+class GeoGrid:
+    """Located user rows grouped by grid cell, CSR-style."""
+
+    def __init__(self, lat, lon, cell_degrees=CELL_DEGREES):
+        self.lat = lat
+        self.lon = lon
+        self.cell_degrees = cell_degrees
+        self.columns = int(round(360 / cell_degrees))
+        located = np.flatnonzero(~np.isnan(lat) & ~np.isnan(lon))
+        keys = self._keys(lat[located], lon[located])
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.rows = located[order].astype(np.int32)
+
+    def _band(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90) / self.cell_degrees), 0, 180 / self.cell_degrees - 1).astype(np.int64)
+
+    def _column(self, lon):
+        return np.floor((np.asarray(lon) + 180) / self.cell_degrees).astype(np.int64) % self.columns
+
+    def _keys(self, lat, lon):
+        return self._band(lat) * self.columns + self._column(lon)
+
+    def within(self, lat, lon, km):
+        """Rows of the users within ``km`` of (lat, lon) and their distances."""
+        if np.isnan(lat) or np.isnan(lon) or len(self.rows) == 0:
+            return self.rows[:0], np.empty(0)
+
+        # Bounding box of the circle; it wraps in longitude or covers a pole
+        angle = km / EARTH_RADIUS_KM
+        south, north = lat - math.degrees(angle), lat + math.degrees(angle)
+        bands = np.arange(self._band(max(south, -90)), self._band(min(north, 90)) + 1)
+        if south <= -90 or north >= 90 or math.sin(angle) >= math.cos(math.radians(lat)):
+            spans = [(0, self.columns - 1)]
+        else:
+            delta = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+            west, east = self._column(lon - delta), self._column(lon + delta)
+            spans = [(west, east)] if west <= east else [(west, self.columns - 1), (0, east)]
+
+        starts = np.concatenate([bands * self.columns + first for first, _ in spans])
+        ends = np.concatenate([bands * self.columns + last + 1 for _, last in spans])
+        lo, hi = np.searchsorted(self.keys, starts), np.searchsorted(self.keys, ends)
+        lengths = hi - lo
+        index = np.arange(lengths.sum()) + np.repeat(lo - (np.cumsum(lengths) - lengths), lengths)
+        rows = self.rows[index]
+
+        distances = haversine_km(lat, lon, self.lat[rows], self.lon[rows])
+        keep = distances <= km
+        return rows[keep], distances[keep]
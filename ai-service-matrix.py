@@ -0,0 +1,266 @@
+"""Precomputed user x skill matrix backing the recommender.
+
+Active ``user_skills`` rows are loaded once into two CSR planes, one for
+skills a user offers and one for skills a user seeks. Cell values hold the
+proficiency level (1 = beginner, 2 = intermediate, 3 = expert) so scoring
+never has to go back to MySQL. Column-major copies of both planes give the
+skill -> users postings used to find candidates.
+
+Rows are streamed from MySQL and converted chunk by chunk into parallel
+NumPy columns, so no per-row Python objects outlive a chunk. The planes
+cost about 10 bytes per user_skills row (int32 index and int8 level, once
+per orientation); names are interned and kept once per user and skill.
+
+Changes arriving after the planes were built (see events.py) are kept in a
+small per-row overlay instead of rebuilding the CSR arrays; new users and
+skills get rows and columns past the end of the base planes.
+"""
+import sys
+import threading
+import time
+from itertools import islice
+
+import numpy as np
+from scipy import sparse
+
+from db import stream
+
+SKILL_TYPES = ('offering', 'seeking')
+PROFICIENCY_LEVELS = ('beginner', 'intermediate', 'expert')
+LEVEL_CODES = {level: code for code, level in enumerate(PROFICIENCY_LEVELS, 1)}
+BUILD_CHUNK = 65536
+
+USERS_SQL = 'SELECT id, username, full_name, latitude, longitude FROM users WHERE is_active = TRUE ORDER BY id'
+
+SKILLS_SQL = 'SELECT id, name, category FROM skills ORDER BY id'
+
+USER_SKILLS_SQL = """
+    SELECT us.user_id, us.skill_id, us.skill_type, us.proficiency_level
+    FROM user_skills us
+    JOIN users u ON us.user_id = u.id
+    WHERE us.is_active = TRUE AND u.is_active = TRUE
+"""
+
+# user_stats is kept current by triggers on reviews and trades
+RATINGS_SQL = 'SELECT user_id, avg_rating FROM user_stats WHERE review_count > 0'
+
+TRADES_SQL = 'SELECT user_id, total_trades FROM user_stats WHERE total_trades > 0'
+
+USER_SQL = 'SELECT id, username, full_name, latitude, longitude FROM users WHERE id = %s'
+
+USER_STATS_SQL = 'SELECT avg_rating, total_trades FROM user_stats WHERE user_id = %(user_id)s'
+
+
+class UserSkillColumns:
+    """Growable parallel arrays of (user row, skill column, type, level)."""
+
+    __slots__ = ('rows', 'cols', 'types', 'levels', 'size')
+
+    def __init__(self, capacity=BUILD_CHUNK):
+        self.rows = np.empty(capacity, dtype=np.int32)
+        self.cols = np.empty(capacity, dtype=np.int32)
+        self.types = np.empty(capacity, dtype=np.int8)
+        self.levels = np.empty(capacity, dtype=np.int8)
+        self.size = 0
+
+    def extend(self, rows, cols, types, levels):
+        end = self.size + len(rows)
+        if end > len(self.rows):
+            capacity = max(end, 2 * len(self.rows))
+            for name in self.__slots__[:4]:
+                column = getattr(self, name)
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                setattr(self, name, grown)
+        self.rows[self.size:end] = rows
+        self.cols[self.size:end] = cols
+        self.types[self.size:end] = types
+        self.levels[self.size:end] = levels
+        self.size = end
+
+    def plane(self, skill_type, shape):
+        """CSR plane of the given type built straight from the columns."""
+        keep = self.types[:self.size] == SKILL_TYPES.index(skill_type)
+        plane = sparse.csr_matrix(
+            (self.levels[:self.size][keep], (self.rows[:self.size][keep], self.cols[:self.size][keep])),
+            shape=shape,
+        )
+        plane.sum_duplicates()
+        return plane
+
+
+def _id_lookup(ids):
+    """Vectorised id -> position lookup; unknown ids map to -1."""
+    order = np.argsort(ids, kind='stable')
+    # Trailing sentinel so searchsorted never points past the end
+    sorted_ids = np.append(ids[order], -1)
+    positions = np.append(order, -1)
+
+    def lookup(values):
+        values = np.asarray(values, dtype=np.int64)
+        found = np.searchsorted(sorted_ids[:-1], values)
+        return np.where(sorted_ids[found] == values, positions[found], -1)
+
+    return lookup
+
+
+class SkillMatrix:
+    """In-memory snapshot of users, skills and their links."""
+
+    def __init__(self, users, skills, user_skills, ratings=(), trades=()):
+        self.built_at = time.time()
+        self.version = f'{int(self.built_at * 1000):x}'
+
+        self.user_ids = np.array([row[0] for row in users], dtype=np.int64)
+        self.usernames = [row[1] for row in users]
+        self.full_names = [row[2] for row in users]
+        # NaN where the location is unknown
+        self.user_lat = np.array([row[3] for row in users], dtype=np.float64)
+        self.user_lon = np.array([row[4] for row in users], dtype=np.float64)
+        self.user_index = {int(user_id): i for i, user_id in enumerate(self.user_ids)}
+
+        self.skill_ids = np.array([row[0] for row in skills], dtype=np.int64)
+        self.skill_names = [sys.intern(row[1]) for row in skills]
+        self.categories, codes = np.unique([row[2] for row in skills], return_inverse=True)
+        self.categories = [sys.intern(category) for category in self.categories.tolist()]
+        self.skill_category = codes.astype(np.int32)
+        self.skill_index = {int(skill_id): i for i, skill_id in enumerate(self.skill_ids)}
+
+        shape = (len(self.user_ids), len(self.skill_ids))
+        user_rows, skill_cols = _id_lookup(self.user_ids), _id_lookup(self.skill_ids)
+        columns = UserSkillColumns()
+        user_skills = iter(user_skills)
+        while True:
+            chunk = list(islice(user_skills, BUILD_CHUNK))
+            if not chunk:
+                break
+            user_ids, skill_ids, types, levels = zip(*chunk)
+            rows, cols = user_rows(user_ids), skill_cols(skill_ids)
+            known = (rows >= 0) & (cols >= 0)
+            columns.extend(
+                rows[known],
+                cols[known],
+                (np.array(types) == 'seeking')[known],
+                np.fromiter((LEVEL_CODES[level] for level in levels), dtype=np.int8, count=len(levels))[known],
+            )
+
+        self.offering = columns.plane('offering', shape)
+        self.seeking = columns.plane('seeking', shape)
+        del columns
+        self.offering_by_skill = self.offering.tocsc()
+        self.seeking_by_skill = self.seeking.tocsc()
+
+        self.user_rating = np.full(shape[0], np.nan)
+        for user_id, rating in ratings:
+            row = self.user_index.get(user_id)
+            if row is not None:
+                self.user_rating[row] = float(rating)
+
+        self.total_trades = np.zeros(shape[0], dtype=np.int32)
+        for user_id, count in trades:
+            row = self.user_index.get(user_id)
+            if row is not None:
+                self.total_trades[row] = count
+
+        # Entries added since the planes were built: skill_type -> row -> {col: level},
+        # and the same entries by skill: skill_type -> col -> [rows]
+        self.delta = {skill_type: {} for skill_type in SKILL_TYPES}
+        self.delta_by_skill = {skill_type: {} for skill_type in SKILL_TYPES}
+        self.lock = threading.RLock()
+
+    @classmethod
+    def load(cls, conn):
+        """Build a matrix from the current database contents."""
+        with conn.cursor() as cursor:
+            tables = {}
+            for name, sql in (('users', USERS_SQL), ('skills', SKILLS_SQL),
+                              ('ratings', RATINGS_SQL), ('trades', TRADES_SQL)):
+                cursor.execute(sql)
+                tables[name] = cursor.fetchall()
+        return cls(user_skills=stream(conn, USER_SKILLS_SQL), **tables)
+
+    @property
+    def shape(self):
+        return len(self.user_ids), len(self.skill_ids)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the four sparse planes."""
+        planes = (self.offering, self.seeking, self.offering_by_skill, self.seeking_by_skill)
+        return sum(p.data.nbytes + p.indices.nbytes + p.indptr.nbytes for p in planes)
+
+    def plane(self, skill_type):
+        return self.offering if skill_type == 'offering' else self.seeking
+
+    def row_skills(self, skill_type, row):
+        """Return the skill columns and levels in one user's row."""
+        cols, levels, _ = self.rows_entries(skill_type, np.array([row]))
+        return cols, levels
+
+    def rows_entries(self, skill_type, rows):
+        """Return (cols, levels, rows) for every entry in the given rows."""
+        plane = self.plane(skill_type)
+        base = rows[rows < plane.shape[0]]
+        # Gather the rows' CSR slices directly; plane[base] costs more in scipy overhead than the copy
+        starts = plane.indptr[base]
+        lengths = plane.indptr[base + 1] - starts
+        index = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        cols, levels, owners = [plane.indices[index]], [plane.data[index]], [np.repeat(base, lengths)]
+        delta = self.delta[skill_type]
+        if delta:
+            for row in rows.tolist():
+                added = delta.get(row)
+                if added:
+                    cols.append(np.fromiter(added.keys(), dtype=np.int32, count=len(added)))
+                    levels.append(np.fromiter(added.values(), dtype=np.int8, count=len(added)))
+                    owners.append(np.full(len(added), row))
+        return np.concatenate(cols), np.concatenate(levels), np.concatenate(owners)
+
+    def skill_rows(self, skill_type, col):
+        """Return the user rows holding one skill column."""
+        plane = self.offering_by_skill if skill_type == 'offering' else self.seeking_by_skill
+        rows = plane.indices[plane.indptr[col]:plane.indptr[col + 1]] if col < plane.shape[1] else plane.indices[:0]
+        added = self.delta_by_skill[skill_type].get(col)
+        if added:
+            rows = np.concatenate([rows, np.array(added, dtype=rows.dtype)])
+        return rows
+
+    def add_user(self, user_id, username, full_name, latitude=None, longitude=None):
+        """Return the row for a user, appending one if the user is new."""
+        row = self.user_index.get(user_id)
+        if row is None:
+            row = len(self.user_ids)
+            self.user_ids = np.append(self.user_ids, user_id)
+            self.usernames.append(username)
+            self.full_names.append(full_name)
+            self.user_lat = np.append(self.user_lat, np.nan if latitude is None else latitude)
+            self.user_lon = np.append(self.user_lon, np.nan if longitude is None else longitude)
+            self.user_rating = np.append(self.user_rating, np.nan)
+            self.total_trades = np.append(self.total_trades, np.int32(0))
+            self.user_index[user_id] = row
+        return row
+
+    def add_skill(self, skill_id, name, category):
+        """Return the column for a skill, appending one if the skill is new."""
+        col = self.skill_index.get(skill_id)
+        if col is None:
+            if category not in self.categories:
+                self.categories.append(sys.intern(category))
+            col = len(self.skill_ids)
+            self.skill_ids = np.append(self.skill_ids, skill_id)
+            self.skill_names.append(sys.intern(name))
+            self.skill_category = np.append(self.skill_category, np.int32(self.categories.index(category)))
+            self.skill_index[skill_id] = col
+        return col
+
+    def add_entry(self, row, col, skill_type, level):
+        """Record a new user_skills row; returns False if it is already known."""
+        plane = self.plane(skill_type)
+        if row < plane.shape[0] and col < plane.shape[1] and plane[row, col]:
+            return False
+        added = self.delta[skill_type].setdefault(row, {})
+        if col in added:
+            return False
+        added[col] = level
+        self.delta_by_skill[skill_type].setdefault(col, []).append(row)
+        return True
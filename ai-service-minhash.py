@@ -0,0 +1,193 @@
+"""MinHash + LSH index for approximate nearest neighbours by Jaccard.
+
+Each user's skill set (from ``user_skills``, as loaded into a SkillMatrix)
+is summarised by ``bands * rows`` MinHash values. Signatures are split into
+bands and every band is hashed into a sorted key array, so the users sharing
+a bucket with a query are found by binary search instead of a full scan.
+Candidates are then re-ranked by exact Jaccard on the packed bitsets.
+
+Two sets with Jaccard similarity ``s`` become candidates with probability
+``1 - (1 - s ** rows) ** bands``; more bands raise recall, more rows raise
+precision. Run as a script to benchmark recall against exact search:
+
+    python minhash.py --config 64x2 --config 32x4 --sample 500
+"""
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+
+from db import connect
+from matrix import SkillMatrix
+from similarity import PLANES, SkillBitsets
+
+MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+SIGNATURE_CHUNK = 4096
+
+logger = logging.getLogger('minhash')
+
+
+def collision_probability(similarity, bands, rows):
+    """Probability that two sets with the given Jaccard share a bucket."""
+    return 1 - (1 - similarity ** rows) ** bands
+
+
+class MinHashLSH:
+    """Banded MinHash index over the skill sets held by a SkillBitsets."""
+
+    def __init__(self, bitsets, bands=64, rows=2, seed=1):
+        self.bitsets = bitsets
+        self.bands = bands
+        self.rows = rows
+        self.num_perm = bands * rows
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, size=self.num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=self.num_perm, dtype=np.uint64)
+        self.mix = rng.integers(1, 1 << 63, size=rows, dtype=np.uint64) | np.uint64(1)
+
+        sets = bitsets.sets
+        indexed = np.flatnonzero(np.diff(sets.indptr))
+        keys = self._band_keys(self._signatures(sets, indexed))
+        order = np.argsort(keys, axis=1, kind='stable')
+        self.keys = np.take_along_axis(keys, order, axis=1)
+        self.members = indexed[order].astype(np.int32)
+
+    @property
+    def threshold(self):
+        """Similarity at which the candidate probability rises steeply."""
+        return (1 / self.bands) ** (1 / self.rows)
+
+    def _hash(self, cols):
+        x = cols.astype(np.uint64)[:, None] + np.uint64(1)
+        return (x * self.a + self.b) % MERSENNE_PRIME
+
+    def _signatures(self, sets, rows):
+        """MinHash signatures for the given (non-empty) rows of ``sets``."""
+        signatures = np.empty((len(rows), self.num_perm), dtype=np.uint64)
+        for start in range(0, len(rows), SIGNATURE_CHUNK):
+            chunk = sets[rows[start:start + SIGNATURE_CHUNK]]
+            hashed = self._hash(chunk.indices)
+            signatures[start:start + chunk.shape[0]] = np.minimum.reduceat(hashed, chunk.indptr[:-1], axis=0)
+        return signatures
+
+    def _band_keys(self, signatures):
+        """Collapse each band of each signature into one 64-bit bucket key."""
+        bands = signatures.reshape(len(signatures), self.bands, self.rows)
+        return (bands * self.mix).sum(axis=2, dtype=np.uint64).T
+
+    def candidates_for_skills(self, cols):
+        """Rows sharing at least one bucket with the given skill columns."""
+        if len(cols) == 0:
+            return np.empty(0, dtype=np.int32)
+        keys = self._band_keys(self._hash(np.asarray(cols)).min(axis=0)[None, :])[:, 0]
+        found = []
+        for band, key in enumerate(keys):
+            lo = np.searchsorted(self.keys[band], key, side='left')
+            hi = np.searchsorted(self.keys[band], key, side='right')
+            found.append(self.members[band, lo:hi])
+        return np.unique(np.concatenate(found))
+
+    def candidates(self, row):
+        sets = self.bitsets.sets
+        return self.candidates_for_skills(sets.indices[sets.indptr[row]:sets.indptr[row + 1]])
+
+    def similar_users(self, user_id, limit=10):
+        """Approximate top ``limit`` neighbours as (user_id, similarity) pairs."""
+        bitsets = self.bitsets
+        row = bitsets.matrix.user_index.get(int(user_id))
+        if row is None or row >= len(bitsets.bits):
+            return []
+        rows = self.candidates(row)
+        rows = rows[rows != row]
+        inter = np.bitwise_count(bitsets.bits[rows] & bitsets.bits[row]).sum(axis=1)
+        similarity = inter / (bitsets.sizes[rows] + bitsets.sizes[row] - inter)
+        top = np.lexsort((rows, -similarity))[:limit]
+        return [(int(bitsets.matrix.user_ids[rows[i]]), float(similarity[i])) for i in top]
+
+
+def recall_benchmark(bitsets, bands, rows, sample=500, k=10, seed=0):
+    """Compare the LSH index with exact one-vs-all search on sampled users."""
+    started = time.perf_counter()
+    index = MinHashLSH(bitsets, bands, rows)
+    build_seconds = time.perf_counter() - started
+
+    populated = np.flatnonzero(bitsets.sizes)
+    rng = np.random.default_rng(seed)
+    users = bitsets.matrix.user_ids[rng.choice(populated, size=min(sample, len(populated)), replace=False)]
+
+    hits = relevant = candidates = 0
+    exact_seconds = approx_seconds = 0.0
+    for user_id in users:
+        started = time.perf_counter()
+        exact = bitsets.similar_users(user_id, k)
+        exact_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        approx = index.similar_users(user_id, k)
+        approx_seconds += time.perf_counter() - started
+
+        candidates += len(index.candidates(bitsets.matrix.user_index[int(user_id)]))
+        # Ties at the k-th similarity make neighbour identities ambiguous,
+        # so recall counts how many exact similarity values were recovered.
+        exact_values = sorted(round(similarity, 9) for _, similarity in exact)
+        approx_values = sorted(round(similarity, 9) for _, similarity in approx)
+        relevant += len(exact_values)
+        hits += _multiset_overlap(exact_values, approx_values)
+
+    n = max(len(users), 1)
+    return {
+        'bands': bands,
+        'rows': rows,
+        'threshold': round(index.threshold, 4),
+        'build_seconds': round(build_seconds, 3),
+        'recall_at_k': round(hits / relevant, 4) if relevant else None,
+        'k': k,
+        'sampled_users': len(users),
+        'avg_candidates': round(candidates / n, 1),
+        'population': int(len(populated)),
+        'exact_ms': round(exact_seconds / n * 1000, 3),
+        'approx_ms': round(approx_seconds / n * 1000, 3),
+    }
+
+
+def _multiset_overlap(a, b):
+    i = j = overlap = 0
+    while i < len(a) and j < len(b):
+        if a[i] == b[j]:
+            overlap += 1
+            i += 1
+            j += 1
+        elif a[i] < b[j]:
+            i += 1
+        else:
+            j += 1
+    return overlap
+
+
+def _config(value):
+    bands, rows = value.lower().split('x')
+    return int(bands), int(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MinHash LSH recall against exact Jaccard')
+    parser.add_argument('--config', type=_config, action='append', help='BANDSxROWS, repeatable (default 64x2)')
+    parser.add_argument('--sample', type=int, default=500, help='users sampled per configuration')
+    parser.add_argument('--k', type=int, default=10, help='neighbours compared per user')
+    parser.add_argument('--plane', choices=PLANES, default='all')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with connect() as conn:
+        matrix = SkillMatrix.load(conn)
+    bitsets = SkillBitsets(matrix, args.plane)
+    logger.info('Loaded %d users x %d skills', *matrix.shape)
+
+    for bands, rows in args.config or [(64, 2)]:
+        print(json.dumps(recall_benchmark(bitsets, bands, rows, args.sample, args.k)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""The live recommendation model and its incremental updates.
+
+``RecommenderModel`` bundles a SkillMatrix with every index built on it.
+Change events are applied in place: new user_skills rows go into the
+matrix overlay (which the reciprocal index reads directly), the owner's
+ranked postings, the category statistics, the autocomplete index and the
+trending counters; new trades are counted towards trending skills; rating
+or trade changes re-score the affected user. The similarity bitsets, the
+LSH index, the trade factors and related skills only catch up on the
+next full reload.
+"""
+import numpy as np
+
+from autocomplete import SkillAutocomplete
+from collaborative import TradeFactors
+from matrix import PROFICIENCY_LEVELS, SkillMatrix
+from minhash import MinHashLSH
+from reciprocal import ReciprocalIndex
+from recommender import SkillRecommender
+from related import RelatedSkills
+from similarity import SkillBitsets
+from trending import TrendingSkills
+
+
+class RecommenderModel:
+    def __init__(self, matrix, trending, factors=None, related=None, lsh_min_users=100000, lsh_bands=64, lsh_rows=2):
+        bitsets = SkillBitsets(matrix)
+        # Exact one-vs-all search is linear in users; switch to LSH at scale
+        lsh = MinHashLSH(bitsets, lsh_bands, lsh_rows) if matrix.shape[0] >= lsh_min_users else None
+        self._assemble(matrix, trending, SkillRecommender(matrix, factors, related), bitsets, lsh)
+
+    def _assemble(self, matrix, trending, recommender, bitsets, lsh):
+        self.matrix = matrix
+        self.trending = trending
+        self.recommender = recommender
+        self.reciprocal = ReciprocalIndex(matrix)
+        self.autocomplete = SkillAutocomplete(matrix)
+        self.bitsets = bitsets
+        self.lsh = lsh
+        self.applied_events = 0
+        # The Snapshot this model was mapped from, if any
+        self.snapshot = None
+
+    @classmethod
+    def load(cls, conn, factor_options=None, **options):
+        matrix = SkillMatrix.load(conn)
+        factors = TradeFactors.load(conn, matrix, **(factor_options or {}))
+        return cls(matrix, TrendingSkills.load(conn), factors, RelatedSkills.load(conn, matrix), **options)
+
+    @classmethod
+    def from_parts(cls, matrix, trending, recommender, bitsets, lsh=None):
+        """Assemble a model from indexes that are already built, e.g. restored from a snapshot."""
+        model = cls.__new__(cls)
+        model._assemble(matrix, trending, recommender, bitsets, lsh)
+        return model
+
+    @property
+    def version(self):
+        return self.matrix.version
+
+    def add_user_skill(self, user, skill, skill_type, level, user_skill_id=None):
+        """Apply a new user_skills row; returns False if it was already known.
+
+        ``user`` is (user_id, username, full_name) optionally followed by
+        (latitude, longitude), and ``skill`` is (skill_id, name, category).
+        """
+        if user_skill_id is not None:
+            self.trending.add_user_skill(user_skill_id, *skill)
+        m = self.matrix
+        with m.lock:
+            row = m.add_user(*user)
+            col = m.add_skill(*skill)
+            if not m.add_entry(row, col, skill_type, PROFICIENCY_LEVELS.index(level) + 1):
+                return False
+            self.recommender.categories.add_entry(row, col, skill_type)
+            self.autocomplete.add_entry(col)
+            self.recommender.refresh_user(row)
+            self.applied_events += 1
+        return True
+
+    def update_user_stats(self, user_id, rating, trades):
+        """Replace a user's average rating and completed trade count."""
+        m = self.matrix
+        with m.lock:
+            row = m.user_index.get(int(user_id))
+            if row is None:
+                return False
+            m.user_rating[row] = np.nan if rating is None else float(rating)
+            m.total_trades[row] = trades
+            self.recommender.refresh_user(row)
+            self.applied_events += 1
+        return True
+
+    def add_trade(self, trade_id, requester_skill_id, provider_skill_id, created_at=None):
+        """Count a newly created trade towards trending skills."""
+        if not self.trending.add_trade(trade_id, requester_skill_id, provider_skill_id, created_at):
+            return False
+        self.applied_events += 1
+        return True
@@ -0,0 +1,131 @@
+"""Check SkillRecommender against the scoring loop it replaced.
+
+``legacy_ranking`` is a line-by-line port of the loop in the Express
+backend's ``getRecommendations`` before the AI service took over: +10 when
+a candidate offers a skill the user seeks, +8 when they seek one the user
+offers, otherwise +3 for a skill in one of the user's categories, then
+rating x 2, min(trades x 0.5, 10) and +2 / +1 for expert / intermediate,
+keeping each candidate's best entry and sorting by score. Two things differ
+from the SQL era on purpose: every user_skills row matching the WHERE
+clause is scored instead of the LIMIT 20 cut, and rows are visited by user
+id, so the stable sort breaks ties by user id as the recommender does.
+
+The recommender runs with cross-category matches switched off, since the
+old loop had none. Every user of a fixed synthetic population is checked
+at several limits; the first mismatch is printed and the exit status is 1:
+
+    python parity.py
+    python parity.py --users 2000 --seed 7
+"""
+import argparse
+import math
+import sys
+
+import numpy as np
+
+from benchmark import synthetic_population
+from categories import CategoryStats
+from matrix import SkillMatrix
+from recommender import SkillRecommender
+
+LIMITS = (1, 5, 10, 50)
+
+
+class OwnCategoriesOnly(CategoryStats):
+    """No affinity to other categories: only the user's own score +3."""
+
+    def affinity(self, categories):
+        return np.zeros(len(self.skill_counts))
+
+
+def legacy_ranking(population, user_id):
+    """Every matching candidate as (user_id, score), best first."""
+    skills = {skill_id: (name, category) for skill_id, name, category in population['skills']}
+    ratings = dict(population['ratings'])
+    trades = dict(population['trade_counts'])
+    rows = sorted(
+        (owner, user_skill_id, *skills[skill_id], skill_type, level)
+        for user_skill_id, owner, skill_id, skill_type, level in population['user_skills']
+    )
+
+    user_skills = [row for row in rows if row[0] == user_id]
+    offering_skills = [name for _, _, name, _, skill_type, _ in user_skills if skill_type == 'offering']
+    seeking_skills = [name for _, _, name, _, skill_type, _ in user_skills if skill_type == 'seeking']
+    user_categories = list(dict.fromkeys(category for _, _, _, category, _, _ in user_skills))
+
+    potential_matches = [
+        (owner, name, category, skill_type, level)
+        for owner, _, name, category, skill_type, level in rows
+        if owner != user_id and (
+            (skill_type == 'offering' and name in seeking_skills)
+            or (skill_type == 'seeking' and name in offering_skills)
+            or category in user_categories
+        )
+    ]
+
+    user_scores = {}
+    for match_user, skill_name, category, skill_type, proficiency_level in potential_matches:
+        score = 0
+
+        if skill_type == 'offering' and skill_name in seeking_skills:
+            score += 10
+        elif skill_type == 'seeking' and skill_name in offering_skills:
+            score += 8
+        elif category in user_categories:
+            score += 3
+
+        user_rating = ratings.get(match_user)
+        if user_rating:
+            score += user_rating * 2
+        score += min(trades.get(match_user, 0) * 0.5, 10)
+
+        if proficiency_level == 'expert':
+            score += 2
+        if proficiency_level == 'intermediate':
+            score += 1
+
+        if match_user not in user_scores or user_scores[match_user] < score:
+            user_scores[match_user] = score
+
+    ranked = sorted(user_scores.items(), key=lambda item: -item[1])
+    return [(match_user, float(score)) for match_user, score in ranked]
+
+
+def same_ranking(served, expected):
+    return len(served) == len(expected) and all(
+        served_id == expected_id and math.isclose(served_score, expected_score, abs_tol=1e-9)
+        for (served_id, served_score), (expected_id, expected_score) in zip(served, expected)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check recommendations against the legacy scoring loop')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=13)
+    args = parser.parse_args()
+
+    population = synthetic_population(args.users, seed=args.seed, now=0)
+    matrix = SkillMatrix(
+        population['users'], population['skills'], (row[1:] for row in population['user_skills']),
+        population['ratings'], population['trade_counts'],
+    )
+    recommender = SkillRecommender(matrix)
+    recommender.categories = OwnCategoriesOnly(matrix)
+
+    checked = 0
+    for user_id, *_ in population['users']:
+        expected = legacy_ranking(population, user_id)
+        for limit in LIMITS:
+            served = [(r['user_id'], r['score']) for r in recommender.get_recommendations(user_id, limit)]
+            if not same_ranking(served, expected[:limit]):
+                print(f'Mismatch for user {user_id} at limit {limit}')
+                print(f'  served:   {served}')
+                print(f'  expected: {expected[:limit]}')
+                return 1
+            checked += 1
+    print(f'{checked} rankings of {args.users} users match the legacy loop')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
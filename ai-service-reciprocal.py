@@ -0,0 +1,62 @@
+"""Inverted offering <-> seeking index for two-sided skill swaps.
+
+Postings map each skill to the users offering it and the users seeking it.
+A reciprocal match for user U is anyone who offers at least one skill U
+seeks *and* seeks at least one skill U offers. Matches are found by walking
+only the postings of U's own skills and are ranked by total overlap, with
+no candidate truncation.
+
+The postings are the column-major planes of the SkillMatrix (plus its
+overlay of newly added skills), so the index holds no per-entry objects of
+its own and sees new skills as soon as the matrix does.
+"""
+import numpy as np
+
+
+class ReciprocalIndex:
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def _count(self, cols, skill_type):
+        """Users holding any of ``cols`` as (rows, number of cols held)."""
+        postings = [self.matrix.skill_rows(skill_type, col) for col in cols.tolist()]
+        if not postings:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(postings), return_counts=True)
+
+    def reciprocal_matches(self, user_id, limit=None):
+        """Rank users who can both teach and learn from ``user_id``.
+
+        Each match lists the skills they offer that the user seeks and the
+        skills they seek that the user offers.
+        """
+        m = self.matrix
+        with m.lock:
+            row = m.user_index.get(int(user_id))
+            if row is None:
+                return []
+            offers, _ = m.row_skills('offering', row)
+            seeks, _ = m.row_skills('seeking', row)
+            teachers, teach_counts = self._count(seeks, 'offering')
+            learners, learn_counts = self._count(offers, 'seeking')
+            rows, teach_at, learn_at = np.intersect1d(teachers, learners, assume_unique=True, return_indices=True)
+            keep = rows != row
+            rows, teach_counts, learn_counts = rows[keep], teach_counts[teach_at][keep], learn_counts[learn_at][keep]
+            if len(rows) == 0:
+                return []
+
+            order = np.lexsort((m.user_ids[rows], -np.minimum(teach_counts, learn_counts), -(teach_counts + learn_counts)))
+            if limit is not None:
+                order = order[:limit]
+
+            matches = []
+            for i in order.tolist():
+                they_offer, _ = m.row_skills('offering', rows[i])
+                they_seek, _ = m.row_skills('seeking', rows[i])
+                matches.append({
+                    'user_id': int(m.user_ids[rows[i]]),
+                    'they_offer': sorted(m.skill_ids[np.intersect1d(they_offer, seeks)].tolist()),
+                    'they_seek': sorted(m.skill_ids[np.intersect1d(they_seek, offers)].tolist()),
+                    'overlap': int(teach_counts[i] + learn_counts[i]),
+                })
+            return matches
@@ -0,0 +1,345 @@
+"""Content-based skill recommendations served from a SkillMatrix.
+
+Scoring mirrors ``SkillRecommender.getRecommendations`` in the Express
+backend: +10 when a candidate offers a skill the user seeks, +8 when they
+seek a skill the user offers, +3 for any other skill in one of the user's
+categories, then rating x 2, min(trades x 0.5, 10) and a proficiency bonus.
+Each candidate user is represented by their best scoring skill.
+
+Skills in other categories match through ``CategoryStats`` (categories.py):
+CATEGORY_SCORE x the share of offerers of the user's offered categories
+who also seek that category, when the share is at least MIN_AFFINITY. Like
+the flat category weight it is the same for every entry of a category.
+
+Every match kind adds a constant weight to a per-entry score that does not
+depend on the requesting user, so postings are pre-sorted by that score
+(per skill for exact matches, per category for category matches). The top
+``limit + 1`` users of each relevant list are guaranteed to contain the
+final top ``limit``, which keeps a request independent of population size.
+Users whose entries changed since the lists were sorted are tracked in a
+per-list overlay, and users whose score dropped widen every head by one.
+The candidates' entries are then scored as arrays, reduced to each user's
+best entry without sorting, and only the top ``limit`` users are ordered.
+
+With ``TradeFactors`` (collaborative.py) every matched entry also gets
+COLLABORATIVE_WEIGHT x the user's predicted preference for its skill. That
+is constant along an exact-match list, so those heads still suffice, but
+varies within a category list: once the heads are scored, each category
+list is read further down to every entry that could still reach the k-th
+best total given the highest preference in that category. Postings keep
+their sort scores for this. Users without factors are scored as before.
+
+With ``RelatedSkills`` (related.py) an offered skill that is related to one
+the user seeks matches with RELATED_SCORE x their similarity, unless a
+category or exact match weighs more. The weight is the same for every
+offer of that skill, so its list is read like an exact-match list.
+
+Location options use the GeoGrid over users' coordinates. ``within_km``
+replaces the postings with every user inside the radius; ``boost_km`` adds
+the users inside it to the candidates and PROXIMITY_SCORE to their
+entries, so scores of everyone else are unchanged and the heads still
+suffice for them.
+"""
+import heapq
+from collections import defaultdict
+
+import numpy as np
+
+from categories import CategoryStats
+from geo import GeoGrid, haversine_km
+from matrix import PROFICIENCY_LEVELS, SKILL_TYPES
+
+EXACT_OFFER_SCORE = 10
+EXACT_SEEK_SCORE = 8
+CATEGORY_SCORE = 3
+# Cross-category matches below this share of co-occurring users are noise
+MIN_AFFINITY = 0.05
+RATING_WEIGHT = 2
+TRADE_WEIGHT = 0.5
+MAX_TRADE_BONUS = 10
+PROXIMITY_SCORE = 5
+RELATED_SCORE = 6
+COLLABORATIVE_WEIGHT = 4
+# Covers float32 rounding of the stored posting scores
+SCORE_MARGIN = 1e-3
+
+
+class RankedPostings:
+    """CSR-style lists of user rows, each sorted by descending entry score.
+
+    ``extra`` holds current scores for users whose entries changed after the
+    lists were built (key -> {row: score}); they are merged in by ``head``.
+    """
+
+    def __init__(self, keys, rows, scores, user_ids, n_keys):
+        order = np.lexsort((user_ids[rows], -scores, keys))
+        self.rows = rows[order]
+        self.scores = scores[order].astype(np.float32)
+        self.indptr = np.zeros(n_keys + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=n_keys), out=self.indptr[1:])
+        self.extra = defaultdict(dict)
+
+    def head(self, key, k, slack=0):
+        rows = self.rows[0:0]
+        if key < len(self.indptr) - 1:
+            start = self.indptr[key]
+            rows = self.rows[start:min(start + k + slack, self.indptr[key + 1])]
+        extra = self.extra.get(key)
+        if extra:
+            top = heapq.nlargest(k, extra.items(), key=lambda item: (item[1], -item[0]))
+            rows = np.concatenate([rows, [row for row, _ in top]]).astype(self.rows.dtype)
+        return rows
+
+    def above(self, key, threshold):
+        """Every row of a list whose score may be ``threshold`` or more."""
+        rows = self.rows[0:0]
+        if key < len(self.indptr) - 1:
+            start, end = self.indptr[key], self.indptr[key + 1]
+            count = np.searchsorted(-self.scores[start:end], SCORE_MARGIN - threshold, side='right')
+            rows = self.rows[start:start + count]
+        extra = self.extra.get(key)
+        if extra:
+            rows = np.concatenate([rows, [row for row, score in extra.items() if score >= threshold]])
+        return rows.astype(self.rows.dtype)
+
+
+def top_k(scores, ids, k):
+    """Positions of the ``k`` highest scores, ties broken by ascending id, in rank order.
+
+    Only entries tied with or above the k-th best score are sorted.
+    """
+    if len(scores) > k:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        pick = np.flatnonzero(scores >= kth)
+    else:
+        pick = np.arange(len(scores))
+    return pick[np.lexsort((ids[pick], -scores[pick]))[:k]]
+
+
+def bonus_scores(rating, trades):
+    """Per-user part of the score: rating x 2 plus min(trades x 0.5, 10)."""
+    return np.nan_to_num(rating) * RATING_WEIGHT + np.minimum(trades * TRADE_WEIGHT, MAX_TRADE_BONUS)
+
+
+class SkillRecommender:
+    def __init__(self, matrix, factors=None, related=None):
+        self.matrix = m = matrix
+        # TradeFactors blended into the score and RelatedSkills expanding seeks, if any
+        self.factors = factors
+        self.related = related
+        self.user_bonus = bonus_scores(m.user_rating, m.total_trades)
+        self.base_bonus = self.user_bonus.copy()
+        # Users scored lower now than when the postings were sorted
+        self.demoted = set()
+        self.offer_postings = self._rank_plane(m.offering_by_skill)
+        self.seek_postings = self._rank_plane(m.seeking_by_skill)
+        self.category_postings = self._rank_categories()
+        # Users added after the build join the grid on the next reload
+        self.grid = GeoGrid(m.user_lat, m.user_lon)
+        self.categories = CategoryStats(m)
+
+    def _entry_scores(self, rows, levels):
+        return (levels - 1) + self.user_bonus[rows]
+
+    def _rank_plane(self, plane_by_skill):
+        keys = np.repeat(np.arange(plane_by_skill.shape[1]), np.diff(plane_by_skill.indptr))
+        rows = plane_by_skill.indices
+        scores = self._entry_scores(rows, plane_by_skill.data)
+        return RankedPostings(keys, rows, scores, self.matrix.user_ids, plane_by_skill.shape[1])
+
+    def _rank_categories(self):
+        m = self.matrix
+        rows, cols, levels = [], [], []
+        for plane in (m.offering, m.seeking):
+            coo = plane.tocoo()
+            rows.append(coo.row)
+            cols.append(coo.col)
+            levels.append(coo.data)
+        rows = np.concatenate(rows)
+        keys = m.skill_category[np.concatenate(cols)]
+        scores = self._entry_scores(rows, np.concatenate(levels))
+
+        # Keep each user's best entry per category
+        order = np.lexsort((-scores, rows, keys))
+        keys, rows, scores = keys[order], rows[order], scores[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+        return RankedPostings(keys[first], rows[first], scores[first], m.user_ids, len(m.categories))
+
+    def refresh_user(self, row):
+        """Re-score one user's postings after their skills or stats changed.
+
+        Call with the matrix lock held, after updating the matrix.
+        """
+        m = self.matrix
+        if row >= len(self.user_bonus):
+            self.user_bonus = np.resize(self.user_bonus, len(m.user_ids))
+        self.user_bonus[row] = bonus_scores(m.user_rating[row], m.total_trades[row])
+        if row < len(self.base_bonus) and self.user_bonus[row] < self.base_bonus[row]:
+            self.demoted.add(row)
+        else:
+            self.demoted.discard(row)
+
+        best_by_category = {}
+        for skill_type, postings in (('offering', self.offer_postings), ('seeking', self.seek_postings)):
+            cols, levels = m.row_skills(skill_type, row)
+            for col, score in zip(cols.tolist(), self._entry_scores(row, levels).tolist()):
+                postings.extra[col][row] = score
+                category = int(m.skill_category[col])
+                best_by_category[category] = max(best_by_category.get(category, score), score)
+        for category, score in best_by_category.items():
+            self.category_postings.extra[category][row] = score
+
+    def get_recommendations(self, user_id, limit=5, within_km=None, boost_km=None):
+        m = self.matrix
+        with m.lock:
+            row = m.user_index.get(int(user_id))
+            if row is None or limit <= 0:
+                return []
+
+            offered, _ = m.row_skills('offering', row)
+            sought, _ = m.row_skills('seeking', row)
+            category_weights = self._category_weights(offered, sought)
+            preference = self._preference(row)
+
+            # Match weight of every skill column, as an offer and as a seek
+            seek_weights = category_weights[m.skill_category]
+            offer_weights = seek_weights.copy()
+            expanded = self._expand(sought, offer_weights)
+            offer_weights[sought] = EXACT_OFFER_SCORE
+            seek_weights[offered] = EXACT_SEEK_SCORE
+
+            # Candidates: head of every list this user can match through
+            lat, lon = m.user_lat[row], m.user_lon[row]
+            if within_km is not None:
+                heads = [self.grid.within(lat, lon, within_km)[0]]
+            else:
+                k = limit + 1
+                slack = len(self.demoted)
+                heads = [self.offer_postings.head(col, k, slack) for col in np.concatenate([sought, expanded])]
+                heads += [self.seek_postings.head(col, k, slack) for col in offered]
+                heads += [self.category_postings.head(cat, k, slack) for cat in np.flatnonzero(category_weights)]
+            nearby = self.grid.within(lat, lon, boost_km)[0] if boost_km else None
+            if nearby is not None:
+                heads.append(nearby)
+            if not heads:
+                return []
+            candidates = np.unique(np.concatenate(heads))
+            candidates = candidates[candidates != row]
+            if len(candidates) == 0:
+                return []
+
+            match = (offer_weights, seek_weights, preference, nearby)
+            entries, totals, best = self._score(candidates, *match)
+            if preference is not None and within_km is None:
+                deeper = np.setdiff1d(self._category_tails(category_weights, preference, totals, limit),
+                                      np.append(candidates, row))
+                if len(deeper):
+                    candidates = np.union1d(candidates, deeper)
+                    entries, totals, best = self._score(candidates, *match)
+
+            users, skills, levels, types, scores = entries
+            scored = np.flatnonzero(best < len(scores))
+            ranked = scored[top_k(totals[scored], m.user_ids[candidates[scored]], limit)]
+            rows = candidates[ranked]
+            distances = haversine_km(lat, lon, m.user_lat[rows], m.user_lon[rows])
+            return [
+                self._format(best[i], users, skills, levels, types, totals[i], distance)
+                for i, distance in zip(ranked, distances)
+            ]
+
+    def _category_weights(self, offered, sought):
+        """Match weight of each category: flat for the user's own, by affinity for the rest."""
+        m = self.matrix
+        weights = CATEGORY_SCORE * self.categories.affinity(np.unique(m.skill_category[offered]))
+        weights[weights < CATEGORY_SCORE * MIN_AFFINITY] = 0
+        weights[m.skill_category[np.concatenate([offered, sought])]] = CATEGORY_SCORE
+        return weights
+
+    def _preference(self, row):
+        """Collaborative term per skill column for a user, or None without factors."""
+        if self.factors is None:
+            return None
+        predicted = self.factors.preferences(row, len(self.matrix.skill_ids))
+        return None if predicted is None else COLLABORATIVE_WEIGHT * predicted
+
+    def _expand(self, sought, offer_weights):
+        """Raise the offer weights of skills related to sought ones; returns their columns."""
+        if self.related is None or len(sought) == 0:
+            return sought[:0]
+        expanded = []
+        for col in sought.tolist():
+            cols, similarities = self.related.related(col)
+            offer_weights[cols] = np.maximum(offer_weights[cols], RELATED_SCORE * similarities)
+            expanded.append(cols)
+        return np.setdiff1d(np.concatenate(expanded), sought).astype(sought.dtype)
+
+    def _score(self, candidates, offer_weights, seek_weights, preference, nearby):
+        """Score the candidates' matching entries.
+
+        Returns the entry columns, each candidate's best total (-inf if
+        nothing matched) and the first entry reaching it.
+        """
+        users, skills, levels, types, scores = (
+            np.concatenate(parts) for parts in zip(
+                self._score_rows('offering', candidates, offer_weights, 0),
+                self._score_rows('seeking', candidates, seek_weights, 1),
+            )
+        )
+        if preference is not None:
+            scores = scores + preference[skills]
+        if nearby is not None and len(nearby):
+            scores = scores + np.where(np.isin(users, nearby), PROXIMITY_SCORE, 0)
+
+        # Best score per candidate user, then the first entry reaching it
+        slot = np.searchsorted(candidates, users)
+        totals = np.full(len(candidates), -np.inf)
+        np.maximum.at(totals, slot, scores)
+        reached = np.flatnonzero(scores == totals[slot])
+        best = np.full(len(candidates), len(scores))
+        np.minimum.at(best, slot[reached], reached)
+        return (users, skills, levels, types, scores), totals, best
+
+    def _category_tails(self, category_weights, preference, totals, limit):
+        """Category-list rows past the heads that could still reach the top ``limit``."""
+        reached = totals[totals > -np.inf]
+        if len(reached) < limit:
+            # The heads already held every row of every list
+            return self.category_postings.rows[0:0]
+        kth = np.partition(reached, len(reached) - limit)[len(reached) - limit]
+        m = self.matrix
+        ceiling = np.zeros(len(m.categories))
+        np.maximum.at(ceiling, m.skill_category, preference)
+        return np.concatenate([
+            self.category_postings.above(category, kth - category_weights[category] - ceiling[category])
+            for category in np.flatnonzero(category_weights)
+        ])
+
+    def _score_rows(self, skill_type, candidates, weights, type_code):
+        skills, levels, users = self.matrix.rows_entries(skill_type, candidates)
+        weight = weights[skills]
+        keep = weight > 0
+        users, skills, levels = users[keep], skills[keep], levels[keep]
+        scores = weight[keep] + self._entry_scores(users, levels)
+        types = np.full(len(users), type_code, dtype=np.int8)
+        return users, skills, levels, types, scores
+
+    def _format(self, entry, users, skills, levels, types, score, distance):
+        m = self.matrix
+        row = users[entry]
+        col = skills[entry]
+        rating = m.user_rating[row]
+        return {
+            'user_id': int(m.user_ids[row]),
+            'username': m.usernames[row],
+            'full_name': m.full_names[row],
+            'skill_id': int(m.skill_ids[col]),
+            'skill_name': m.skill_names[col],
+            'category': m.categories[m.skill_category[col]],
+            'skill_type': SKILL_TYPES[types[entry]],
+            'proficiency_level': PROFICIENCY_LEVELS[levels[entry] - 1],
+            'user_rating': None if np.isnan(rating) else float(rating),
+            'total_trades': int(m.total_trades[row]),
+            'score': float(score),
+            'distance_km': None if np.isnan(distance) else round(float(distance), 1),
+        }
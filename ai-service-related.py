@@ -0,0 +1,213 @@
+"""Related skills from TF-IDF vectors over skill text.
+
+Each skill's text is its name (counted NAME_WEIGHT times), its
+``skills.description`` and every ``user_skills.description`` written about
+it. The build streams both tables and folds tokens into sparse skill x term
+counts chunk by chunk, so memory follows the number of distinct (skill,
+term) pairs rather than the size of the descriptions. Counts become
+sublinear TF-IDF vectors; cosine similarities are computed for blocks of
+skills against all of them, and the TOP_N most similar skills of each are
+written to the ``skill_similarities`` table:
+
+    python related.py build --top 10
+
+``RelatedSkills`` loads that table into CSR arrays, so the related skills of
+one skill are a slice lookup. The recommender uses them to expand a user's
+sought skills.
+"""
+import argparse
+import logging
+import re
+import time
+from itertools import islice
+
+import numpy as np
+from scipy import sparse
+
+from db import connect, stream
+from matrix import _id_lookup
+
+TOP_N = 10
+MIN_SIMILARITY = 0.1
+NAME_WEIGHT = 3
+# Terms in more than this share of skills carry no signal
+MAX_DF = 0.5
+COMPACT_EVERY = 1 << 20
+BLOCK_SKILLS = 1024
+INSERT_CHUNK = 5000
+
+TOKEN = re.compile(r'[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*')
+STOP_WORDS = frozenset("""
+    a an and are as at be by for from has have i in is it its my of on or our so that the their this to
+    using we with you your
+""".split())
+
+SKILL_TEXT_SQL = 'SELECT id, name, description FROM skills WHERE is_active = TRUE'
+
+USER_SKILL_TEXT_SQL = """
+    SELECT skill_id, description FROM user_skills
+    WHERE is_active = TRUE AND description IS NOT NULL AND description <> ''
+"""
+
+RELATED_SQL = 'SELECT skill_id, similar_skill_id, similarity FROM skill_similarities'
+
+INSERT_RELATED_SQL = 'INSERT INTO skill_similarities (skill_id, similar_skill_id, similarity) VALUES (%s, %s, %s)'
+
+logger = logging.getLogger('related')
+
+
+def tokenize(text):
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class TermCounts:
+    """Skill x term counts accumulated from streamed text."""
+
+    def __init__(self):
+        self.skill_ids = []
+        self.skill_rows = {}
+        self.vocabulary = {}
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._rows, self._terms, self._weights = [], [], []
+
+    def add(self, skill_id, text, weight=1):
+        if not text:
+            return
+        row = self.skill_rows.get(skill_id)
+        if row is None:
+            row = self.skill_rows[skill_id] = len(self.skill_ids)
+            self.skill_ids.append(skill_id)
+        vocabulary = self.vocabulary
+        for token in tokenize(text):
+            term = vocabulary.get(token)
+            if term is None:
+                term = vocabulary[token] = len(vocabulary)
+            self._rows.append(row)
+            self._terms.append(term)
+            self._weights.append(weight)
+        if len(self._rows) >= COMPACT_EVERY:
+            self._compact()
+
+    def _compact(self):
+        """Fold pending tokens into the count matrix."""
+        shape = (len(self.skill_ids), len(self.vocabulary))
+        pending = sparse.csr_matrix((self._weights, (self._rows, self._terms)), shape=shape, dtype=np.float32)
+        counts = self.counts.copy()
+        counts.resize(shape)
+        self.counts = counts + pending
+        self._rows, self._terms, self._weights = [], [], []
+
+    def matrix(self):
+        self._compact()
+        return self.counts
+
+
+def tfidf(counts, max_df=MAX_DF):
+    """L2-normalised rows of (1 + log tf) x idf."""
+    n_skills = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log((1 + n_skills) / (1 + df)) + 1
+    idf[df > max(1, max_df * n_skills)] = 0
+    vectors = counts.tocsr(copy=True)
+    vectors.data = (1 + np.log(vectors.data)) * idf[vectors.indices]
+    vectors.eliminate_zeros()
+    norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ vectors
+
+
+def top_similar(vectors, top_n=TOP_N, min_similarity=MIN_SIMILARITY, block=BLOCK_SKILLS):
+    """Yield (row, similar_row, score) for each row's ``top_n`` nearest rows."""
+    by_term = vectors.T.tocsr()
+    for start in range(0, vectors.shape[0], block):
+        scores = (vectors[start:start + block] @ by_term).tocsr()
+        for offset in range(scores.shape[0]):
+            row = start + offset
+            lo, hi = scores.indptr[offset], scores.indptr[offset + 1]
+            cols, values = scores.indices[lo:hi], scores.data[lo:hi]
+            keep = (cols != row) & (values >= min_similarity)
+            cols, values = cols[keep], values[keep]
+            if len(values) > top_n:
+                pick = np.argpartition(-values, top_n)[:top_n]
+                cols, values = cols[pick], values[pick]
+            for i in np.lexsort((cols, -values)).tolist():
+                yield row, int(cols[i]), round(float(values[i]), 4)
+
+
+def build_related(skill_texts, user_skill_texts, top_n=TOP_N):
+    """(skill_id, similar_skill_id, score) rows from streamed skill text rows."""
+    counts = TermCounts()
+    for skill_id, name, description in skill_texts:
+        counts.add(skill_id, name, NAME_WEIGHT)
+        counts.add(skill_id, description)
+    for skill_id, description in user_skill_texts:
+        counts.add(skill_id, description)
+    matrix = counts.matrix()
+    logger.info('Counted %d terms over %d skills (%d pairs)', matrix.shape[1], matrix.shape[0], matrix.nnz)
+    ids = counts.skill_ids
+    for row, similar, score in top_similar(tfidf(matrix), top_n):
+        yield ids[row], ids[similar], score
+
+
+class RelatedSkills:
+    """Most similar skills per skill column, CSR-style, best first."""
+
+    def __init__(self, matrix, rows):
+        skill_cols = _id_lookup(matrix.skill_ids)
+        rows = np.array(list(rows), dtype=np.float64).reshape(-1, 3)
+        keys, cols = skill_cols(rows[:, 0]), skill_cols(rows[:, 1])
+        known = (keys >= 0) & (cols >= 0)
+        keys, cols, scores = keys[known], cols[known], rows[known, 2].astype(np.float32)
+        order = np.lexsort((-scores, keys))
+        self.cols = cols[order].astype(np.int32)
+        self.scores = scores[order]
+        self.indptr = np.zeros(len(matrix.skill_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=len(matrix.skill_ids)), out=self.indptr[1:])
+
+    @classmethod
+    def load(cls, conn, matrix):
+        with conn.cursor() as cursor:
+            cursor.execute(RELATED_SQL)
+            return cls(matrix, cursor.fetchall())
+
+    def related(self, col):
+        """Columns and similarities of the skills related to one column."""
+        if col >= len(self.indptr) - 1:
+            return self.cols[:0], self.scores[:0]
+        start, end = self.indptr[col], self.indptr[col + 1]
+        return self.cols[start:end], self.scores[start:end]
+
+
+def write_related(conn, rows):
+    """Replace the skill_similarities table in one transaction."""
+    rows = iter(rows)
+    written = 0
+    with conn.cursor() as cursor:
+        conn.begin()
+        cursor.execute('DELETE FROM skill_similarities')
+        while True:
+            chunk = list(islice(rows, INSERT_CHUNK))
+            if not chunk:
+                break
+            written += cursor.executemany(INSERT_RELATED_SQL, chunk)
+        conn.commit()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the related-skills table from skill descriptions')
+    parser.add_argument('command', choices=('build',))
+    parser.add_argument('--top', type=int, default=TOP_N, help='related skills kept per skill')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    started = time.perf_counter()
+    # Both text streams are consumed before the first row is written
+    with connect() as reader, connect() as writer:
+        rows = build_related(stream(reader, SKILL_TEXT_SQL), stream(reader, USER_SKILL_TEXT_SQL), args.top)
+        written = write_related(writer, rows)
+    logger.info('Wrote %d related-skill rows in %.1fs', written, time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,475 @@
+"""Versioned on-disk snapshots of the recommendation model.
+
+A snapshot holds every array behind a RecommenderModel, so a worker can
+start serving by mapping one file instead of querying MySQL and rebuilding
+indexes. Layout:
+
+    magic      8 bytes   b'SKSWSNAP'
+    format     uint32    FORMAT_VERSION
+    length     uint32    size of the JSON header in bytes
+    header     JSON      model version, build time, CRC-32 of the data
+                         region and (dtype, shape, offset) for each array
+    padding    to ALIGNMENT
+    data       arrays, each starting on an ALIGNMENT boundary
+
+Files are mapped copy-on-write: pages are shared between every worker on
+the host until a worker applies an incremental update to one of them.
+String columns (user names) are stored as a UTF-8 blob plus offsets and
+decoded on access.
+
+Snapshots are written as ``model-<version>.snap`` under MODEL_PATH and the
+file name of the newest one is kept in ``CURRENT``:
+
+    python snapshot.py build        # query MySQL, write a new snapshot
+    python snapshot.py info         # header and age of the current one
+"""
+import argparse
+import fcntl
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+from scipy import sparse
+
+from categories import CategoryStats
+from collaborative import TradeFactors
+from geo import GeoGrid
+from matrix import SKILL_TYPES, SkillMatrix
+from minhash import MinHashLSH
+from model import RecommenderModel
+from recommender import RankedPostings, SkillRecommender
+from related import RelatedSkills
+from similarity import SkillBitsets
+from trending import TrendingSkills
+
+MAGIC = b'SKSWSNAP'
+FORMAT_VERSION = 3
+ALIGNMENT = 64
+PREAMBLE = struct.Struct('<8sII')
+CURRENT = 'CURRENT'
+KEEP_SNAPSHOTS = 3
+
+logger = logging.getLogger('snapshot')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class StringColumn:
+    """Read-only list of strings backed by a UTF-8 blob and offsets."""
+
+    __slots__ = ('blob', 'offsets', 'appended')
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+        self.appended = []
+
+    def __len__(self):
+        return len(self.offsets) - 1 + len(self.appended)
+
+    def __getitem__(self, i):
+        stored = len(self.offsets) - 1
+        if i >= stored:
+            return self.appended[i - stored]
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode()
+
+    def append(self, value):
+        self.appended.append(value)
+
+
+def _encode_strings(values):
+    encoded = [value.encode() for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+class SnapshotWriter:
+    def __init__(self):
+        self.arrays = {}
+        self.meta = {}
+
+    def array(self, name, values):
+        self.arrays[name] = np.ascontiguousarray(values)
+
+    def strings(self, name, values):
+        blob, offsets = _encode_strings(values)
+        self.array(f'{name}.blob', blob)
+        self.array(f'{name}.offsets', offsets)
+
+    def csr(self, name, matrix):
+        self.array(f'{name}.data', matrix.data)
+        self.array(f'{name}.indices', matrix.indices)
+        self.array(f'{name}.indptr', matrix.indptr)
+        self.meta[f'{name}.shape'] = list(matrix.shape)
+
+    def write(self, path, **header):
+        layout, offset, checksum = {}, 0, 0
+        for name, values in self.arrays.items():
+            layout[name] = {'dtype': values.dtype.str, 'shape': list(values.shape), 'offset': offset}
+            checksum = zlib.crc32(values.data.cast('B') if values.size else b'', checksum)
+            padding = -values.nbytes % ALIGNMENT
+            checksum = zlib.crc32(bytes(padding), checksum)
+            offset += values.nbytes + padding
+        header = json.dumps({**header, 'meta': self.meta, 'arrays': layout, 'crc32': checksum,
+                             'data_bytes': offset}).encode()
+
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            f.write(bytes(-f.tell() % ALIGNMENT))
+            for values in self.arrays.values():
+                f.write(values.data.cast('B') if values.size else b'')
+                f.write(bytes(-values.nbytes % ALIGNMENT))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+
+def _read_header(f, path):
+    magic, version, length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+    if magic != MAGIC:
+        raise SnapshotError(f'{path} is not a model snapshot')
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f'{path} has format {version}, expected {FORMAT_VERSION}')
+    return json.loads(f.read(length)), length
+
+
+class Snapshot:
+    """An opened snapshot file; arrays are copy-on-write views of the mapping."""
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.header, length = _read_header(f, path)
+        start = PREAMBLE.size + length
+        start += -start % ALIGNMENT
+        self.data = np.memmap(path, dtype=np.uint8, mode='c', offset=start, shape=(self.header['data_bytes'],))
+        if verify and zlib.crc32(self.data) != self.header['crc32']:
+            raise SnapshotError(f'{path} failed its checksum')
+        self.meta = self.header['meta']
+
+    @property
+    def built_at(self):
+        return self.header['built_at']
+
+    @property
+    def age(self):
+        return time.time() - self.built_at
+
+    def array(self, name):
+        spec = self.header['arrays'][name]
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        view = self.data[spec['offset']:spec['offset'] + count * dtype.itemsize]
+        return np.ndarray(spec['shape'], dtype=dtype, buffer=view)
+
+    def strings(self, name):
+        return StringColumn(self.array(f'{name}.blob'), self.array(f'{name}.offsets'))
+
+    def csr(self, name, fmt=sparse.csr_matrix):
+        arrays = (self.array(f'{name}.data'), self.array(f'{name}.indices'), self.array(f'{name}.indptr'))
+        return fmt(arrays, shape=tuple(self.meta[f'{name}.shape']), copy=False)
+
+
+# Writing: one function per component, mirrored by the restore functions below
+
+def _write_matrix(w, m):
+    if any(m.delta[skill_type] for skill_type in SKILL_TYPES):
+        raise SnapshotError('cannot snapshot a matrix with incremental updates applied')
+    for name in ('user_ids', 'user_lat', 'user_lon', 'skill_ids', 'skill_category', 'user_rating', 'total_trades'):
+        w.array(f'matrix.{name}', getattr(m, name))
+    for name in ('usernames', 'full_names', 'skill_names', 'categories'):
+        w.strings(f'matrix.{name}', getattr(m, name))
+    for name in ('offering', 'seeking'):
+        w.csr(f'matrix.{name}', getattr(m, name))
+        w.csr(f'matrix.{name}_by_skill', getattr(m, f'{name}_by_skill'))
+    w.meta['matrix.built_at'] = m.built_at
+    w.meta['matrix.version'] = m.version
+
+
+def _write_recommender(w, r):
+    w.array('recommender.user_bonus', r.base_bonus)
+    for name in ('offer_postings', 'seek_postings', 'category_postings'):
+        postings = getattr(r, name)
+        w.array(f'recommender.{name}.rows', postings.rows)
+        w.array(f'recommender.{name}.indptr', postings.indptr)
+        w.array(f'recommender.{name}.scores', postings.scores)
+    w.array('recommender.grid.keys', r.grid.keys)
+    w.array('recommender.grid.rows', r.grid.rows)
+    w.meta['recommender.grid.cell_degrees'] = r.grid.cell_degrees
+    for name in ('skill_counts', 'offer_counts', 'seek_counts', 'user_counts', 'cooccurrence'):
+        w.array(f'categories.{name}', getattr(r.categories, name))
+    if r.factors is not None:
+        w.array('factors.user_factors', r.factors.user_factors)
+        w.array('factors.skill_factors', r.factors.skill_factors)
+        w.meta['factors'] = {'interactions': r.factors.interactions, 'train_seconds': r.factors.train_seconds}
+    if r.related is not None:
+        for name in ('indptr', 'cols', 'scores'):
+            w.array(f'related.{name}', getattr(r.related, name))
+
+
+def _write_bitsets(w, b):
+    w.csr('bitsets.sets', b.sets)
+    w.csr('bitsets.sets_t', b.sets_t)
+    w.array('bitsets.bits', b.bits)
+    w.array('bitsets.sizes', b.sizes)
+
+
+def _write_lsh(w, lsh):
+    for name in ('a', 'b', 'mix', 'keys', 'members'):
+        w.array(f'lsh.{name}', getattr(lsh, name))
+    w.meta['lsh.bands'] = lsh.bands
+    w.meta['lsh.rows'] = lsh.rows
+
+
+def _write_trending(w, t):
+    with t.lock:
+        w.array('trending.skill_ids', np.array(t.skill_ids, dtype=np.int64))
+        w.strings('trending.names', t.names)
+        w.strings('trending.categories', t.categories)
+        for name in ('user_counts', 'trade_counts', 'user_skill_cols'):
+            w.array(f'trending.{name}', getattr(t, name))
+        entries = sorted((bucket, col, count) for bucket, counts in t.buckets.items() for col, count in counts.items())
+        entries = np.array(entries, dtype=np.int64).reshape(-1, 3)
+        for i, name in enumerate(('bucket', 'col', 'count')):
+            w.array(f'trending.buckets.{name}', entries[:, i])
+        w.array('trending.trades.id', np.fromiter(t.trade_buckets.keys(), dtype=np.int64, count=len(t.trade_buckets)))
+        w.array('trending.trades.bucket', np.fromiter(t.trade_buckets.values(), dtype=np.int64, count=len(t.trade_buckets)))
+        w.meta['trending'] = {
+            'window': t.window, 'bucket_seconds': t.bucket_seconds,
+            'half_life': t.half_life, 'current': t.current,
+        }
+
+
+def write_snapshot(model, directory, built_at=None):
+    """Write ``model`` under ``directory`` and make it the current snapshot.
+
+    ``built_at`` is when its data was read from MySQL; change events received
+    after it are replayed onto workers that open the snapshot.
+    """
+    w = SnapshotWriter()
+    _write_matrix(w, model.matrix)
+    _write_recommender(w, model.recommender)
+    _write_bitsets(w, model.bitsets)
+    if model.lsh is not None:
+        _write_lsh(w, model.lsh)
+    _write_trending(w, model.trending)
+
+    name = f'model-{model.version}.snap'
+    w.write(os.path.join(directory, name), model_version=model.version,
+            built_at=model.matrix.built_at if built_at is None else built_at)
+    tmp = os.path.join(directory, f'{CURRENT}.tmp')
+    with open(tmp, 'w') as f:
+        f.write(name)
+    os.replace(tmp, os.path.join(directory, CURRENT))
+
+    # Open mappings keep their pages after unlink, so old files can go
+    for old in sorted(f for f in os.listdir(directory) if f.startswith('model-') and f.endswith('.snap'))[:-KEEP_SNAPSHOTS]:
+        os.remove(os.path.join(directory, old))
+    return os.path.join(directory, name)
+
+
+# Restoring
+
+def _restore_matrix(s):
+    m = SkillMatrix.__new__(SkillMatrix)
+    m.built_at = s.meta['matrix.built_at']
+    m.version = s.meta['matrix.version']
+    for name in ('user_ids', 'user_lat', 'user_lon', 'skill_ids', 'skill_category', 'user_rating', 'total_trades'):
+        setattr(m, name, s.array(f'matrix.{name}'))
+    m.usernames = s.strings('matrix.usernames')
+    m.full_names = s.strings('matrix.full_names')
+    m.skill_names = [sys.intern(name) for name in s.strings('matrix.skill_names')]
+    m.categories = [sys.intern(name) for name in s.strings('matrix.categories')]
+    m.user_index = dict(zip(m.user_ids.tolist(), range(len(m.user_ids))))
+    m.skill_index = dict(zip(m.skill_ids.tolist(), range(len(m.skill_ids))))
+    for name in ('offering', 'seeking'):
+        setattr(m, name, s.csr(f'matrix.{name}'))
+        setattr(m, f'{name}_by_skill', s.csr(f'matrix.{name}_by_skill', sparse.csc_matrix))
+    m.delta = {skill_type: {} for skill_type in SKILL_TYPES}
+    m.delta_by_skill = {skill_type: {} for skill_type in SKILL_TYPES}
+    m.lock = threading.RLock()
+    return m
+
+
+def _restore_recommender(s, matrix):
+    r = SkillRecommender.__new__(SkillRecommender)
+    r.matrix = matrix
+    r.base_bonus = s.array('recommender.user_bonus')
+    r.user_bonus = r.base_bonus.copy()
+    r.demoted = set()
+    for name in ('offer_postings', 'seek_postings', 'category_postings'):
+        postings = RankedPostings.__new__(RankedPostings)
+        postings.rows = s.array(f'recommender.{name}.rows')
+        postings.indptr = s.array(f'recommender.{name}.indptr')
+        postings.scores = s.array(f'recommender.{name}.scores')
+        postings.extra = defaultdict(dict)
+        setattr(r, name, postings)
+    r.grid = grid = GeoGrid.__new__(GeoGrid)
+    grid.lat, grid.lon = matrix.user_lat, matrix.user_lon
+    grid.cell_degrees = s.meta['recommender.grid.cell_degrees']
+    grid.columns = int(round(360 / grid.cell_degrees))
+    grid.keys = s.array('recommender.grid.keys')
+    grid.rows = s.array('recommender.grid.rows')
+    r.categories = categories = CategoryStats.__new__(CategoryStats)
+    categories.matrix = matrix
+    categories.n_skills = len(matrix.skill_ids)
+    for name in ('skill_counts', 'offer_counts', 'seek_counts', 'user_counts', 'cooccurrence'):
+        setattr(categories, name, s.array(f'categories.{name}'))
+    r.factors = None
+    if 'factors' in s.meta:
+        r.factors = factors = TradeFactors.__new__(TradeFactors)
+        factors.user_factors = s.array('factors.user_factors')
+        factors.skill_factors = s.array('factors.skill_factors')
+        for key, value in s.meta['factors'].items():
+            setattr(factors, key, value)
+    r.related = None
+    if 'related.indptr' in s.header['arrays']:
+        r.related = related = RelatedSkills.__new__(RelatedSkills)
+        for name in ('indptr', 'cols', 'scores'):
+            setattr(related, name, s.array(f'related.{name}'))
+    return r
+
+
+def _restore_bitsets(s, matrix):
+    b = SkillBitsets.__new__(SkillBitsets)
+    b.matrix = matrix
+    b.sets = s.csr('bitsets.sets')
+    b.sets_t = s.csr('bitsets.sets_t')
+    b.bits = s.array('bitsets.bits')
+    b.sizes = s.array('bitsets.sizes')
+    b.words = b.bits.shape[1]
+    return b
+
+
+def _restore_lsh(s, bitsets):
+    lsh = MinHashLSH.__new__(MinHashLSH)
+    lsh.bitsets = bitsets
+    lsh.bands = s.meta['lsh.bands']
+    lsh.rows = s.meta['lsh.rows']
+    lsh.num_perm = lsh.bands * lsh.rows
+    for name in ('a', 'b', 'mix', 'keys', 'members'):
+        setattr(lsh, name, s.array(f'lsh.{name}'))
+    return lsh
+
+
+def _restore_trending(s):
+    t = TrendingSkills.__new__(TrendingSkills)
+    for key, value in s.meta['trending'].items():
+        setattr(t, key, value)
+    t.skill_ids = s.array('trending.skill_ids').tolist()
+    t.names = [sys.intern(name) for name in s.strings('trending.names')]
+    t.categories = [sys.intern(name) for name in s.strings('trending.categories')]
+    t.skill_index = {skill_id: i for i, skill_id in enumerate(t.skill_ids)}
+    for name in ('user_counts', 'trade_counts', 'user_skill_cols'):
+        setattr(t, name, s.array(f'trending.{name}'))
+    t.lock = threading.Lock()
+    buckets, cols, counts = (s.array(f'trending.buckets.{name}') for name in ('bucket', 'col', 'count'))
+    starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+    t.buckets = {
+        bucket: Counter(dict(zip(cols[start:end].tolist(), counts[start:end].tolist())))
+        for bucket, start, end in zip(buckets[starts].tolist(), starts.tolist(), [*starts[1:].tolist(), len(buckets)])
+    }
+    t.trade_buckets = dict(zip(s.array('trending.trades.id').tolist(), s.array('trending.trades.bucket').tolist()))
+    t._ranking = None
+    return t
+
+
+def open_snapshot(path, verify=True):
+    """Map a snapshot file into a ready-to-serve RecommenderModel."""
+    s = Snapshot(path, verify)
+    matrix = _restore_matrix(s)
+    bitsets = _restore_bitsets(s, matrix)
+    lsh = _restore_lsh(s, bitsets) if 'lsh.keys' in s.header['arrays'] else None
+    model = RecommenderModel.from_parts(matrix, _restore_trending(s), _restore_recommender(s, matrix), bitsets, lsh)
+    model.snapshot = s
+    return model
+
+
+def current_snapshot(directory):
+    """Path of the current snapshot in ``directory``, or None."""
+    try:
+        with open(os.path.join(directory, CURRENT)) as f:
+            path = os.path.join(directory, f.read().strip())
+    except FileNotFoundError:
+        return None
+    return path if os.path.exists(path) else None
+
+
+def snapshot_built_at(path):
+    """Build time recorded in a snapshot header, without mapping the data.
+
+    Raises SnapshotError for files this release cannot open.
+    """
+    with open(path, 'rb') as f:
+        return _read_header(f, path)[0]['built_at']
+
+
+@contextmanager
+def builder_lock(directory, wait=False):
+    """Exclusive lock so one process on the host builds at a time.
+
+    Yields False without waiting if another process holds it, unless ``wait``.
+    """
+    with open(os.path.join(directory, '.build.lock'), 'w') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def main():
+    from db import connect
+
+    parser = argparse.ArgumentParser(description='Build or inspect model snapshots')
+    parser.add_argument('command', choices=('build', 'info'))
+    parser.add_argument('--path', default=os.environ.get('MODEL_PATH', 'models'))
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes training the trade factors')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'build':
+        started, built_at = time.perf_counter(), time.time()
+        with connect() as conn:
+            model = RecommenderModel.load(conn, factor_options={'workers': args.workers})
+        built = time.perf_counter()
+        os.makedirs(args.path, exist_ok=True)
+        path = write_snapshot(model, args.path, built_at)
+        logger.info('Built model %s in %.1fs, wrote %s (%.1f MB) in %.1fs', model.version, built - started,
+                    path, os.path.getsize(path) / 2 ** 20, time.perf_counter() - built)
+        return
+
+    path = current_snapshot(args.path)
+    if path is None:
+        sys.exit(f'No snapshot in {args.path}')
+    started = time.perf_counter()
+    model = open_snapshot(path)
+    print(json.dumps({
+        'path': path,
+        'model_version': model.version,
+        'age_seconds': round(model.snapshot.age, 1),
+        'bytes': os.path.getsize(path),
+        'arrays': len(model.snapshot.header['arrays']),
+        'open_seconds': round(time.perf_counter() - started, 3),
+    }))
+
+
+if __name__ == '__main__':
+    main()
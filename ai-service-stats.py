@@ -0,0 +1,118 @@
+"""Backfill and repair of the user_stats table.
+
+Triggers keep user_stats current as trades and reviews change (see
+database-init.sql). This job recomputes it from those tables in batches of
+users, for the initial backfill and after changes that bypass the
+triggers, such as foreign-key cascades when users are deleted:
+
+    python stats.py repair --batch 1000
+
+Each batch locks its users' user_stats rows before reading the source
+tables, so trigger updates from concurrent writes wait for the batch to
+commit and then apply on top of the recomputed values. Only rows that
+differ are written.
+"""
+import argparse
+import logging
+import time
+
+from db import connect
+
+BATCH_USERS = 1000
+
+USER_IDS_SQL = 'SELECT id FROM users WHERE id > %s ORDER BY id LIMIT %s'
+
+LOCK_STATS_SQL = """
+    SELECT user_id, rating_sum, review_count, completed_as_requester, completed_as_provider
+    FROM user_stats WHERE user_id BETWEEN %s AND %s
+    FOR UPDATE
+"""
+
+# (sql, first counter column filled) per source aggregate
+SOURCE_SQL = (
+    ("""SELECT reviewee_id, SUM(rating), COUNT(*) FROM reviews
+        WHERE reviewee_id BETWEEN %s AND %s GROUP BY reviewee_id""", 0),
+    ("""SELECT requester_id, COUNT(*) FROM trades
+        WHERE status = 'completed' AND requester_id BETWEEN %s AND %s GROUP BY requester_id""", 2),
+    ("""SELECT provider_id, COUNT(*) FROM trades
+        WHERE status = 'completed' AND provider_id BETWEEN %s AND %s GROUP BY provider_id""", 3),
+)
+
+UPSERT_STATS_SQL = """
+    INSERT INTO user_stats (user_id, rating_sum, review_count, completed_as_requester, completed_as_provider)
+    VALUES (%s, %s, %s, %s, %s) AS fresh
+    ON DUPLICATE KEY UPDATE
+        rating_sum = fresh.rating_sum,
+        review_count = fresh.review_count,
+        completed_as_requester = fresh.completed_as_requester,
+        completed_as_provider = fresh.completed_as_provider
+"""
+
+EMPTY = (0, 0, 0, 0)
+
+logger = logging.getLogger('stats')
+
+
+def repair_batch(cursor, user_ids, dry_run=False):
+    """Recompute the counters of ``user_ids`` (ascending); returns the rows that differed."""
+    first, last = user_ids[0], user_ids[-1]
+    cursor.execute(LOCK_STATS_SQL, (first, last))
+    current = {row[0]: tuple(int(value) for value in row[1:]) for row in cursor.fetchall()}
+    fresh = {user_id: list(EMPTY) for user_id in user_ids}
+    for sql, column in SOURCE_SQL:
+        cursor.execute(sql, (first, last))
+        for user_id, *values in cursor.fetchall():
+            if user_id in fresh:
+                fresh[user_id][column:column + len(values)] = [int(value) for value in values]
+    changed = [
+        (user_id, *values) for user_id, values in fresh.items()
+        if tuple(values) != current.get(user_id, EMPTY)
+    ]
+    if changed and not dry_run:
+        cursor.executemany(UPSERT_STATS_SQL, changed)
+    return changed
+
+
+def repair(conn, batch=BATCH_USERS, dry_run=False):
+    """Walk every user in id order; returns (users checked, rows repaired)."""
+    checked = repaired = 0
+    after = 0
+    with conn.cursor() as cursor:
+        while True:
+            cursor.execute(USER_IDS_SQL, (after, batch))
+            user_ids = [row[0] for row in cursor.fetchall()]
+            if not user_ids:
+                break
+            conn.begin()
+            try:
+                changed = repair_batch(cursor, user_ids, dry_run)
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+            checked += len(user_ids)
+            repaired += len(changed)
+            after = user_ids[-1]
+            if changed:
+                logger.info('Users %d-%d: %d rows %s', user_ids[0], after, len(changed),
+                            'differ' if dry_run else 'repaired')
+    return checked, repaired
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute user_stats from trades and reviews')
+    parser.add_argument('command', choices=('repair',))
+    parser.add_argument('--batch', type=int, default=BATCH_USERS, help='users per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='report differences without writing')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    started = time.perf_counter()
+    with connect() as conn:
+        checked, repaired = repair(conn, args.batch, args.dry_run)
+    logger.info('Checked %d users, %d rows %s in %.1fs', checked, repaired,
+                'differ' if args.dry_run else 'repaired', time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Incrementally maintained trending skills.
+
+Mirrors ``SkillRecommender.getTrendingSkills`` in the Express backend:
+``trend_score = user_count * 0.3 + trade_count``, where ``user_count`` is
+the number of active user_skills rows for a skill and ``trade_count`` the
+number of trades created in the last 30 days with that skill on either
+side. Only skills with at least one active user_skills row are ranked.
+
+Trades are counted into fixed time buckets (hourly by default) covering the
+window. Events add to the running totals directly; when the clock moves
+into a new bucket, expired buckets are dropped and the totals recomputed
+from the rest. With a half-life set, each bucket counts
+``0.5 ** (age / half_life)`` instead of 1 to favour very recent activity.
+The ranking is only re-sorted after a change, so serving a request is a
+slice of the first ``limit`` entries.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+USER_WEIGHT = 0.3
+WINDOW_SECONDS = int(os.environ.get('TRENDING_WINDOW_DAYS', 30)) * 86400
+BUCKET_SECONDS = int(os.environ.get('TRENDING_BUCKET_SECONDS', 3600))
+HALF_LIFE = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 0)) * 3600 or None
+
+SKILLS_SQL = 'SELECT id, name, category FROM skills WHERE is_active = TRUE'
+
+USER_SKILLS_SQL = 'SELECT id, skill_id FROM user_skills WHERE is_active = TRUE'
+
+USER_SKILL_SQL = """
+    SELECT us.id, s.id, s.name, s.category
+    FROM user_skills us
+    JOIN skills s ON us.skill_id = s.id
+    WHERE us.id = %s AND us.is_active = TRUE AND s.is_active = TRUE
+"""
+
+RECENT_TRADES_SQL = """
+    SELECT id, requester_skill_id, provider_skill_id, UNIX_TIMESTAMP(created_at)
+    FROM trades
+    WHERE created_at >= DATE_SUB(NOW(), INTERVAL %s SECOND)
+"""
+
+
+class TrendingSkills:
+    def __init__(self, skills, user_skills, trades=(), now=None,
+                 window=WINDOW_SECONDS, bucket_seconds=BUCKET_SECONDS, half_life=HALF_LIFE):
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.half_life = half_life
+
+        self.skill_ids = [row[0] for row in skills]
+        self.names = [sys.intern(row[1]) for row in skills]
+        self.categories = [sys.intern(row[2]) for row in skills]
+        self.skill_index = {skill_id: i for i, skill_id in enumerate(self.skill_ids)}
+        self.user_counts = np.zeros(len(self.skill_ids), dtype=np.int64)
+        self.trade_counts = np.zeros(len(self.skill_ids))
+        self.lock = threading.Lock()
+
+        # user_skills.id -> skill column, -1 for unknown or inactive rows
+        self.user_skill_cols = np.full(max((row[0] for row in user_skills), default=0) + 1, -1, dtype=np.int32)
+        for user_skill_id, skill_id in user_skills:
+            col = self.skill_index.get(skill_id)
+            if col is not None:
+                self.user_skill_cols[user_skill_id] = col
+                self.user_counts[col] += 1
+
+        self.current = self._bucket(time.time() if now is None else now)
+        self.buckets = {}
+        self.trade_buckets = {}
+        for trade_id, requester_skill_id, provider_skill_id, created_at in trades:
+            self._count_trade(trade_id, requester_skill_id, provider_skill_id, self._bucket(float(created_at)))
+        self._recompute()
+
+    @classmethod
+    def load(cls, conn, **options):
+        """Build counters from the current database contents."""
+        with conn.cursor() as cursor:
+            cursor.execute(SKILLS_SQL)
+            skills = cursor.fetchall()
+            cursor.execute(USER_SKILLS_SQL)
+            user_skills = cursor.fetchall()
+            cursor.execute(RECENT_TRADES_SQL, (options.get('window', WINDOW_SECONDS),))
+            trades = cursor.fetchall()
+        return cls(skills, user_skills, trades, **options)
+
+    def _bucket(self, timestamp):
+        return int(timestamp // self.bucket_seconds)
+
+    def _weight(self, bucket):
+        if self.half_life is None:
+            return 1.0
+        return 0.5 ** ((self.current - bucket) * self.bucket_seconds / self.half_life)
+
+    def _oldest(self):
+        return self.current - self.window // self.bucket_seconds + 1
+
+    def _count_trade(self, trade_id, requester_skill_id, provider_skill_id, bucket):
+        """Add a trade to its bucket; returns the skill columns counted."""
+        if trade_id in self.trade_buckets or not self._oldest() <= bucket <= self.current:
+            return []
+        cols = [
+            int(self.user_skill_cols[user_skill_id])
+            for user_skill_id in (requester_skill_id, provider_skill_id)
+            if self.knows_user_skill(user_skill_id)
+        ]
+        self.buckets.setdefault(bucket, Counter()).update(cols)
+        self.trade_buckets[trade_id] = bucket
+        return cols
+
+    def _recompute(self):
+        self.trade_counts[:] = 0
+        for bucket, counts in self.buckets.items():
+            weight = self._weight(bucket)
+            for col, count in counts.items():
+                self.trade_counts[col] += count * weight
+        self._ranking = None
+
+    def _advance(self, now):
+        bucket = self._bucket(now)
+        if bucket <= self.current:
+            return
+        self.current = bucket
+        oldest = self._oldest()
+        self.buckets = {b: counts for b, counts in self.buckets.items() if b >= oldest}
+        self.trade_buckets = {t: b for t, b in self.trade_buckets.items() if b >= oldest}
+        self._recompute()
+
+    def knows_user_skill(self, user_skill_id):
+        return user_skill_id < len(self.user_skill_cols) and self.user_skill_cols[user_skill_id] >= 0
+
+    def add_user_skill(self, user_skill_id, skill_id, name, category):
+        """Count a new active user_skills row; returns False if already known."""
+        with self.lock:
+            if self.knows_user_skill(user_skill_id):
+                return False
+            col = self.skill_index.get(skill_id)
+            if col is None:
+                col = len(self.skill_ids)
+                self.skill_ids.append(skill_id)
+                self.names.append(sys.intern(name))
+                self.categories.append(sys.intern(category))
+                self.skill_index[skill_id] = col
+                self.user_counts = np.append(self.user_counts, 0)
+                self.trade_counts = np.append(self.trade_counts, 0.0)
+            if user_skill_id >= len(self.user_skill_cols):
+                grown = np.full(max(user_skill_id + 1, 2 * len(self.user_skill_cols)), -1, dtype=np.int32)
+                grown[:len(self.user_skill_cols)] = self.user_skill_cols
+                self.user_skill_cols = grown
+            self.user_skill_cols[user_skill_id] = col
+            self.user_counts[col] += 1
+            self._ranking = None
+            return True
+
+    def add_trade(self, trade_id, requester_skill_id, provider_skill_id, created_at=None):
+        """Count a trade once; trades outside the window are ignored."""
+        now = time.time()
+        with self.lock:
+            self._advance(now)
+            bucket = self._bucket(now if created_at is None else created_at)
+            cols = self._count_trade(trade_id, requester_skill_id, provider_skill_id, bucket)
+            weight = self._weight(bucket)
+            for col in cols:
+                self.trade_counts[col] += weight
+            self._ranking = None
+            return bool(cols)
+
+    def top(self, limit=10, now=None):
+        """Highest ``trend_score`` skills as dicts, like the SQL query returns."""
+        with self.lock:
+            self._advance(time.time() if now is None else now)
+            if self._ranking is None:
+                self._scores = self.user_counts * USER_WEIGHT + self.trade_counts
+                ranked = np.flatnonzero(self.user_counts > 0)
+                order = np.lexsort((np.array(self.skill_ids)[ranked], -self._scores[ranked]))
+                self._ranking = ranked[order]
+            ranking, scores = self._ranking[:limit], self._scores
+        return [
+            {
+                'id': self.skill_ids[col],
+                'name': self.names[col],
+                'category': self.categories[col],
+                'user_count': int(self.user_counts[col]),
+                'trade_count': round(float(self.trade_counts[col]), 3),
+                'trend_score': round(float(scores[col]), 3),
+            }
+            for col in ranking.tolist()
+        ]
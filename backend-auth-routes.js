@@ -200,16 +200,13 @@ router.get('/profile', authenticateToken, async (req, res) => {
         const [users] = await db.execute(
             `SELECT u.id, u.username, u.email, u.full_name, u.bio, u.location, 
                     u.profile_image, u.created_at, u.updated_at,
-                    COUNT(DISTINCT t1.id) as trades_as_requester,
-                    COUNT(DISTINCT t2.id) as trades_as_provider,
-                    AVG(r.rating) as average_rating,
-                    COUNT(DISTINCT r.id) as review_count
+                    COALESCE(st.completed_as_requester, 0) as trades_as_requester,
+                    COALESCE(st.completed_as_provider, 0) as trades_as_provider,
+                    st.avg_rating as average_rating,
+                    COALESCE(st.review_count, 0) as review_count
              FROM users u
-             LEFT JOIN trades t1 ON u.id = t1.requester_id AND t1.status = 'completed'
-             LEFT JOIN trades t2 ON u.id = t2.provider_id AND t2.status = 'completed'
-             LEFT JOIN reviews r ON u.id = r.reviewee_id
-             WHERE u.id = ?
-             GROUP BY u.id`,
+             LEFT JOIN user_stats st ON st.user_id = u.id
+             WHERE u.id = ?`,
             [req.user.id]
         );
 
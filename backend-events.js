@@ -0,0 +1,24 @@
+const redis = require('../config/redis');
+
+const EVENTS_CHANNEL = process.env.EVENTS_CHANNEL || 'skillswap:events';
+// Log of the same events, for AI service workers to replay onto a model
+// whose data was read before they subscribed
+const EVENTS_STREAM = process.env.EVENTS_STREAM || 'skillswap:events:log';
+const EVENTS_STREAM_LENGTH = parseInt(process.env.EVENTS_STREAM_LENGTH) || 100000;
+
+// Log and publish a change event for the AI service; never fails the caller
+async function publishEvent(type, payload) {
+    const message = JSON.stringify({ type, ...payload });
+    try {
+        await redis.multi()
+            .xAdd(EVENTS_STREAM, '*', { data: message }, {
+                TRIM: { strategy: 'MAXLEN', strategyModifier: '~', threshold: EVENTS_STREAM_LENGTH }
+            })
+            .publish(EVENTS_CHANNEL, message)
+            .exec();
+    } catch (error) {
+        console.error(`Publish ${type} event error:`, error.message);
+    }
+}
+
+module.exports = { publishEvent, EVENTS_CHANNEL, EVENTS_STREAM };
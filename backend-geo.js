@@ -0,0 +1,87 @@
+const db = require('../config/database');
+
+const GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz';
+const KM_PER_DEGREE = 111.195;
+const MAX_RADIUS_KM = 500;
+
+// Geohash of a point, as stored in users.geohash by ST_GeoHash()
+function encodeGeohash(lat, lng, length) {
+    let [latLo, latHi, lngLo, lngHi] = [-90, 90, -180, 180];
+    let hash = '';
+    let bits = 0;
+    let value = 0;
+    let evenBit = true;
+    while (hash.length < length) {
+        if (evenBit) {
+            const mid = (lngLo + lngHi) / 2;
+            value = value * 2 + (lng >= mid ? 1 : 0);
+            if (lng >= mid) lngLo = mid; else lngHi = mid;
+        } else {
+            const mid = (latLo + latHi) / 2;
+            value = value * 2 + (lat >= mid ? 1 : 0);
+            if (lat >= mid) latLo = mid; else latHi = mid;
+        }
+        evenBit = !evenBit;
+        if (++bits === 5) {
+            hash += GEOHASH_ALPHABET[value];
+            bits = 0;
+            value = 0;
+        }
+    }
+    return hash;
+}
+
+// The 3x3 block of geohash cells around a point, using the smallest cells
+// that are still at least radiusKm across so the block covers the circle.
+// Returns null when no block does (huge radius or near a pole).
+function coveringCells(lat, lng, radiusKm) {
+    const farthestLat = Math.min(90, Math.abs(lat) + radiusKm / KM_PER_DEGREE);
+    for (let length = 9; length >= 1; length--) {
+        const lngBits = Math.ceil(length * 5 / 2);
+        const latBits = Math.floor(length * 5 / 2);
+        const cellLat = 180 / 2 ** latBits;
+        const cellLng = 360 / 2 ** lngBits;
+        const widthKm = cellLng * KM_PER_DEGREE * Math.cos(farthestLat * Math.PI / 180);
+        if (cellLat * KM_PER_DEGREE < radiusKm || widthKm < radiusKm) {
+            continue;
+        }
+        const cells = new Set();
+        for (const dLat of [-1, 0, 1]) {
+            for (const dLng of [-1, 0, 1]) {
+                const probeLat = Math.max(-90, Math.min(90, lat + dLat * cellLat));
+                const probeLng = ((lng + dLng * cellLng + 540) % 360) - 180;
+                cells.add(encodeGeohash(probeLat, probeLng, length));
+            }
+        }
+        return [...cells];
+    }
+    return null;
+}
+
+// WHERE fragment keeping users within radiusKm of a point: geohash prefix
+// ranges on idx_geohash narrow the rows, the exact distance check follows
+function withinRadius(alias, lat, lng, radiusKm) {
+    const cells = coveringCells(lat, lng, radiusKm) || [];
+    const prefixes = cells.map(() => `${alias}.geohash LIKE ?`).join(' OR ');
+    return {
+        sql: `${prefixes ? `(${prefixes}) AND ` : ''}` +
+            `ST_Distance_Sphere(POINT(${alias}.longitude, ${alias}.latitude), POINT(?, ?)) <= ?`,
+        params: [...cells.map((cell) => `${cell}%`), lng, lat, radiusKm * 1000]
+    };
+}
+
+// SELECT expression for the distance from a point in km
+function distanceKm(alias) {
+    return `ST_Distance_Sphere(POINT(${alias}.longitude, ${alias}.latitude), POINT(?, ?)) / 1000`;
+}
+
+// Resolve a place name with the same gazetteer lookup the users triggers use
+async function geocodePlace(location) {
+    const [rows] = await db.execute(`
+        SELECT ST_Y(place) AS latitude, ST_X(place) AS longitude
+        FROM (SELECT geocode_location(?) AS place) geocoded
+    `, [location]);
+    return rows[0].latitude === null ? null : rows[0];
+}
+
+module.exports = { encodeGeohash, coveringCells, withinRadius, distanceKm, geocodePlace, MAX_RADIUS_KM };
@@ -0,0 +1,82 @@
+const redis = require('../config/redis');
+
+// Cached results expire after the TTL; Redis evicts them first under memory
+// pressure (volatile-lru), while the version counters have no TTL. Skills
+// other users add reach a cached list when it expires.
+const CACHE_TTL = parseInt(process.env.RECOMMENDATION_CACHE_TTL) || 300;
+const MODEL_VERSION_KEY = 'skillswap:recommendations:model_version';
+const USER_VERSION_PREFIX = 'skillswap:recommendations:user_version:';
+const RESULT_PREFIX = 'skillswap:recommendations:result:';
+
+const stats = {
+    hits: 0,
+    misses: 0,
+    errors: 0,
+    invalidations: 0,
+    hitMs: 0,
+    missMs: 0
+};
+
+// Key covers the model snapshot and the user's own profile version, so a
+// new model or a change to the user's skills, ratings or trades is a miss
+async function cacheKey(userId, variant) {
+    const [modelVersion, userVersion] = await redis.mGet([MODEL_VERSION_KEY, USER_VERSION_PREFIX + userId]);
+    return `${RESULT_PREFIX}${userId}:${variant}:${modelVersion || 0}:${userVersion || 0}`;
+}
+
+// Return cached recommendations or compute and store them; variant
+// distinguishes request options such as the limit
+async function getCachedRecommendations(userId, variant, compute) {
+    const started = process.hrtime.bigint();
+    let key = null;
+    try {
+        key = await cacheKey(userId, variant);
+        const cached = await redis.get(key);
+        if (cached !== null) {
+            stats.hits++;
+            stats.hitMs += Number(process.hrtime.bigint() - started) / 1e6;
+            return JSON.parse(cached);
+        }
+    } catch (error) {
+        stats.errors++;
+        console.error('Recommendation cache read error:', error.message);
+    }
+
+    const recommendations = await compute();
+    stats.misses++;
+    stats.missMs += Number(process.hrtime.bigint() - started) / 1e6;
+
+    if (key) {
+        try {
+            await redis.set(key, JSON.stringify(recommendations), { EX: CACHE_TTL });
+        } catch (error) {
+            stats.errors++;
+            console.error('Recommendation cache write error:', error.message);
+        }
+    }
+    return recommendations;
+}
+
+// Bump the users' profile versions; their old entries are never read again
+async function invalidateUsers(...userIds) {
+    try {
+        await Promise.all(userIds.map((userId) => redis.incr(USER_VERSION_PREFIX + userId)));
+        stats.invalidations += userIds.length;
+    } catch (error) {
+        stats.errors++;
+        console.error('Recommendation cache invalidation error:', error.message);
+    }
+}
+
+function getCacheStats() {
+    const lookups = stats.hits + stats.misses;
+    return {
+        ...stats,
+        hitRate: lookups === 0 ? 0 : stats.hits / lookups,
+        avgHitMs: stats.hits === 0 ? 0 : stats.hitMs / stats.hits,
+        avgMissMs: stats.misses === 0 ? 0 : stats.missMs / stats.misses,
+        ttlSeconds: CACHE_TTL
+    };
+}
+
+module.exports = { getCachedRecommendations, invalidateUsers, getCacheStats, MODEL_VERSION_KEY };
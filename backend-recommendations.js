@@ -1,9 +1,15 @@
 const express = require('express');
 const db = require('../config/database');
-const { authenticateToken } = require('../middleware/auth');
+const { authenticateToken, requireAdmin } = require('../middleware/auth');
+const { getCachedRecommendations, getCacheStats } = require('../services/recommendationCache');
+const { withinRadius, distanceKm, MAX_RADIUS_KM } = require('../services/geo');
 
 const router = express.Router();
 
+// Optional Python ai-recommender service (see ai-service/)
+const AI_SERVICE_URL = process.env.AI_SERVICE_URL;
+const AI_SERVICE_TIMEOUT = parseInt(process.env.AI_SERVICE_TIMEOUT) || 500;
+
 // Simple content-based filtering for skill recommendations
 class SkillRecommender {
     constructor() {
@@ -22,9 +28,49 @@ class SkillRecommender {
         return union.size === 0 ? 0 : intersection.size / union.size;
     }
 
+    // Get recommendations, preferring the in-memory ai-recommender service.
+    // withinKm keeps only users that close; boostKm scores them higher
+    async getRecommendations(userId, limit = 5, { withinKm = null, boostKm = null } = {}) {
+        if (AI_SERVICE_URL) {
+            try {
+                let path = `/recommendations/${userId}?limit=${limit}`;
+                if (withinKm) path += `&within_km=${withinKm}`;
+                if (boostKm) path += `&boost_km=${boostKm}`;
+                const { recommendations } = await this.fetchAiService(path);
+                return recommendations;
+            } catch (error) {
+                console.error('AI service unavailable, falling back to SQL:', error.message);
+            }
+        }
+        return this.queryRecommendations(userId, limit, { withinKm, boostKm });
+    }
+
+    // Proxy a request to the ai-recommender service
+    async fetchAiService(path) {
+        const response = await fetch(`${AI_SERVICE_URL}${path}`, {
+            signal: AbortSignal.timeout(AI_SERVICE_TIMEOUT)
+        });
+        if (!response.ok) {
+            throw new Error(`AI service responded with ${response.status}`);
+        }
+        return response.json();
+    }
+
     // Get recommendations based on user's skills and activity
-    async getRecommendations(userId, limit = 5) {
+    async queryRecommendations(userId, limit = 5, { withinKm = null, boostKm = null } = {}) {
         try {
+            // User's coordinates, for the optional radius filter and boost
+            let origin = null;
+            if (withinKm || boostKm) {
+                const [[user]] = await db.execute('SELECT latitude, longitude FROM users WHERE id = ?', [userId]);
+                if (user && user.latitude !== null) {
+                    origin = user;
+                } else if (withinKm) {
+                    return [];
+                }
+            }
+            const radius = origin && withinKm ? withinRadius('u', origin.latitude, origin.longitude, withinKm) : null;
+
             // Get user's current skills
             const [userSkills] = await db.execute(`
                 SELECT s.id, s.name, s.category, us.skill_type
@@ -39,7 +85,7 @@ class SkillRecommender {
 
             // Get other users with complementary skills
             const [potentialMatches] = await db.execute(`
-                SELECT DISTINCT
+                SELECT
                     us.user_id,
                     u.username,
                     u.full_name,
@@ -48,14 +94,13 @@ class SkillRecommender {
                     s.category,
                     us.skill_type,
                     us.proficiency_level,
-                    AVG(r.rating) as user_rating,
-                    COUNT(DISTINCT t1.id) + COUNT(DISTINCT t2.id) as total_trades
+                    ${origin ? distanceKm('u') : 'NULL'} as distance_km,
+                    st.avg_rating as user_rating,
+                    COALESCE(st.total_trades, 0) as total_trades
                 FROM user_skills us
                 JOIN skills s ON us.skill_id = s.id
                 JOIN users u ON us.user_id = u.id
-                LEFT JOIN trades t1 ON u.id = t1.requester_id AND t1.status = 'completed'
-                LEFT JOIN trades t2 ON u.id = t2.provider_id AND t2.status = 'completed'
-                LEFT JOIN reviews r ON u.id = r.reviewee_id
+                LEFT JOIN user_stats st ON st.user_id = u.id
                 WHERE us.user_id != ? 
                 AND u.is_active = TRUE 
                 AND us.is_active = TRUE
@@ -64,10 +109,14 @@ class SkillRecommender {
                     OR (us.skill_type = 'seeking' AND s.name IN (${offeringSkills.map(() => '?').join(', ') || 'NULL'}))
                     OR s.category IN (${userCategories.map(() => '?').join(', ') || 'NULL'})
                 )
-                GROUP BY us.id
+                ${radius ? `AND ${radius.sql}` : ''}
                 ORDER BY user_rating DESC, total_trades DESC
                 LIMIT 20
-            `, [userId, ...seekingSkills, ...offeringSkills, ...userCategories]);
+            `, [
+                ...(origin ? [origin.longitude, origin.latitude] : []),
+                userId, ...seekingSkills, ...offeringSkills, ...userCategories,
+                ...(radius ? radius.params : [])
+            ]);
 
             // Score and rank recommendations
             const recommendations = [];
@@ -95,6 +144,9 @@ class SkillRecommender {
                 if (match.proficiency_level === 'expert') score += 2;
                 if (match.proficiency_level === 'intermediate') score += 1;
 
+                // Bonus for being close enough to meet in person
+                if (boostKm && match.distance_km !== null && match.distance_km <= boostKm) score += 5;
+
                 if (!userScores.has(match.user_id) || userScores.get(match.user_id).score < score) {
                     userScores.set(match.user_id, {
                         ...match,
@@ -115,8 +167,21 @@ class SkillRecommender {
         }
     }
 
-    // Get trending skills based on recent activity
+    // Get trending skills, preferring the ai-recommender's windowed counters
     async getTrendingSkills(limit = 10) {
+        if (AI_SERVICE_URL) {
+            try {
+                const { trending } = await this.fetchAiService(`/trending?limit=${limit}`);
+                return trending;
+            } catch (error) {
+                console.error('AI service unavailable, falling back to SQL:', error.message);
+            }
+        }
+        return this.queryTrendingSkills(limit);
+    }
+
+    // Get trending skills based on recent activity
+    async queryTrendingSkills(limit = 10) {
         try {
             const [trendingSkills] = await db.execute(`
                 SELECT 
@@ -144,10 +209,166 @@ class SkillRecommender {
             throw error;
         }
     }
+
+    // Get two-sided matches: users who offer what I seek AND seek what I offer
+    async getReciprocalMatches(userId, limit = 20) {
+        let matches;
+        if (AI_SERVICE_URL) {
+            try {
+                ({ matches } = await this.fetchAiService(`/matches/${userId}?limit=${limit}`));
+            } catch (error) {
+                console.error('AI service unavailable, falling back to SQL:', error.message);
+            }
+        }
+
+        if (!matches) {
+            const [rows] = await db.execute(`
+                SELECT
+                    theirs.user_id,
+                    GROUP_CONCAT(DISTINCT CASE WHEN theirs.skill_type = 'offering' THEN theirs.skill_id END) as they_offer,
+                    GROUP_CONCAT(DISTINCT CASE WHEN theirs.skill_type = 'seeking' THEN theirs.skill_id END) as they_seek,
+                    COUNT(DISTINCT CASE WHEN theirs.skill_type = 'offering' THEN theirs.skill_id END) as offer_count,
+                    COUNT(DISTINCT CASE WHEN theirs.skill_type = 'seeking' THEN theirs.skill_id END) as seek_count
+                FROM user_skills mine
+                JOIN user_skills theirs ON theirs.skill_id = mine.skill_id
+                    AND theirs.skill_type != mine.skill_type
+                    AND theirs.is_active = TRUE
+                    AND theirs.user_id != mine.user_id
+                WHERE mine.user_id = ? AND mine.is_active = TRUE
+                GROUP BY theirs.user_id
+                HAVING offer_count > 0 AND seek_count > 0
+                ORDER BY offer_count + seek_count DESC, LEAST(offer_count, seek_count) DESC, theirs.user_id
+                LIMIT ?
+            `, [userId, limit]);
+
+            matches = rows.map(row => ({
+                user_id: row.user_id,
+                they_offer: row.they_offer.split(',').map(Number),
+                they_seek: row.they_seek.split(',').map(Number),
+                overlap: row.offer_count + row.seek_count
+            }));
+        }
+
+        if (matches.length === 0) {
+            return matches;
+        }
+
+        const [users] = await db.execute(
+            `SELECT id, username, full_name, profile_image FROM users WHERE is_active = TRUE AND id IN (${matches.map(() => '?').join(', ')})`,
+            matches.map(match => match.user_id)
+        );
+        const usersById = new Map(users.map(user => [user.id, user]));
+
+        return matches
+            .filter(match => usersById.has(match.user_id))
+            .map(match => {
+                const { username, full_name, profile_image } = usersById.get(match.user_id);
+                return { ...match, username, full_name, profile_image };
+            });
+    }
+
+    // Get open multi-party swap proposals the user takes part in
+    async getSwapCycles(userId) {
+        const [legs] = await db.execute(`
+            SELECT
+                sp.id as proposal_id,
+                sp.cycle_length,
+                sp.created_at,
+                l.leg_order,
+                l.teacher_id,
+                teacher.username as teacher_username,
+                l.learner_id,
+                learner.username as learner_username,
+                s.id as skill_id,
+                s.name as skill_name
+            FROM swap_proposal_legs mine
+            JOIN swap_proposals sp ON mine.proposal_id = sp.id
+            JOIN swap_proposal_legs l ON l.proposal_id = sp.id
+            JOIN users teacher ON l.teacher_id = teacher.id
+            JOIN users learner ON l.learner_id = learner.id
+            JOIN skills s ON l.skill_id = s.id
+            WHERE mine.teacher_id = ? AND sp.status = 'proposed'
+            ORDER BY sp.cycle_length, sp.id, l.leg_order
+        `, [userId]);
+
+        const proposals = new Map();
+        legs.forEach(({ proposal_id, cycle_length, created_at, ...leg }) => {
+            if (!proposals.has(proposal_id)) {
+                proposals.set(proposal_id, { proposal_id, cycle_length, created_at, legs: [] });
+            }
+            proposals.get(proposal_id).legs.push(leg);
+        });
+
+        return Array.from(proposals.values());
+    }
+
+    // Get "people like you" from the nightly similarity pass
+    async getSimilarUsers(userId, limit = 10) {
+        const [similarUsers] = await db.execute(`
+            SELECT
+                u.id as user_id,
+                u.username,
+                u.full_name,
+                u.profile_image,
+                us.similarity
+            FROM user_similarities us
+            JOIN users u ON us.similar_user_id = u.id
+            WHERE us.user_id = ? AND u.is_active = TRUE
+            ORDER BY us.similarity DESC
+            LIMIT ?
+        `, [userId, limit]);
+
+        return similarUsers;
+    }
 }
 
 const recommender = new SkillRecommender();
 
+// Registered before /:userId so these paths are not taken for a user id
+/**
+ * @swagger
+ * /recommendations/cache/stats:
+ *   get:
+ *     summary: Get recommendation cache hit rate and latency (admin only)
+ *     tags: [Recommendations]
+ *     security:
+ *       - bearerAuth: []
+ *     responses:
+ *       200:
+ *         description: Cache counters for this process
+ */
+router.get('/cache/stats', authenticateToken, requireAdmin, (req, res) => {
+    res.json(getCacheStats());
+});
+
+/**
+ * @swagger
+ * /recommendations/trending:
+ *   get:
+ *     summary: Get trending skills
+ *     tags: [Recommendations]
+ *     parameters:
+ *       - in: query
+ *         name: limit
+ *         schema:
+ *           type: integer
+ *           default: 10
+ *     responses:
+ *       200:
+ *         description: Trending skills retrieved successfully
+ */
+router.get('/trending', async (req, res) => {
+    try {
+        const { limit = 10 } = req.query;
+        const trendingSkills = await recommender.getTrendingSkills(parseInt(limit));
+
+        res.json({ trendingSkills });
+    } catch (error) {
+        console.error('Get trending skills error:', error);
+        res.status(500).json({ error: 'Internal server error' });
+    }
+});
+
 /**
  * @swagger
  * /recommendations/{userId}:
@@ -167,6 +388,16 @@ const recommender = new SkillRecommender();
  *         schema:
  *           type: integer
  *           default: 5
+ *       - in: query
+ *         name: withinKm
+ *         schema:
+ *           type: number
+ *         description: Only recommend users within this distance
+ *       - in: query
+ *         name: boostKm
+ *         schema:
+ *           type: number
+ *         description: Rank users within this distance higher
  *     responses:
  *       200:
  *         description: Recommendations retrieved successfully
@@ -175,13 +406,25 @@ router.get('/:userId', authenticateToken, async (req, res) => {
     try {
         const { userId } = req.params;
         const { limit = 5 } = req.query;
+        const withinKm = req.query.withinKm !== undefined ? parseFloat(req.query.withinKm) : null;
+        const boostKm = req.query.boostKm !== undefined ? parseFloat(req.query.boostKm) : null;
 
         // Ensure user can only get their own recommendations or admin
         if (parseInt(userId) !== req.user.id && req.user.role !== 'admin') {
             return res.status(403).json({ error: 'Forbidden' });
         }
 
-        const recommendations = await recommender.getRecommendations(userId, parseInt(limit));
+        for (const radius of [withinKm, boostKm]) {
+            if (radius !== null && !(radius > 0 && radius <= MAX_RADIUS_KM)) {
+                return res.status(400).json({ error: `Radius must be between 0 and ${MAX_RADIUS_KM} km` });
+            }
+        }
+
+        const recommendations = await getCachedRecommendations(
+            parseInt(userId),
+            `${parseInt(limit)}:${withinKm || ''}:${boostKm || ''}`,
+            () => recommender.getRecommendations(userId, parseInt(limit), { withinKm, boostKm })
+        );
 
         res.json({
             recommendations,
@@ -195,11 +438,94 @@ router.get('/:userId', authenticateToken, async (req, res) => {
 
 /**
  * @swagger
- * /recommendations/trending:
+ * /recommendations/{userId}/matches:
  *   get:
- *     summary: Get trending skills
+ *     summary: Get reciprocal swap partners ranked by skill overlap
+ *     tags: [Recommendations]
+ *     security:
+ *       - bearerAuth: []
+ *     parameters:
+ *       - in: path
+ *         name: userId
+ *         required: true
+ *         schema:
+ *           type: integer
+ *       - in: query
+ *         name: limit
+ *         schema:
+ *           type: integer
+ *           default: 20
+ *     responses:
+ *       200:
+ *         description: Reciprocal matches retrieved successfully
+ */
+router.get('/:userId/matches', authenticateToken, async (req, res) => {
+    try {
+        const { userId } = req.params;
+        const { limit = 20 } = req.query;
+
+        if (parseInt(userId) !== req.user.id && req.user.role !== 'admin') {
+            return res.status(403).json({ error: 'Forbidden' });
+        }
+
+        const matches = await recommender.getReciprocalMatches(userId, Math.min(parseInt(limit) || 20, 100));
+
+        res.json({ matches });
+    } catch (error) {
+        console.error('Get reciprocal matches error:', error);
+        res.status(500).json({ error: 'Internal server error' });
+    }
+});
+
+/**
+ * @swagger
+ * /recommendations/{userId}/swap-cycles:
+ *   get:
+ *     summary: Get multi-party swap proposals that include the user
+ *     tags: [Recommendations]
+ *     security:
+ *       - bearerAuth: []
+ *     parameters:
+ *       - in: path
+ *         name: userId
+ *         required: true
+ *         schema:
+ *           type: integer
+ *     responses:
+ *       200:
+ *         description: Swap proposals retrieved successfully
+ */
+router.get('/:userId/swap-cycles', authenticateToken, async (req, res) => {
+    try {
+        const { userId } = req.params;
+
+        if (parseInt(userId) !== req.user.id && req.user.role !== 'admin') {
+            return res.status(403).json({ error: 'Forbidden' });
+        }
+
+        const proposals = await recommender.getSwapCycles(userId);
+
+        res.json({ proposals });
+    } catch (error) {
+        console.error('Get swap cycles error:', error);
+        res.status(500).json({ error: 'Internal server error' });
+    }
+});
+
+/**
+ * @swagger
+ * /recommendations/{userId}/similar:
+ *   get:
+ *     summary: Get users with similar skill sets
  *     tags: [Recommendations]
+ *     security:
+ *       - bearerAuth: []
  *     parameters:
+ *       - in: path
+ *         name: userId
+ *         required: true
+ *         schema:
+ *           type: integer
  *       - in: query
  *         name: limit
  *         schema:
@@ -207,16 +533,22 @@ router.get('/:userId', authenticateToken, async (req, res) => {
  *           default: 10
  *     responses:
  *       200:
- *         description: Trending skills retrieved successfully
+ *         description: Similar users retrieved successfully
  */
-router.get('/trending', async (req, res) => {
+router.get('/:userId/similar', authenticateToken, async (req, res) => {
     try {
+        const { userId } = req.params;
         const { limit = 10 } = req.query;
-        const trendingSkills = await recommender.getTrendingSkills(parseInt(limit));
 
-        res.json({ trendingSkills });
+        if (parseInt(userId) !== req.user.id && req.user.role !== 'admin') {
+            return res.status(403).json({ error: 'Forbidden' });
+        }
+
+        const similarUsers = await recommender.getSimilarUsers(userId, Math.min(parseInt(limit) || 10, 100));
+
+        res.json({ similarUsers });
     } catch (error) {
-        console.error('Get trending skills error:', error);
+        console.error('Get similar users error:', error);
         res.status(500).json({ error: 'Internal server error' });
     }
 });
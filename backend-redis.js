@@ -0,0 +1,22 @@
+const { createClient } = require('redis');
+require('dotenv').config();
+
+const client = createClient({
+    socket: {
+        host: process.env.REDIS_HOST || 'localhost',
+        port: process.env.REDIS_PORT || 6379
+    },
+    password: process.env.REDIS_PASSWORD || undefined,
+    // Fail fast instead of queueing commands while Redis is down
+    disableOfflineQueue: true
+});
+
+client.on('error', (error) => {
+    console.error('❌ Redis error:', error.message);
+});
+
+client.connect()
+    .then(() => console.log('✅ Redis connected successfully'))
+    .catch((error) => console.error('❌ Redis connection failed:', error.message));
+
+module.exports = client;
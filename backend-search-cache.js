@@ -0,0 +1,149 @@
+const crypto = require('crypto');
+const redis = require('../config/redis');
+
+// Results live in Redis, shared by every backend process, behind a small
+// per-process LRU. Keys carry a version per category that skill and
+// user_skill changes bump, so stale pages are never read again; trade and
+// rating changes only reorder results and are left to the TTL.
+const CACHE_TTL = parseInt(process.env.SEARCH_CACHE_TTL) || 60;
+const LOCAL_ENTRIES = parseInt(process.env.SEARCH_CACHE_LOCAL_ENTRIES) || 500;
+const VERSION_PREFIX = 'skillswap:search:version:';
+const RESULT_PREFIX = 'skillswap:search:result:';
+// Version of searches without a category filter, bumped by every change
+const ANY_CATEGORY = '*';
+
+// Map iteration order is insertion order: re-inserting on a hit keeps the
+// least recently used entry first
+const local = new Map();
+
+const stats = {
+    localHits: 0,
+    redisHits: 0,
+    misses: 0,
+    stored: 0,
+    errors: 0,
+    invalidations: 0,
+    hitMs: 0,
+    missMs: 0
+};
+
+// Case and spacing do not change results under the case-insensitive collation
+function normalize(text) {
+    return String(text).trim().toLowerCase().replace(/\s+/g, ' ');
+}
+
+function searchKey(query) {
+    const { q = '', category = '', type = '', level = '', page = 1, limit = 20, cursor = '' } = query;
+    const includeTotal = query.includeTotal !== undefined ? query.includeTotal === 'true' : !cursor;
+    return JSON.stringify([
+        normalize(q), normalize(category), type, level,
+        cursor ? `cursor:${cursor}` : `page:${parseInt(page)}`, parseInt(limit), includeTotal, query.facets === 'true'
+    ]);
+}
+
+function localGet(key) {
+    const entry = local.get(key);
+    if (!entry) {
+        return null;
+    }
+    local.delete(key);
+    if (entry.expires < Date.now()) {
+        return null;
+    }
+    local.set(key, entry);
+    return entry.value;
+}
+
+function localSet(key, value) {
+    local.delete(key);
+    local.set(key, { value, expires: Date.now() + CACHE_TTL * 1000 });
+    if (local.size > LOCAL_ENTRIES) {
+        local.delete(local.keys().next().value);
+    }
+}
+
+function elapsedMs(started) {
+    return Number(process.hrtime.bigint() - started) / 1e6;
+}
+
+// Look up a search by its validated query parameters. The returned lookup
+// holds the cached response in value, or is passed to storeSearch once the
+// response has been computed.
+async function lookupSearch(query) {
+    const lookup = { key: null, value: null, started: process.hrtime.bigint() };
+    try {
+        // Facet counts span every category whatever the category filter
+        const category = (query.facets === 'true' ? '' : normalize(query.category || '')) || ANY_CATEGORY;
+        const version = await redis.get(VERSION_PREFIX + category);
+        const digest = crypto.createHash('sha1').update(`${version || 0}:${searchKey(query)}`).digest('hex');
+        lookup.key = RESULT_PREFIX + digest;
+
+        lookup.value = localGet(lookup.key);
+        if (lookup.value !== null) {
+            stats.localHits++;
+        } else {
+            const cached = await redis.get(lookup.key);
+            if (cached !== null) {
+                lookup.value = JSON.parse(cached);
+                localSet(lookup.key, lookup.value);
+                stats.redisHits++;
+            }
+        }
+        if (lookup.value !== null) {
+            stats.hitMs += elapsedMs(lookup.started);
+        } else {
+            stats.misses++;
+        }
+    } catch (error) {
+        stats.errors++;
+        console.error('Search cache read error:', error.message);
+    }
+    return lookup;
+}
+
+async function storeSearch(lookup, value) {
+    if (!lookup.key) {
+        return;
+    }
+    stats.stored++;
+    stats.missMs += elapsedMs(lookup.started);
+    localSet(lookup.key, value);
+    try {
+        await redis.set(lookup.key, JSON.stringify(value), { EX: CACHE_TTL });
+    } catch (error) {
+        stats.errors++;
+        console.error('Search cache write error:', error.message);
+    }
+}
+
+// Bump the versions of the changed categories and of unfiltered searches
+async function invalidateCategories(...categories) {
+    const versions = new Set([ANY_CATEGORY, ...categories.map(normalize)]);
+    try {
+        await Promise.all([...versions].map((category) => redis.incr(VERSION_PREFIX + category)));
+        stats.invalidations += categories.length;
+    } catch (error) {
+        stats.errors++;
+        console.error('Search cache invalidation error:', error.message);
+    }
+}
+
+function getSearchCacheStats() {
+    const hits = stats.localHits + stats.redisHits;
+    const lookups = hits + stats.misses;
+    const avgMissMs = stats.stored === 0 ? 0 : stats.missMs / stats.stored;
+    return {
+        ...stats,
+        hits,
+        hitRate: lookups === 0 ? 0 : hits / lookups,
+        localHitRate: lookups === 0 ? 0 : stats.localHits / lookups,
+        avgHitMs: hits === 0 ? 0 : stats.hitMs / hits,
+        avgMissMs,
+        // Each hit would otherwise have cost an average miss
+        savedDbMs: Math.max(0, hits * avgMissMs - stats.hitMs),
+        localEntries: local.size,
+        ttlSeconds: CACHE_TTL
+    };
+}
+
+module.exports = { lookupSearch, storeSearch, invalidateCategories, getSearchCacheStats };
@@ -0,0 +1,68 @@
+const db = require('../config/database');
+
+// Skills by trimmed, single-spaced, lower-case name, as in the
+// skills.name_key unique key. The column's collation also ignores accents,
+// so names equal here are equal there but not always the reverse: such a
+// name, like one another process just created, is a miss that the upsert
+// below resolves to the existing skill.
+const skills = new Map();
+
+// Trimmed, single-spaced; the stored spelling of a new skill
+function normalizeSkillName(name) {
+    return name.trim().replace(/\s+/g, ' ');
+}
+
+function nameKey(name) {
+    return normalizeSkillName(name).toLowerCase();
+}
+
+async function warmSkillNames() {
+    try {
+        const [rows] = await db.query('SELECT id, name, category FROM skills');
+        for (const row of rows) {
+            skills.set(nameKey(row.name), row);
+        }
+        console.log(`✅ Skill name cache warmed with ${rows.length} skills`);
+    } catch (error) {
+        console.error('❌ Skill name cache warm-up failed:', error.message);
+    }
+}
+
+// { id, name, category } of a known skill name, or undefined
+function cachedSkill(name) {
+    return skills.get(nameKey(name));
+}
+
+// Return { id, name, category } for a skill name, creating the skill within
+// the connection's transaction if no skill has that name yet. Pass the
+// result to rememberSkill once the transaction has committed.
+async function upsertSkill(connection, name, category, description) {
+    // On a duplicate name LAST_INSERT_ID(id) makes insertId the existing id
+    const [result] = await connection.execute(
+        `INSERT INTO skills (name, category, description) VALUES (?, ?, ?)
+         ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)`,
+        [normalizeSkillName(name), category, description]
+    );
+    // An existing skill keeps its own spelling and category
+    const [rows] = await connection.execute('SELECT id, name, category FROM skills WHERE id = ?', [result.insertId]);
+    return rows[0];
+}
+
+// Cache a skill under its own name and the name it was looked up by
+function rememberSkill(skill, name = skill.name) {
+    skills.set(nameKey(skill.name), skill);
+    skills.set(nameKey(name), skill);
+}
+
+// Drop a cached skill that no longer exists, under every name
+function forgetSkill(skill) {
+    for (const [key, cached] of skills) {
+        if (cached.id === skill.id) {
+            skills.delete(key);
+        }
+    }
+}
+
+warmSkillNames();
+
+module.exports = { normalizeSkillName, cachedSkill, upsertSkill, rememberSkill, forgetSkill };
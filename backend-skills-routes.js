@@ -1,10 +1,88 @@
 const express = require('express');
 const { body, validationResult, query } = require('express-validator');
 const db = require('../config/database');
-const { authenticateToken } = require('../middleware/auth');
+const { authenticateToken, requireAdmin } = require('../middleware/auth');
+const { publishEvent } = require('../services/events');
+const { invalidateUsers } = require('../services/recommendationCache');
+const { normalizeSkillName, cachedSkill, upsertSkill, rememberSkill, forgetSkill } = require('../services/skillNames');
+const { lookupSearch, storeSearch, invalidateCategories, getSearchCacheStats } = require('../services/searchCache');
+const { withinRadius, distanceKm, geocodePlace, MAX_RADIUS_KM } = require('../services/geo');
 
 const router = express.Router();
 
+// Optional Python ai-recommender service (see ai-service/)
+const AI_SERVICE_URL = process.env.AI_SERVICE_URL;
+const AI_SERVICE_TIMEOUT = parseInt(process.env.AI_SERVICE_TIMEOUT) || 500;
+
+// Matches the server's --innodb-ft-min-token-size; shorter words are not indexed
+const FULLTEXT_MIN_TOKEN = 2;
+const NAME_RELEVANCE_WEIGHT = 2;
+
+// Boolean-mode FULLTEXT query requiring every word of q, each as a prefix so
+// results follow the user while they type. Null when no word is indexable.
+function fullTextQuery(q) {
+    const words = (q.toLowerCase().match(/[\p{L}\p{N}_]+/gu) || [])
+        .filter((word) => word.length >= FULLTEXT_MIN_TOKEN);
+    return words.length ? words.map((word) => `+${word}*`).join(' ') : null;
+}
+
+const FACETS = ['category', 'skill_type', 'proficiency_level'];
+
+// Per-value counts of every facet, from match counts grouped by all three.
+// Each facet is counted under the other facets' filters but not its own, so
+// the browse UI can show what picking another value would return.
+function facetCounts(groups, filters) {
+    const selected = (group, facet) => !filters[facet] ||
+        String(group[facet]).toLowerCase() === String(filters[facet]).toLowerCase();
+    const counts = Object.fromEntries(FACETS.map((facet) => [facet, new Map()]));
+    let total = 0;
+    for (const group of groups) {
+        const count = Number(group.count);
+        const unselected = FACETS.filter((facet) => !selected(group, facet));
+        if (unselected.length === 0) {
+            total += count;
+        }
+        for (const facet of FACETS) {
+            if (unselected.length === 0 || (unselected.length === 1 && unselected[0] === facet)) {
+                counts[facet].set(group[facet], (counts[facet].get(group[facet]) || 0) + count);
+            }
+        }
+    }
+    const facets = {};
+    for (const facet of FACETS) {
+        facets[facet] = [...counts[facet]]
+            .map(([value, count]) => ({ value, count }))
+            .sort((a, b) => b.count - a.count || String(a.value).localeCompare(String(b.value)));
+    }
+    return { facets, total };
+}
+
+// Opaque keyset cursors: the sort key of the last row served, base64url JSON
+function encodeCursor(key) {
+    return Buffer.from(JSON.stringify(key)).toString('base64url');
+}
+
+function decodeCursor(cursor, length) {
+    try {
+        const key = JSON.parse(Buffer.from(cursor, 'base64url').toString());
+        if (Array.isArray(key) && key.length === length && key.every(Number.isFinite)) {
+            return key;
+        }
+    } catch (error) {
+        // Malformed cursors are rejected below
+    }
+    return null;
+}
+
+// Insert a user_skills row through the pool or a connection; returns its id
+async function insertUserSkill(executor, userId, skillId, { skillType, proficiencyLevel, description }) {
+    const [result] = await executor.execute(
+        'INSERT INTO user_skills (user_id, skill_id, skill_type, proficiency_level, description) VALUES (?, ?, ?, ?, ?)',
+        [userId, skillId, skillType, proficiencyLevel, description]
+    );
+    return result.insertId;
+}
+
 /**
  * @swagger
  * /skills/search:
@@ -16,7 +94,7 @@ const router = express.Router();
  *         name: q
  *         schema:
  *           type: string
- *         description: Search query
+ *         description: Words to find in skill names and descriptions; results are ranked by relevance
  *       - in: query
  *         name: category
  *         schema:
@@ -35,17 +113,53 @@ const router = express.Router();
  *           enum: [beginner, intermediate, expert]
  *         description: Filter by proficiency level
  *       - in: query
+ *         name: cursor
+ *         schema:
+ *           type: string
+ *         description: nextCursor of the previous page; pages then cost the same however deep they are
+ *       - in: query
+ *         name: includeTotal
+ *         schema:
+ *           type: boolean
+ *         description: Also count every match (default true with page, false with cursor)
+ *       - in: query
+ *         name: facets
+ *         schema:
+ *           type: boolean
+ *         description: Also count matches per category, skill_type and proficiency_level, each ignoring its own filter
+ *       - in: query
  *         name: page
  *         schema:
  *           type: integer
  *           default: 1
- *         description: Page number
+ *         description: Page number, for clients that jump to a page instead of following nextCursor
  *       - in: query
  *         name: limit
  *         schema:
  *           type: integer
  *           default: 20
  *         description: Items per page
+ *       - in: query
+ *         name: near
+ *         schema:
+ *           type: string
+ *         description: Place name to search around, e.g. "Berlin" or "Portland, OR"
+ *       - in: query
+ *         name: lat
+ *         schema:
+ *           type: number
+ *         description: Latitude to search around (with lng, instead of near)
+ *       - in: query
+ *         name: lng
+ *         schema:
+ *           type: number
+ *         description: Longitude to search around
+ *       - in: query
+ *         name: radiusKm
+ *         schema:
+ *           type: number
+ *           default: 25
+ *         description: Only users within this distance of near or lat/lng
  *     responses:
  *       200:
  *         description: Skills retrieved successfully
@@ -53,8 +167,15 @@ const router = express.Router();
 router.get('/search', [
     query('page').optional().isInt({ min: 1 }),
     query('limit').optional().isInt({ min: 1, max: 100 }),
+    query('cursor').optional().isLength({ min: 1, max: 200 }),
+    query('includeTotal').optional().isBoolean(),
+    query('facets').optional().isBoolean(),
     query('type').optional().isIn(['offering', 'seeking']),
-    query('level').optional().isIn(['beginner', 'intermediate', 'expert'])
+    query('level').optional().isIn(['beginner', 'intermediate', 'expert']),
+    query('near').optional().isLength({ min: 1, max: 100 }),
+    query('lat').optional().isFloat({ min: -90, max: 90 }),
+    query('lng').optional().isFloat({ min: -180, max: 180 }),
+    query('radiusKm').optional().isFloat({ gt: 0, max: MAX_RADIUS_KM })
 ], async (req, res) => {
     try {
         const errors = validationResult(req);
@@ -68,18 +189,64 @@ router.get('/search', [
             type = '',
             level = '',
             page = 1,
-            limit = 20
+            limit = 20,
+            near = '',
+            radiusKm = 25,
+            cursor = ''
         } = req.query;
 
-        const offset = (page - 1) * limit;
+        // Searches around a location are too varied to be worth caching
+        const located = Boolean(near) || (req.query.lat !== undefined && req.query.lng !== undefined);
+        const cached = located ? null : await lookupSearch(req.query);
+        if (cached && cached.value !== null) {
+            return res.json(cached.value);
+        }
+
+        const pageSize = parseInt(limit);
+        const offset = cursor ? 0 : (page - 1) * pageSize;
+        const includeTotal = req.query.includeTotal !== undefined ? req.query.includeTotal === 'true' : !cursor;
+        const includeFacets = req.query.facets === 'true';
         let whereConditions = ['us.is_active = TRUE', 'u.is_active = TRUE'];
         let params = [];
 
-        if (q) {
-            whereConditions.push('(s.name LIKE ? OR s.description LIKE ?)');
-            params.push(`%${q}%`, `%${q}%`);
+        // Optional radius filter around a place or a coordinate pair
+        let origin = null;
+        if (near) {
+            origin = await geocodePlace(near);
+            if (!origin) {
+                return res.status(400).json({ error: `Unknown location: ${near}` });
+            }
+        } else if (req.query.lat !== undefined && req.query.lng !== undefined) {
+            origin = { latitude: parseFloat(req.query.lat), longitude: parseFloat(req.query.lng) };
+        }
+        if (origin) {
+            const radius = withinRadius('u', origin.latitude, origin.longitude, parseFloat(radiusKm));
+            whereConditions.push(radius.sql);
+            params.push(...radius.params);
         }
 
+        // FULLTEXT match ranked by relevance, name matches counting extra
+        let relevance = null;
+        const match = q ? fullTextQuery(q) : null;
+        if (match) {
+            whereConditions.push('MATCH(s.name, s.description) AGAINST (? IN BOOLEAN MODE)');
+            params.push(match);
+            // Rounded so the value echoed back in a cursor compares equal
+            relevance = {
+                sql: `ROUND(MATCH(s.name) AGAINST (? IN BOOLEAN MODE) * ${NAME_RELEVANCE_WEIGHT} + ` +
+                    'MATCH(s.name, s.description) AGAINST (? IN BOOLEAN MODE), 6)',
+                params: [match, match]
+            };
+        } else if (q) {
+            // Too short for the index: name prefix on idx_name
+            whereConditions.push('s.name LIKE ?');
+            params.push(`${q.replace(/[\\%_]/g, '\\$&')}%`);
+        }
+
+        // Facet counts are taken before the facet filters below
+        const facetWhereClause = 'WHERE ' + whereConditions.join(' AND ');
+        const facetParams = [...params];
+
         if (category) {
             whereConditions.push('s.category = ?');
             params.push(category);
@@ -97,7 +264,25 @@ router.get('/search', [
 
         const whereClause = whereConditions.length > 0 ? 'WHERE ' + whereConditions.join(' AND ') : '';
 
-        const [skills] = await db.execute(`
+        // Keyset: only rows after the cursor in the ORDER BY below. Unrated
+        // users compare as 0, which keeps them last as DESC does with NULL
+        const sortKey = [
+            ...(relevance ? [relevance.sql] : []),
+            'COALESCE(st.total_trades, 0)',
+            'COALESCE(st.avg_rating, 0)',
+            'us.id'
+        ];
+        let after = null;
+        let keysetClause = '';
+        if (cursor) {
+            after = decodeCursor(cursor, sortKey.length);
+            if (!after) {
+                return res.status(400).json({ error: 'Invalid cursor' });
+            }
+            keysetClause = `${whereClause ? 'AND' : 'WHERE'} (${sortKey.join(', ')}) < (${sortKey.map(() => '?').join(', ')})`;
+        }
+
+        const [rows] = await db.execute(`
             SELECT 
                 us.id as user_skill_id,
                 s.id as skill_id,
@@ -112,48 +297,106 @@ router.get('/search', [
                 u.full_name,
                 u.profile_image,
                 u.location,
-                AVG(r.rating) as user_rating,
-                COUNT(DISTINCT t1.id) + COUNT(DISTINCT t2.id) as total_trades
+                ${origin ? distanceKm('u') : 'NULL'} as distance_km,
+                ${relevance ? relevance.sql : 'NULL'} as relevance,
+                st.avg_rating as user_rating,
+                COALESCE(st.total_trades, 0) as total_trades
             FROM user_skills us
             JOIN skills s ON us.skill_id = s.id
             JOIN users u ON us.user_id = u.id
-            LEFT JOIN trades t1 ON u.id = t1.requester_id AND t1.status = 'completed'
-            LEFT JOIN trades t2 ON u.id = t2.provider_id AND t2.status = 'completed'
-            LEFT JOIN reviews r ON u.id = r.reviewee_id
+            LEFT JOIN user_stats st ON st.user_id = u.id
             ${whereClause}
-            GROUP BY us.id, s.id, u.id
-            ORDER BY total_trades DESC, user_rating DESC
+            ${keysetClause}
+            ORDER BY ${relevance ? 'relevance DESC, ' : ''}total_trades DESC, user_rating DESC, us.id DESC
             LIMIT ? OFFSET ?
-        `, [...params, parseInt(limit), offset]);
+        `, [
+            ...(origin ? [origin.longitude, origin.latitude] : []),
+            ...(relevance ? relevance.params : []),
+            ...params,
+            ...(after ? [...(relevance ? relevance.params : []), ...after] : []),
+            pageSize + 1, offset
+        ]);
 
-        // Get total count for pagination
-        const [countResult] = await db.execute(`
-            SELECT COUNT(DISTINCT us.id) as total
-            FROM user_skills us
-            JOIN skills s ON us.skill_id = s.id
-            JOIN users u ON us.user_id = u.id
-            ${whereClause}
-        `, params);
+        // One row past the page tells whether another page follows
+        const skills = rows.slice(0, pageSize);
+        const hasNextPage = rows.length > pageSize;
+        const last = skills[skills.length - 1];
+        const pagination = {
+            limit: pageSize,
+            hasNextPage,
+            nextCursor: hasNextPage ? encodeCursor([
+                ...(relevance ? [last.relevance] : []),
+                last.total_trades,
+                Number(last.user_rating) || 0,
+                last.user_skill_id
+            ]) : null
+        };
+        if (!cursor) {
+            pagination.currentPage = parseInt(page);
+            pagination.hasPrevPage = page > 1;
+        }
 
-        const totalItems = countResult[0].total;
-        const totalPages = Math.ceil(totalItems / limit);
+        // One grouped scan serves all three facets and the total with them
+        let facetResult = null;
+        if (includeFacets) {
+            const [groups] = await db.execute(`
+                SELECT s.category, us.skill_type, us.proficiency_level, COUNT(*) as count
+                FROM user_skills us
+                JOIN skills s ON us.skill_id = s.id
+                JOIN users u ON us.user_id = u.id
+                ${facetWhereClause}
+                GROUP BY s.category, us.skill_type, us.proficiency_level
+            `, facetParams);
+            facetResult = facetCounts(groups, { category, skill_type: type, proficiency_level: level });
+        }
 
-        res.json({
-            skills,
-            pagination: {
-                currentPage: parseInt(page),
-                totalPages,
-                totalItems,
-                hasNextPage: page < totalPages,
-                hasPrevPage: page > 1
+        // Counting every match is a second scan, so only when asked for
+        if (includeTotal) {
+            if (facetResult) {
+                pagination.totalItems = facetResult.total;
+            } else {
+                const [countResult] = await db.execute(`
+                    SELECT COUNT(*) as total
+                    FROM user_skills us
+                    JOIN skills s ON us.skill_id = s.id
+                    JOIN users u ON us.user_id = u.id
+                    ${whereClause}
+                `, params);
+                pagination.totalItems = countResult[0].total;
             }
-        });
+            pagination.totalPages = Math.ceil(pagination.totalItems / pageSize);
+        }
+
+        const body = { skills, pagination };
+        if (facetResult) {
+            body.facets = facetResult.facets;
+        }
+        if (cached) {
+            await storeSearch(cached, body);
+        }
+        res.json(body);
     } catch (error) {
         console.error('Skills search error:', error);
         res.status(500).json({ error: 'Internal server error' });
     }
 });
 
+/**
+ * @swagger
+ * /skills/search/cache/stats:
+ *   get:
+ *     summary: Get search cache hit rate and saved database time (admin only)
+ *     tags: [Skills]
+ *     security:
+ *       - bearerAuth: []
+ *     responses:
+ *       200:
+ *         description: Cache counters for this process
+ */
+router.get('/search/cache/stats', authenticateToken, requireAdmin, (req, res) => {
+    res.json(getSearchCacheStats());
+});
+
 /**
  * @swagger
  * /skills/categories:
@@ -166,10 +409,26 @@ router.get('/search', [
  */
 router.get('/categories', async (req, res) => {
     try {
+        // Counts and co-occurrence are kept current in the ai-recommender's memory
+        if (AI_SERVICE_URL) {
+            try {
+                const response = await fetch(`${AI_SERVICE_URL}/categories`, {
+                    signal: AbortSignal.timeout(AI_SERVICE_TIMEOUT)
+                });
+                if (!response.ok) {
+                    throw new Error(`AI service responded with ${response.status}`);
+                }
+                const { categories } = await response.json();
+                return res.json({ categories });
+            } catch (error) {
+                console.error('AI service unavailable, falling back to SQL:', error.message);
+            }
+        }
+
         const [categories] = await db.execute(`
             SELECT 
                 s.category,
-                COUNT(*) as skill_count,
+                COUNT(DISTINCT s.id) as skill_count,
                 COUNT(DISTINCT us.user_id) as user_count
             FROM skills s
             LEFT JOIN user_skills us ON s.id = us.skill_id AND us.is_active = TRUE
@@ -185,6 +444,80 @@ router.get('/categories', async (req, res) => {
     }
 });
 
+/**
+ * @swagger
+ * /skills/autocomplete:
+ *   get:
+ *     summary: Complete a skill name as it is typed
+ *     tags: [Skills]
+ *     parameters:
+ *       - in: query
+ *         name: q
+ *         required: true
+ *         schema:
+ *           type: string
+ *         description: Start of a skill name, or of any word in it; near misses are matched too
+ *       - in: query
+ *         name: limit
+ *         schema:
+ *           type: integer
+ *           default: 10
+ *     responses:
+ *       200:
+ *         description: Skills ranked by how many users list them
+ */
+router.get('/autocomplete', [
+    query('q').trim().isLength({ min: 1, max: 100 }),
+    query('limit').optional().isInt({ min: 1, max: 20 })
+], async (req, res) => {
+    try {
+        const errors = validationResult(req);
+        if (!errors.isEmpty()) {
+            return res.status(400).json({ errors: errors.array() });
+        }
+
+        const { q } = req.query;
+        const limit = parseInt(req.query.limit) || 10;
+
+        // Prefix array and bigram index held in the ai-recommender's memory
+        if (AI_SERVICE_URL) {
+            try {
+                const params = new URLSearchParams({ q, limit });
+                const response = await fetch(`${AI_SERVICE_URL}/autocomplete?${params}`, {
+                    signal: AbortSignal.timeout(AI_SERVICE_TIMEOUT)
+                });
+                if (!response.ok) {
+                    throw new Error(`AI service responded with ${response.status}`);
+                }
+                const { skills } = await response.json();
+                return res.json({ skills });
+            } catch (error) {
+                console.error('AI service unavailable, falling back to SQL:', error.message);
+            }
+        }
+
+        // Name prefix on idx_name, without typo tolerance
+        const [skills] = await db.execute(`
+            SELECT 
+                s.id,
+                s.name,
+                s.category,
+                COUNT(us.id) as popularity
+            FROM skills s
+            LEFT JOIN user_skills us ON s.id = us.skill_id AND us.is_active = TRUE
+            WHERE s.is_active = TRUE AND s.name LIKE ?
+            GROUP BY s.id
+            ORDER BY popularity DESC, CHAR_LENGTH(s.name), s.id
+            LIMIT ?
+        `, [`${q.replace(/[\\%_]/g, '\\$&')}%`, limit]);
+
+        res.json({ skills });
+    } catch (error) {
+        console.error('Autocomplete error:', error);
+        res.status(500).json({ error: 'Internal server error' });
+    }
+});
+
 /**
  * @swagger
  * /skills:
@@ -236,41 +569,67 @@ router.post('/', authenticateToken, [
             return res.status(400).json({ errors: errors.array() });
         }
 
-        const { skillName, category, skillType, proficiencyLevel, description = '' } = req.body;
-
-        // Check if skill exists, if not create it
-        let [skills] = await db.execute('SELECT id FROM skills WHERE name = ?', [skillName]);
-
-        let skillId;
-        if (skills.length === 0) {
-            const [skillResult] = await db.execute(
-                'INSERT INTO skills (name, category, description) VALUES (?, ?, ?)',
-                [skillName, category, description]
-            );
-            skillId = skillResult.insertId;
-        } else {
-            skillId = skills[0].id;
-        }
-
-        // Check if user already has this skill with the same type
-        const [existingUserSkills] = await db.execute(
-            'SELECT id FROM user_skills WHERE user_id = ? AND skill_id = ? AND skill_type = ?',
-            [req.user.id, skillId, skillType]
-        );
+        const { category, skillType, proficiencyLevel, description = '' } = req.body;
+        const skillName = normalizeSkillName(req.body.skillName);
+        const fields = { skillType, proficiencyLevel, description };
 
-        if (existingUserSkills.length > 0) {
-            return res.status(400).json({ error: 'You already have this skill in your profile' });
+        // Unique keys on skills and user_skills settle concurrent adds of the
+        // same skill
+        let skill = cachedSkill(skillName);
+        let userSkillId;
+        try {
+            if (skill) {
+                // Known skill: a single autocommitted insert
+                try {
+                    userSkillId = await insertUserSkill(db, req.user.id, skill.id, fields);
+                } catch (error) {
+                    if (error.code !== 'ER_NO_REFERENCED_ROW_2') {
+                        throw error;
+                    }
+                    // The cached skill is gone; create it again below
+                    forgetSkill(skill);
+                    skill = undefined;
+                }
+            }
+            if (!skill) {
+                // Unknown name: create the skill and link it in one transaction
+                const connection = await db.getConnection();
+                try {
+                    await connection.beginTransaction();
+                    skill = await upsertSkill(connection, skillName, category, description);
+                    userSkillId = await insertUserSkill(connection, req.user.id, skill.id, fields);
+                    await connection.commit();
+                } catch (error) {
+                    await connection.rollback();
+                    throw error;
+                } finally {
+                    connection.release();
+                }
+                rememberSkill(skill, skillName);
+            }
+        } catch (error) {
+            if (error.code === 'ER_DUP_ENTRY') {
+                return res.status(400).json({ error: 'You already have this skill in your profile' });
+            }
+            throw error;
         }
 
-        // Add skill to user profile
-        const [result] = await db.execute(
-            'INSERT INTO user_skills (user_id, skill_id, skill_type, proficiency_level, description) VALUES (?, ?, ?, ?, ?)',
-            [req.user.id, skillId, skillType, proficiencyLevel, description]
-        );
+        // Let the AI service apply the new skill without a full reload
+        await invalidateUsers(req.user.id);
+        await invalidateCategories(skill.category);
+        await publishEvent('user_skill_added', {
+            userId: req.user.id,
+            userSkillId,
+            skillId: skill.id,
+            skillName: skill.name,
+            category: skill.category,
+            skillType,
+            proficiencyLevel
+        });
 
         res.status(201).json({
             message: 'Skill added successfully',
-            userSkillId: result.insertId
+            userSkillId
         });
     } catch (error) {
         console.error('Add skill error:', error);
@@ -318,17 +677,14 @@ router.get('/:id', async (req, res) => {
                 u.bio,
                 u.profile_image,
                 u.location,
-                AVG(r.rating) as user_rating,
-                COUNT(DISTINCT r.id) as review_count,
-                COUNT(DISTINCT t1.id) + COUNT(DISTINCT t2.id) as total_trades
+                st.avg_rating as user_rating,
+                COALESCE(st.review_count, 0) as review_count,
+                COALESCE(st.total_trades, 0) as total_trades
             FROM user_skills us
             JOIN skills s ON us.skill_id = s.id
             JOIN users u ON us.user_id = u.id
-            LEFT JOIN trades t1 ON u.id = t1.requester_id AND t1.status = 'completed'
-            LEFT JOIN trades t2 ON u.id = t2.provider_id AND t2.status = 'completed'
-            LEFT JOIN reviews r ON u.id = r.reviewee_id
+            LEFT JOIN user_stats st ON st.user_id = u.id
             WHERE us.id = ? AND us.is_active = TRUE
-            GROUP BY us.id
         `, [id]);
 
         if (skills.length === 0) {
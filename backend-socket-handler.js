@@ -1,5 +1,7 @@
 const jwt = require('jsonwebtoken');
 const db = require('../config/database');
+const { publishEvent } = require('../services/events');
+const { invalidateUsers } = require('../services/recommendationCache');
 
 module.exports = (io) => {
     // Middleware to authenticate socket connections
@@ -181,6 +183,15 @@ module.exports = (io) => {
 
                 await db.execute(updateQuery, updateData);
 
+                if (status === 'completed') {
+                    await invalidateUsers(trade.requester_id, trade.provider_id);
+                    await publishEvent('trade_completed', {
+                        tradeId,
+                        requesterId: trade.requester_id,
+                        providerId: trade.provider_id
+                    });
+                }
+
                 // Notify both users
                 const receiverId = trade.requester_id === socket.user.id ? trade.provider_id : trade.requester_id;
 
@@ -14,11 +14,16 @@ CREATE TABLE users (
     bio TEXT,
     profile_image VARCHAR(255),
     location VARCHAR(100),
+    -- Filled from location by the users_geocode triggers
+    latitude DOUBLE,
+    longitude DOUBLE,
+    geohash VARCHAR(12),
     role ENUM('user', 'admin') DEFAULT 'user',
     is_active BOOLEAN DEFAULT TRUE,
     email_verified BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_geohash (geohash)
 );
 
 -- Skills table
@@ -29,8 +34,15 @@ CREATE TABLE skills (
     description TEXT,
     is_active BOOLEAN DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- One skill per name whatever its case or spacing; the collation also
+    -- ignores accents
+    name_key VARCHAR(100) AS (LOWER(TRIM(REGEXP_REPLACE(name, '[[:space:]]+', ' ')))) STORED,
+    UNIQUE KEY uq_skills_name_key (name_key),
     INDEX idx_category (category),
-    INDEX idx_name (name)
+    INDEX idx_name (name),
+    -- Skills search; ft_name weighs name matches above description matches
+    FULLTEXT INDEX ft_name (name),
+    FULLTEXT INDEX ft_name_description (name, description)
 );
 
 -- User Skills table (many-to-many relationship)
@@ -172,6 +184,377 @@ CREATE TABLE reports (
     INDEX idx_status_created (status, created_at)
 );
 
+-- Precomputed "people like you" lists (refreshed nightly by ai-service/similarity.py)
+CREATE TABLE user_similarities (
+    user_id INT NOT NULL,
+    similar_user_id INT NOT NULL,
+    similarity DECIMAL(5,4) NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, similar_user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (similar_user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_user_similarity (user_id, similarity)
+);
+
+-- Multi-party swap proposals (refreshed nightly by ai-service/cycles.py)
+CREATE TABLE swap_proposals (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    cycle_length TINYINT NOT NULL,
+    status ENUM('proposed', 'accepted', 'declined', 'expired') DEFAULT 'proposed',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_status_created (status, created_at)
+);
+
+-- One row per hop: teacher teaches skill to learner
+CREATE TABLE swap_proposal_legs (
+    proposal_id INT NOT NULL,
+    leg_order TINYINT NOT NULL,
+    teacher_id INT NOT NULL,
+    learner_id INT NOT NULL,
+    skill_id INT NOT NULL,
+    PRIMARY KEY (proposal_id, leg_order),
+    FOREIGN KEY (proposal_id) REFERENCES swap_proposals(id) ON DELETE CASCADE,
+    FOREIGN KEY (teacher_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (learner_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (skill_id) REFERENCES skills(id) ON DELETE CASCADE,
+    INDEX idx_teacher_proposal (teacher_id, proposal_id)
+);
+
+-- Most similar skills by description text (rebuilt by ai-service/related.py)
+CREATE TABLE skill_similarities (
+    skill_id INT NOT NULL,
+    similar_skill_id INT NOT NULL,
+    similarity DECIMAL(5,4) NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (skill_id, similar_skill_id),
+    FOREIGN KEY (skill_id) REFERENCES skills(id) ON DELETE CASCADE,
+    FOREIGN KEY (similar_skill_id) REFERENCES skills(id) ON DELETE CASCADE
+);
+
+-- Per-user review and completed-trade aggregates, kept current by the
+-- trades_stats_* and reviews_stats_* triggers (repaired by ai-service/stats.py)
+CREATE TABLE user_stats (
+    user_id INT PRIMARY KEY,
+    rating_sum INT NOT NULL DEFAULT 0,
+    review_count INT NOT NULL DEFAULT 0,
+    completed_as_requester INT NOT NULL DEFAULT 0,
+    completed_as_provider INT NOT NULL DEFAULT 0,
+    avg_rating DECIMAL(6,4) AS (rating_sum / NULLIF(review_count, 0)) STORED,
+    total_trades INT AS (completed_as_requester + completed_as_provider) STORED,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_trades_rating (total_trades, avg_rating)
+);
+
+-- Offline gazetteer used to geocode users.location; alternate spellings
+-- are extra rows with the same coordinates
+CREATE TABLE places (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    name VARCHAR(100) NOT NULL,
+    country_code CHAR(2) NOT NULL,
+    country VARCHAR(100) NOT NULL,
+    region VARCHAR(50),
+    latitude DOUBLE NOT NULL,
+    longitude DOUBLE NOT NULL,
+    population INT NOT NULL DEFAULT 0,
+    INDEX idx_name_population (name, population)
+);
+
+DELIMITER //
+
+-- Resolve a free-text location to a POINT(longitude, latitude), or NULL.
+-- Accepts "lat, lng" pairs, a place name, or "place, qualifier" where the
+-- qualifier (country code, country or region) picks between places sharing
+-- a name; otherwise the most populous one wins. The collation makes the
+-- match case- and accent-insensitive.
+CREATE FUNCTION geocode_location(location VARCHAR(100)) RETURNS POINT
+    READS SQL DATA
+BEGIN
+    DECLARE full_name VARCHAR(100) DEFAULT TRIM(location);
+    DECLARE place_name VARCHAR(100) DEFAULT TRIM(SUBSTRING_INDEX(location, ',', 1));
+    DECLARE qualifier VARCHAR(100) DEFAULT TRIM(SUBSTRING(location, CHAR_LENGTH(SUBSTRING_INDEX(location, ',', 1)) + 2));
+
+    IF location IS NULL OR full_name = '' THEN
+        RETURN NULL;
+    END IF;
+
+    IF full_name REGEXP '^[-+]?[0-9]+([.][0-9]+)? *, *[-+]?[0-9]+([.][0-9]+)?$' THEN
+        IF ABS(CAST(place_name AS DOUBLE)) <= 90 AND ABS(CAST(qualifier AS DOUBLE)) <= 180 THEN
+            RETURN POINT(CAST(qualifier AS DOUBLE), CAST(place_name AS DOUBLE));
+        END IF;
+        RETURN NULL;
+    END IF;
+
+    RETURN (
+        SELECT POINT(longitude, latitude)
+        FROM places
+        WHERE name IN (full_name, place_name)
+        ORDER BY name = full_name DESC,
+                 qualifier <> '' AND qualifier IN (country_code, country, region) DESC,
+                 population DESC
+        LIMIT 1
+    );
+END//
+
+CREATE TRIGGER users_geocode_insert BEFORE INSERT ON users
+FOR EACH ROW
+BEGIN
+    DECLARE place POINT DEFAULT geocode_location(NEW.location);
+    SET NEW.latitude = ST_Y(place),
+        NEW.longitude = ST_X(place),
+        NEW.geohash = ST_GeoHash(place, 12);
+END//
+
+CREATE TRIGGER users_geocode_update BEFORE UPDATE ON users
+FOR EACH ROW
+BEGIN
+    DECLARE place POINT;
+    IF NOT (NEW.location <=> OLD.location) THEN
+        SET place = geocode_location(NEW.location);
+        SET NEW.latitude = ST_Y(place),
+            NEW.longitude = ST_X(place),
+            NEW.geohash = ST_GeoHash(place, 12);
+    END IF;
+END//
+
+-- user_stats upkeep. Triggers run inside the statement's transaction, so
+-- the counters commit or roll back with the trade or review change.
+-- Foreign-key cascades do not fire triggers: after deleting users or
+-- user_skills that trades refer to, run ai-service/stats.py repair.
+CREATE PROCEDURE adjust_trade_stats(requester INT, provider INT, delta INT)
+    MODIFIES SQL DATA
+BEGIN
+    INSERT INTO user_stats (user_id, completed_as_requester) VALUES (requester, GREATEST(delta, 0))
+        ON DUPLICATE KEY UPDATE completed_as_requester = completed_as_requester + delta;
+    INSERT INTO user_stats (user_id, completed_as_provider) VALUES (provider, GREATEST(delta, 0))
+        ON DUPLICATE KEY UPDATE completed_as_provider = completed_as_provider + delta;
+END//
+
+CREATE PROCEDURE adjust_review_stats(reviewee INT, rating INT, delta INT)
+    MODIFIES SQL DATA
+BEGIN
+    INSERT INTO user_stats (user_id, rating_sum, review_count)
+        VALUES (reviewee, GREATEST(delta, 0) * rating, GREATEST(delta, 0))
+        ON DUPLICATE KEY UPDATE rating_sum = rating_sum + delta * rating, review_count = review_count + delta;
+END//
+
+CREATE TRIGGER trades_stats_insert AFTER INSERT ON trades
+FOR EACH ROW
+BEGIN
+    IF NEW.status = 'completed' THEN
+        CALL adjust_trade_stats(NEW.requester_id, NEW.provider_id, 1);
+    END IF;
+END//
+
+CREATE TRIGGER trades_stats_update AFTER UPDATE ON trades
+FOR EACH ROW
+BEGIN
+    IF (OLD.status <=> 'completed') <> (NEW.status <=> 'completed')
+            OR OLD.requester_id <> NEW.requester_id OR OLD.provider_id <> NEW.provider_id THEN
+        IF OLD.status = 'completed' THEN
+            CALL adjust_trade_stats(OLD.requester_id, OLD.provider_id, -1);
+        END IF;
+        IF NEW.status = 'completed' THEN
+            CALL adjust_trade_stats(NEW.requester_id, NEW.provider_id, 1);
+        END IF;
+    END IF;
+END//
+
+CREATE TRIGGER trades_stats_delete AFTER DELETE ON trades
+FOR EACH ROW
+BEGIN
+    IF OLD.status = 'completed' THEN
+        CALL adjust_trade_stats(OLD.requester_id, OLD.provider_id, -1);
+    END IF;
+END//
+
+CREATE TRIGGER reviews_stats_insert AFTER INSERT ON reviews
+FOR EACH ROW
+BEGIN
+    CALL adjust_review_stats(NEW.reviewee_id, NEW.rating, 1);
+END//
+
+CREATE TRIGGER reviews_stats_update AFTER UPDATE ON reviews
+FOR EACH ROW
+BEGIN
+    IF OLD.rating <> NEW.rating OR OLD.reviewee_id <> NEW.reviewee_id THEN
+        CALL adjust_review_stats(OLD.reviewee_id, OLD.rating, -1);
+        CALL adjust_review_stats(NEW.reviewee_id, NEW.rating, 1);
+    END IF;
+END//
+
+CREATE TRIGGER reviews_stats_delete AFTER DELETE ON reviews
+FOR EACH ROW
+BEGIN
+    CALL adjust_review_stats(OLD.reviewee_id, OLD.rating, -1);
+END//
+
+DELIMITER ;
+
+-- Gazetteer rows (population in thousands)
+INSERT INTO places (name, country_code, country, region, latitude, longitude, population) VALUES
+('New York', 'US', 'United States', 'NY', 40.7128, -74.0060, 8336),
+('New York City', 'US', 'United States', 'NY', 40.7128, -74.0060, 8336),
+('NYC', 'US', 'United States', 'NY', 40.7128, -74.0060, 8336),
+('Brooklyn', 'US', 'United States', 'NY', 40.6782, -73.9442, 2737),
+('Los Angeles', 'US', 'United States', 'CA', 34.0522, -118.2437, 3899),
+('LA', 'US', 'United States', 'CA', 34.0522, -118.2437, 3899),
+('Chicago', 'US', 'United States', 'IL', 41.8781, -87.6298, 2746),
+('Houston', 'US', 'United States', 'TX', 29.7604, -95.3698, 2304),
+('Phoenix', 'US', 'United States', 'AZ', 33.4484, -112.0740, 1608),
+('Philadelphia', 'US', 'United States', 'PA', 39.9526, -75.1652, 1603),
+('San Antonio', 'US', 'United States', 'TX', 29.4241, -98.4936, 1434),
+('San Diego', 'US', 'United States', 'CA', 32.7157, -117.1611, 1386),
+('Dallas', 'US', 'United States', 'TX', 32.7767, -96.7970, 1304),
+('San Jose', 'US', 'United States', 'CA', 37.3382, -121.8863, 1013),
+('Austin', 'US', 'United States', 'TX', 30.2672, -97.7431, 961),
+('San Francisco', 'US', 'United States', 'CA', 37.7749, -122.4194, 873),
+('SF', 'US', 'United States', 'CA', 37.7749, -122.4194, 873),
+('Seattle', 'US', 'United States', 'WA', 47.6062, -122.3321, 737),
+('Denver', 'US', 'United States', 'CO', 39.7392, -104.9903, 715),
+('Washington', 'US', 'United States', 'DC', 38.9072, -77.0369, 689),
+('Washington DC', 'US', 'United States', 'DC', 38.9072, -77.0369, 689),
+('Nashville', 'US', 'United States', 'TN', 36.1627, -86.7816, 689),
+('Boston', 'US', 'United States', 'MA', 42.3601, -71.0589, 675),
+('Portland', 'US', 'United States', 'OR', 45.5152, -122.6784, 652),
+('Portland', 'US', 'United States', 'ME', 43.6591, -70.2568, 68),
+('Las Vegas', 'US', 'United States', 'NV', 36.1699, -115.1398, 641),
+('Detroit', 'US', 'United States', 'MI', 42.3314, -83.0458, 639),
+('Baltimore', 'US', 'United States', 'MD', 39.2904, -76.6122, 585),
+('Atlanta', 'US', 'United States', 'GA', 33.7490, -84.3880, 498),
+('Miami', 'US', 'United States', 'FL', 25.7617, -80.1918, 442),
+('Minneapolis', 'US', 'United States', 'MN', 44.9778, -93.2650, 429),
+('New Orleans', 'US', 'United States', 'LA', 29.9511, -90.0715, 383),
+('Honolulu', 'US', 'United States', 'HI', 21.3069, -157.8583, 350),
+('Pittsburgh', 'US', 'United States', 'PA', 40.4406, -79.9959, 302),
+('Anchorage', 'US', 'United States', 'AK', 61.2181, -149.9003, 291),
+('Salt Lake City', 'US', 'United States', 'UT', 40.7608, -111.8910, 200),
+('Birmingham', 'US', 'United States', 'AL', 33.5186, -86.8104, 200),
+('Cambridge', 'US', 'United States', 'MA', 42.3736, -71.1097, 118),
+('Toronto', 'CA', 'Canada', 'ON', 43.6532, -79.3832, 2794),
+('Montreal', 'CA', 'Canada', 'QC', 45.5017, -73.5673, 1762),
+('Calgary', 'CA', 'Canada', 'AB', 51.0447, -114.0719, 1306),
+('Ottawa', 'CA', 'Canada', 'ON', 45.4215, -75.6972, 1017),
+('Edmonton', 'CA', 'Canada', 'AB', 53.5461, -113.4938, 1010),
+('Vancouver', 'CA', 'Canada', 'BC', 49.2827, -123.1207, 662),
+('London', 'CA', 'Canada', 'ON', 42.9849, -81.2453, 422),
+('Mexico City', 'MX', 'Mexico', NULL, 19.4326, -99.1332, 9209),
+('Guadalajara', 'MX', 'Mexico', NULL, 20.6597, -103.3496, 1385),
+('Monterrey', 'MX', 'Mexico', NULL, 25.6866, -100.3161, 1142),
+('São Paulo', 'BR', 'Brazil', NULL, -23.5505, -46.6333, 12325),
+('Rio de Janeiro', 'BR', 'Brazil', NULL, -22.9068, -43.1729, 6748),
+('Lima', 'PE', 'Peru', NULL, -12.0464, -77.0428, 9751),
+('Bogotá', 'CO', 'Colombia', NULL, 4.7110, -74.0721, 7412),
+('Medellín', 'CO', 'Colombia', NULL, 6.2442, -75.5812, 2533),
+('Santiago', 'CL', 'Chile', NULL, -33.4489, -70.6693, 6310),
+('Buenos Aires', 'AR', 'Argentina', NULL, -34.6037, -58.3816, 3075),
+('Caracas', 'VE', 'Venezuela', NULL, 10.4806, -66.9036, 2082),
+('Quito', 'EC', 'Ecuador', NULL, -0.1807, -78.4678, 2011),
+('Montevideo', 'UY', 'Uruguay', NULL, -34.9011, -56.1645, 1319),
+('London', 'GB', 'United Kingdom', NULL, 51.5074, -0.1278, 8982),
+('Birmingham', 'GB', 'United Kingdom', NULL, 52.4862, -1.8904, 1144),
+('Glasgow', 'GB', 'United Kingdom', NULL, 55.8642, -4.2518, 635),
+('Manchester', 'GB', 'United Kingdom', NULL, 53.4808, -2.2426, 553),
+('Edinburgh', 'GB', 'United Kingdom', NULL, 55.9533, -3.1883, 524),
+('Cambridge', 'GB', 'United Kingdom', NULL, 52.2053, 0.1218, 145),
+('Dublin', 'IE', 'Ireland', NULL, 53.3498, -6.2603, 554),
+('Paris', 'FR', 'France', NULL, 48.8566, 2.3522, 2161),
+('Marseille', 'FR', 'France', NULL, 43.2965, 5.3698, 870),
+('Lyon', 'FR', 'France', NULL, 45.7640, 4.8357, 516),
+('Berlin', 'DE', 'Germany', NULL, 52.5200, 13.4050, 3645),
+('Hamburg', 'DE', 'Germany', NULL, 53.5511, 9.9937, 1841),
+('Munich', 'DE', 'Germany', NULL, 48.1351, 11.5820, 1472),
+('München', 'DE', 'Germany', NULL, 48.1351, 11.5820, 1472),
+('Cologne', 'DE', 'Germany', NULL, 50.9375, 6.9603, 1086),
+('Köln', 'DE', 'Germany', NULL, 50.9375, 6.9603, 1086),
+('Frankfurt', 'DE', 'Germany', NULL, 50.1109, 8.6821, 753),
+('Amsterdam', 'NL', 'Netherlands', NULL, 52.3676, 4.9041, 872),
+('Rotterdam', 'NL', 'Netherlands', NULL, 51.9244, 4.4777, 651),
+('Brussels', 'BE', 'Belgium', NULL, 50.8503, 4.3517, 1209),
+('Zurich', 'CH', 'Switzerland', NULL, 47.3769, 8.5417, 421),
+('Geneva', 'CH', 'Switzerland', NULL, 46.2044, 6.1432, 203),
+('Vienna', 'AT', 'Austria', NULL, 48.2082, 16.3738, 1897),
+('Wien', 'AT', 'Austria', NULL, 48.2082, 16.3738, 1897),
+('Prague', 'CZ', 'Czechia', NULL, 50.0755, 14.4378, 1309),
+('Warsaw', 'PL', 'Poland', NULL, 52.2297, 21.0122, 1790),
+('Krakow', 'PL', 'Poland', NULL, 50.0647, 19.9450, 779),
+('Budapest', 'HU', 'Hungary', NULL, 47.4979, 19.0402, 1752),
+('Copenhagen', 'DK', 'Denmark', NULL, 55.6761, 12.5683, 794),
+('Stockholm', 'SE', 'Sweden', NULL, 59.3293, 18.0686, 975),
+('Oslo', 'NO', 'Norway', NULL, 59.9139, 10.7522, 697),
+('Helsinki', 'FI', 'Finland', NULL, 60.1699, 24.9384, 656),
+('Madrid', 'ES', 'Spain', NULL, 40.4168, -3.7038, 3223),
+('Barcelona', 'ES', 'Spain', NULL, 41.3851, 2.1734, 1620),
+('Valencia', 'ES', 'Spain', NULL, 39.4699, -0.3763, 791),
+('Seville', 'ES', 'Spain', NULL, 37.3891, -5.9845, 688),
+('Lisbon', 'PT', 'Portugal', NULL, 38.7223, -9.1393, 505),
+('Porto', 'PT', 'Portugal', NULL, 41.1579, -8.6291, 232),
+('Rome', 'IT', 'Italy', NULL, 41.9028, 12.4964, 2873),
+('Milan', 'IT', 'Italy', NULL, 45.4642, 9.1900, 1352),
+('Naples', 'IT', 'Italy', NULL, 40.8518, 14.2681, 959),
+('Athens', 'GR', 'Greece', NULL, 37.9838, 23.7275, 664),
+('Istanbul', 'TR', 'Turkey', NULL, 41.0082, 28.9784, 15462),
+('Moscow', 'RU', 'Russia', NULL, 55.7558, 37.6173, 12506),
+('Saint Petersburg', 'RU', 'Russia', NULL, 59.9311, 30.3609, 5351),
+('Kyiv', 'UA', 'Ukraine', NULL, 50.4501, 30.5234, 2884),
+('Bucharest', 'RO', 'Romania', NULL, 44.4268, 26.1025, 1883),
+('Sofia', 'BG', 'Bulgaria', NULL, 42.6977, 23.3219, 1236),
+('Belgrade', 'RS', 'Serbia', NULL, 44.7866, 20.4489, 1166),
+('Zagreb', 'HR', 'Croatia', NULL, 45.8150, 15.9819, 790),
+('Dubai', 'AE', 'United Arab Emirates', NULL, 25.2048, 55.2708, 3331),
+('Abu Dhabi', 'AE', 'United Arab Emirates', NULL, 24.4539, 54.3773, 1483),
+('Riyadh', 'SA', 'Saudi Arabia', NULL, 24.7136, 46.6753, 7009),
+('Tel Aviv', 'IL', 'Israel', NULL, 32.0853, 34.7818, 460),
+('Jerusalem', 'IL', 'Israel', NULL, 31.7683, 35.2137, 936),
+('Tehran', 'IR', 'Iran', NULL, 35.6892, 51.3890, 8694),
+('Cairo', 'EG', 'Egypt', NULL, 30.0444, 31.2357, 9540),
+('Casablanca', 'MA', 'Morocco', NULL, 33.5731, -7.5898, 3359),
+('Lagos', 'NG', 'Nigeria', NULL, 6.5244, 3.3792, 14862),
+('Accra', 'GH', 'Ghana', NULL, 5.6037, -0.1870, 2291),
+('Addis Ababa', 'ET', 'Ethiopia', NULL, 9.0300, 38.7400, 3384),
+('Nairobi', 'KE', 'Kenya', NULL, -1.2921, 36.8219, 4397),
+('Kinshasa', 'CD', 'DR Congo', NULL, -4.4419, 15.2663, 14342),
+('Johannesburg', 'ZA', 'South Africa', NULL, -26.2041, 28.0473, 5635),
+('Cape Town', 'ZA', 'South Africa', NULL, -33.9249, 18.4241, 4618),
+('Tokyo', 'JP', 'Japan', NULL, 35.6762, 139.6503, 13960),
+('Osaka', 'JP', 'Japan', NULL, 34.6937, 135.5023, 2691),
+('Kyoto', 'JP', 'Japan', NULL, 35.0116, 135.7681, 1464),
+('Seoul', 'KR', 'South Korea', NULL, 37.5665, 126.9780, 9776),
+('Busan', 'KR', 'South Korea', NULL, 35.1796, 129.0756, 3429),
+('Beijing', 'CN', 'China', NULL, 39.9042, 116.4074, 21542),
+('Shanghai', 'CN', 'China', NULL, 31.2304, 121.4737, 24870),
+('Guangzhou', 'CN', 'China', NULL, 23.1291, 113.2644, 18676),
+('Shenzhen', 'CN', 'China', NULL, 22.5431, 114.0579, 17494),
+('Hong Kong', 'HK', 'Hong Kong', NULL, 22.3193, 114.1694, 7482),
+('Taipei', 'TW', 'Taiwan', NULL, 25.0330, 121.5654, 2646),
+('Manila', 'PH', 'Philippines', NULL, 14.5995, 120.9842, 1846),
+('Hanoi', 'VN', 'Vietnam', NULL, 21.0278, 105.8342, 8054),
+('Ho Chi Minh City', 'VN', 'Vietnam', NULL, 10.8231, 106.6297, 8993),
+('Bangkok', 'TH', 'Thailand', NULL, 13.7563, 100.5018, 10539),
+('Kuala Lumpur', 'MY', 'Malaysia', NULL, 3.1390, 101.6869, 1982),
+('Singapore', 'SG', 'Singapore', NULL, 1.3521, 103.8198, 5686),
+('Jakarta', 'ID', 'Indonesia', NULL, -6.2088, 106.8456, 10562),
+('Mumbai', 'IN', 'India', NULL, 19.0760, 72.8777, 12442),
+('Bombay', 'IN', 'India', NULL, 19.0760, 72.8777, 12442),
+('Delhi', 'IN', 'India', NULL, 28.7041, 77.1025, 16787),
+('New Delhi', 'IN', 'India', NULL, 28.6139, 77.2090, 16787),
+('Bangalore', 'IN', 'India', NULL, 12.9716, 77.5946, 8443),
+('Bengaluru', 'IN', 'India', NULL, 12.9716, 77.5946, 8443),
+('Hyderabad', 'IN', 'India', NULL, 17.3850, 78.4867, 6810),
+('Chennai', 'IN', 'India', NULL, 13.0827, 80.2707, 4646),
+('Kolkata', 'IN', 'India', NULL, 22.5726, 88.3639, 4497),
+('Pune', 'IN', 'India', NULL, 18.5204, 73.8567, 3124),
+('Karachi', 'PK', 'Pakistan', NULL, 24.8607, 67.0011, 14910),
+('Lahore', 'PK', 'Pakistan', NULL, 31.5204, 74.3587, 11126),
+('Dhaka', 'BD', 'Bangladesh', NULL, 23.8103, 90.4125, 8906),
+('Sydney', 'AU', 'Australia', 'NSW', -33.8688, 151.2093, 5312),
+('Melbourne', 'AU', 'Australia', 'VIC', -37.8136, 144.9631, 5078),
+('Brisbane', 'AU', 'Australia', 'QLD', -27.4698, 153.0251, 2560),
+('Perth', 'AU', 'Australia', 'WA', -31.9505, 115.8605, 2085),
+('Adelaide', 'AU', 'Australia', 'SA', -34.9285, 138.6007, 1376),
+('Auckland', 'NZ', 'New Zealand', NULL, -36.8485, 174.7633, 1657),
+('Wellington', 'NZ', 'New Zealand', NULL, -41.2865, 174.7762, 215);
+
 -- Insert sample skills
 INSERT INTO skills (name, category, description) VALUES
 ('UI/UX Design', 'Design', 'User interface and user experience design'),
@@ -172,6 +172,16 @@ ADMIN_PASSWORD=admin123
 # Rate Limiting
 RATE_LIMIT_WINDOW=15
 RATE_LIMIT_MAX_REQUESTS=100
+
+# AI Recommendation Service (leave empty to use SQL recommendations)
+AI_SERVICE_URL=http://localhost:9000
+AI_SERVICE_TIMEOUT=500
+EVENTS_CHANNEL=skillswap:events
+EVENTS_STREAM=skillswap:events:log
+EVENTS_STREAM_LENGTH=100000
+RECOMMENDATION_CACHE_TTL=300
+SEARCH_CACHE_TTL=60
+SEARCH_CACHE_LOCAL_ENTRIES=500
 '''
 
 with open('backend-env-example', 'w') as f:
@@ -0,0 +1,454 @@
+# Create the change feed that keeps the AI model current between reloads
+
+# 1. Live model wrapper
+ai_model = r'''"""The live recommendation model and its incremental updates.
+
+``RecommenderModel`` bundles a SkillMatrix with every index built on it.
+Change events are applied in place: new user_skills rows go into the
+matrix overlay (which the reciprocal index reads directly), the owner's
+ranked postings, the category statistics, the autocomplete index and the
+trending counters; new trades are counted towards trending skills; rating
+or trade changes re-score the affected user. The similarity bitsets, the
+LSH index, the trade factors and related skills only catch up on the
+next full reload.
+"""
+import numpy as np
+
+from autocomplete import SkillAutocomplete
+from collaborative import TradeFactors
+from matrix import PROFICIENCY_LEVELS, SkillMatrix
+from minhash import MinHashLSH
+from reciprocal import ReciprocalIndex
+from recommender import SkillRecommender
+from related import RelatedSkills
+from similarity import SkillBitsets
+from trending import TrendingSkills
+
+
+class RecommenderModel:
+    def __init__(self, matrix, trending, factors=None, related=None, lsh_min_users=100000, lsh_bands=64, lsh_rows=2):
+        bitsets = SkillBitsets(matrix)
+        # Exact one-vs-all search is linear in users; switch to LSH at scale
+        lsh = MinHashLSH(bitsets, lsh_bands, lsh_rows) if matrix.shape[0] >= lsh_min_users else None
+        self._assemble(matrix, trending, SkillRecommender(matrix, factors, related), bitsets, lsh)
+
+    def _assemble(self, matrix, trending, recommender, bitsets, lsh):
+        self.matrix = matrix
+        self.trending = trending
+        self.recommender = recommender
+        self.reciprocal = ReciprocalIndex(matrix)
+        self.autocomplete = SkillAutocomplete(matrix)
+        self.bitsets = bitsets
+        self.lsh = lsh
+        self.applied_events = 0
+        # The Snapshot this model was mapped from, if any
+        self.snapshot = None
+
+    @classmethod
+    def load(cls, conn, factor_options=None, **options):
+        matrix = SkillMatrix.load(conn)
+        factors = TradeFactors.load(conn, matrix, **(factor_options or {}))
+        return cls(matrix, TrendingSkills.load(conn), factors, RelatedSkills.load(conn, matrix), **options)
+
+    @classmethod
+    def from_parts(cls, matrix, trending, recommender, bitsets, lsh=None):
+        """Assemble a model from indexes that are already built, e.g. restored from a snapshot."""
+        model = cls.__new__(cls)
+        model._assemble(matrix, trending, recommender, bitsets, lsh)
+        return model
+
+    @property
+    def version(self):
+        return self.matrix.version
+
+    def add_user_skill(self, user, skill, skill_type, level, user_skill_id=None):
+        """Apply a new user_skills row; returns False if it was already known.
+
+        ``user`` is (user_id, username, full_name) optionally followed by
+        (latitude, longitude), and ``skill`` is (skill_id, name, category).
+        """
+        if user_skill_id is not None:
+            self.trending.add_user_skill(user_skill_id, *skill)
+        m = self.matrix
+        with m.lock:
+            row = m.add_user(*user)
+            col = m.add_skill(*skill)
+            if not m.add_entry(row, col, skill_type, PROFICIENCY_LEVELS.index(level) + 1):
+                return False
+            self.recommender.categories.add_entry(row, col, skill_type)
+            self.autocomplete.add_entry(col)
+            self.recommender.refresh_user(row)
+            self.applied_events += 1
+        return True
+
+    def update_user_stats(self, user_id, rating, trades):
+        """Replace a user's average rating and completed trade count."""
+        m = self.matrix
+        with m.lock:
+            row = m.user_index.get(int(user_id))
+            if row is None:
+                return False
+            m.user_rating[row] = np.nan if rating is None else float(rating)
+            m.total_trades[row] = trades
+            self.recommender.refresh_user(row)
+            self.applied_events += 1
+        return True
+
+    def add_trade(self, trade_id, requester_skill_id, provider_skill_id, created_at=None):
+        """Count a newly created trade towards trending skills."""
+        if not self.trending.add_trade(trade_id, requester_skill_id, provider_skill_id, created_at):
+            return False
+        self.applied_events += 1
+        return True
+'''
+
+with open('ai-service-model.py', 'w') as f:
+    f.write(ai_model)
+
+print("✅ Created AI service live model")
+
+# 2. Redis change feed consumer
+ai_events = r'''"""Apply change events published by the Express backend to the live model.
+
+The backend publishes JSON messages on the ``EVENTS_CHANNEL`` Redis channel:
+
+    {"type": "user_skill_added", "userId": 7, "userSkillId": 41, "skillId": 3, "skillName": "Python",
+     "category": "Programming", "skillType": "offering", "proficiencyLevel": "expert"}
+    {"type": "trade_created", "tradeId": 12, "requesterSkillId": 41, "providerSkillId": 58}
+    {"type": "trade_completed", "tradeId": 12, "requesterId": 7, "providerId": 9}
+    {"type": "review_created", "revieweeId": 9}
+
+Skill events carry everything the overlay needs; trade and review events
+only say whose aggregates changed, so those are re-read from MySQL. Trades
+are counted once per id, so applying any event twice is harmless.
+
+The backend also appends every event to the ``EVENTS_STREAM`` Redis
+stream. A freshly loaded model gets the events published since its data
+was read replayed onto it, from the events this worker received itself
+when it was subscribed by then and from the stream otherwise, before it
+replaces the old one. The stream is also replayed after the subscription
+drops and comes back.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import pymysql
+import redis
+
+from db import connect
+from matrix import USER_SQL, USER_STATS_SQL
+from trending import USER_SKILL_SQL
+
+EVENTS_CHANNEL = os.environ.get('EVENTS_CHANNEL', 'skillswap:events')
+EVENTS_STREAM = os.environ.get('EVENTS_STREAM', 'skillswap:events:log')
+REDIS_CONFIG = {
+    'host': os.environ.get('REDIS_HOST', 'localhost'),
+    'port': int(os.environ.get('REDIS_PORT', 6379)),
+    'password': os.environ.get('REDIS_PASSWORD') or None,
+}
+# Read by the backend's recommendation cache to key results by model
+MODEL_VERSION_KEY = 'skillswap:recommendations:model_version'
+RECONNECT_DELAY = 5
+# How long start() waits for the subscription before loading without it
+SUBSCRIBE_TIMEOUT = 10
+REPLAY_WINDOW = 10000
+# The stream is read from this many seconds before a model's data was read,
+# in case this host's clock is ahead of Redis's
+CLOCK_SKEW = 5
+STREAM_BATCH = 1000
+
+logger = logging.getLogger('events')
+
+
+def _stream_start(since):
+    """First stream id, in Redis milliseconds, that may hold an event from ``since`` on."""
+    return max(0, int((since - CLOCK_SKEW) * 1000))
+
+
+def _entry_ms(entry_id):
+    return int(entry_id.split('-')[0])
+
+
+class ChangeFeed:
+    """Redis subscriber that keeps a RecommenderModel current."""
+
+    def __init__(self, model=None):
+        self.model = model
+        # When the live model's data was read
+        self.since = None
+        self.recent = deque(maxlen=REPLAY_WINDOW)
+        self.lock = threading.Lock()
+        self.conn = None
+        self.redis = redis.Redis(**REDIS_CONFIG, decode_responses=True)
+        self.subscribed = threading.Event()
+        # Since when every published event has reached self.recent
+        self.subscribed_at = None
+
+    def start(self, timeout=SUBSCRIBE_TIMEOUT):
+        """Subscribe in the background; returns once Redis confirmed the subscription.
+
+        Start before reading the model's data so events published meanwhile
+        are held for replay. Returns False if not subscribed within ``timeout``.
+        """
+        threading.Thread(target=self._listen, daemon=True).start()
+        if not self.subscribed.wait(timeout):
+            logger.warning('Not subscribed to %s after %ss; events until then are missed', EVENTS_CHANNEL, timeout)
+            return False
+        return True
+
+    def _listen(self):
+        # Events published after the last message heard may have been missed
+        heard = disconnected_at = None
+        while True:
+            try:
+                pubsub = redis.Redis(**REDIS_CONFIG).pubsub()
+                pubsub.subscribe(EVENTS_CHANNEL)
+                for message in pubsub.listen():
+                    heard = time.time()
+                    if message['type'] == 'subscribe':
+                        logger.info('Subscribed to %s', EVENTS_CHANNEL)
+                        self._subscribed(disconnected_at)
+                    elif message['type'] == 'message':
+                        self.receive(message['data'])
+            except redis.RedisError:
+                logger.exception('Change feed disconnected')
+            except Exception:
+                logger.exception('Change feed failed')
+            if self.subscribed.is_set():
+                disconnected_at = heard
+            self.subscribed.clear()
+            time.sleep(RECONNECT_DELAY)
+
+    def _subscribed(self, disconnected_at):
+        with self.lock:
+            self.subscribed_at = time.time()
+            # Catch the live model up on what was published while disconnected,
+            # or since its data was read if it went live before the first subscription
+            missed_since = disconnected_at or self.since
+            if self.model is not None and missed_since is not None:
+                replayed = self._replay_stream(self.model, missed_since)
+                if replayed:
+                    logger.info('Replayed %d events missed while disconnected', replayed)
+        self.subscribed.set()
+
+    def _decode(self, data):
+        try:
+            event = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning('Ignoring non-JSON event: %r', data)
+            return None
+        if not isinstance(event, dict):
+            logger.warning('Ignoring malformed event: %r', event)
+            return None
+        return event
+
+    def receive(self, data):
+        event = self._decode(data)
+        if event is not None:
+            self.handle(event)
+
+    def handle(self, event):
+        with self.lock:
+            self.recent.append((time.time(), event))
+            if self.model is not None:
+                self.apply(self.model, event)
+
+    def _remembers(self, since):
+        """True if self.recent holds every event published from ``since`` on; hold the lock."""
+        if not self.subscribed.is_set() or self.subscribed_at is None or self.subscribed_at > since:
+            return False
+        return len(self.recent) < self.recent.maxlen or self.recent[0][0] <= since
+
+    def covers(self, since):
+        """True if the events published from ``since`` on can still be replayed.
+
+        They can if this worker has been subscribed since then, or if the
+        stream has not been trimmed past it. With Redis unreachable no model
+        can be brought up to date, so that counts as covered too.
+        """
+        with self.lock:
+            if self._remembers(since):
+                return True
+        try:
+            if not self.redis.exists(EVENTS_STREAM):
+                return True
+            trimmed = self.redis.xinfo_stream(EVENTS_STREAM).get('max-deleted-entry-id', '0-0')
+        except redis.RedisError:
+            logger.warning('Could not read %s; assuming it covers %s', EVENTS_STREAM, since)
+            return True
+        return _entry_ms(trimmed) < _stream_start(since)
+
+    def _replay_stream(self, model, since):
+        """Apply the events logged from ``since`` on to ``model``; returns how many."""
+        start = f'{_stream_start(since)}-0'
+        replayed = 0
+        try:
+            while True:
+                entries = self.redis.xrange(EVENTS_STREAM, min=start, count=STREAM_BATCH)
+                for _, fields in entries:
+                    event = self._decode(fields.get('data'))
+                    if event is not None:
+                        self.apply(model, event)
+                        replayed += 1
+                if len(entries) < STREAM_BATCH:
+                    return replayed
+                start = '(' + entries[-1][0]
+        except redis.RedisError:
+            logger.exception('Could not replay %s from %s', EVENTS_STREAM, since)
+            return replayed
+
+    def install(self, model, since):
+        """Replay events published from ``since`` on onto ``model`` and make it live."""
+        with self.lock:
+            replayed = 0
+            if not self._remembers(since):
+                replayed += self._replay_stream(model, since)
+            # Events received while the stream was read may not be in what
+            # was read; applying one twice is harmless
+            for received, event in self.recent:
+                if received >= since:
+                    self.apply(model, event)
+                    replayed += 1
+            self.model = model
+            self.since = since
+        if replayed:
+            logger.info('Replayed %d events onto model %s', replayed, model.version)
+        try:
+            self.redis.set(MODEL_VERSION_KEY, model.version)
+        except redis.RedisError:
+            logger.warning('Could not publish model version %s', model.version)
+
+    def apply(self, model, event):
+        kind = event.get('type')
+        try:
+            if kind == 'user_skill_added':
+                user = self._user(model, int(event['userId']))
+                if user is not None:
+                    model.add_user_skill(
+                        user,
+                        (int(event['skillId']), event['skillName'], event['category']),
+                        event['skillType'],
+                        event['proficiencyLevel'],
+                        event.get('userSkillId'),
+                    )
+            elif kind == 'trade_created':
+                skill_ids = (int(event['requesterSkillId']), int(event['providerSkillId']))
+                for user_skill_id in skill_ids:
+                    if not model.trending.knows_user_skill(user_skill_id):
+                        row = self._fetch_one(USER_SKILL_SQL, (user_skill_id,))
+                        if row is not None:
+                            model.trending.add_user_skill(*row)
+                model.add_trade(int(event['tradeId']), *skill_ids)
+            elif kind == 'trade_completed':
+                for user_id in (event['requesterId'], event['providerId']):
+                    model.update_user_stats(int(user_id), *self._stats(int(user_id)))
+            elif kind == 'review_created':
+                user_id = int(event['revieweeId'])
+                model.update_user_stats(user_id, *self._stats(user_id))
+        except (KeyError, TypeError, ValueError):
+            logger.warning('Ignoring malformed %s event: %r', kind, event)
+        except pymysql.Error:
+            # Reconnect on the next lookup rather than reusing a broken connection
+            logger.exception('MySQL lookup failed applying %s event', kind)
+            self._close()
+        except Exception:
+            # One bad event must not drop the subscription
+            logger.exception('Could not apply %s event: %r', kind, event)
+
+    def _close(self):
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except pymysql.Error:
+                pass
+
+    def _user(self, model, user_id):
+        m = model.matrix
+        row = m.user_index.get(user_id)
+        if row is not None:
+            return user_id, m.usernames[row], m.full_names[row]
+        return self._fetch_one(USER_SQL, (user_id,))
+
+    def _stats(self, user_id):
+        # No user_stats row yet means no reviews or completed trades
+        rating, trades = self._fetch_one(USER_STATS_SQL, {'user_id': user_id}) or (None, 0)
+        return rating, int(trades or 0)
+
+    def _fetch_one(self, sql, params):
+        if self.conn is None:
+            self.conn = connect(autocommit=True)
+        else:
+            self.conn.ping(reconnect=True)
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()
+'''
+
+with open('ai-service-events.py', 'w') as f:
+    f.write(ai_events)
+
+print("✅ Created AI service change feed")
+
+# 3. Backend Redis client and event publisher
+redis_config = '''const { createClient } = require('redis');
+require('dotenv').config();
+
+const client = createClient({
+    socket: {
+        host: process.env.REDIS_HOST || 'localhost',
+        port: process.env.REDIS_PORT || 6379
+    },
+    password: process.env.REDIS_PASSWORD || undefined,
+    // Fail fast instead of queueing commands while Redis is down
+    disableOfflineQueue: true
+});
+
+client.on('error', (error) => {
+    console.error('❌ Redis error:', error.message);
+});
+
+client.connect()
+    .then(() => console.log('✅ Redis connected successfully'))
+    .catch((error) => console.error('❌ Redis connection failed:', error.message));
+
+module.exports = client;
+'''
+
+with open('backend-redis.js', 'w') as f:
+    f.write(redis_config)
+
+events_service = '''const redis = require('../config/redis');
+
+const EVENTS_CHANNEL = process.env.EVENTS_CHANNEL || 'skillswap:events';
+// Log of the same events, for AI service workers to replay onto a model
+// whose data was read before they subscribed
+const EVENTS_STREAM = process.env.EVENTS_STREAM || 'skillswap:events:log';
+const EVENTS_STREAM_LENGTH = parseInt(process.env.EVENTS_STREAM_LENGTH) || 100000;
+
+// Log and publish a change event for the AI service; never fails the caller
+async function publishEvent(type, payload) {
+    const message = JSON.stringify({ type, ...payload });
+    try {
+        await redis.multi()
+            .xAdd(EVENTS_STREAM, '*', { data: message }, {
+                TRIM: { strategy: 'MAXLEN', strategyModifier: '~', threshold: EVENTS_STREAM_LENGTH }
+            })
+            .publish(EVENTS_CHANNEL, message)
+            .exec();
+    } catch (error) {
+        console.error(`Publish ${type} event error:`, error.message);
+    }
+}
+
+module.exports = { publishEvent, EVENTS_CHANNEL, EVENTS_STREAM };
+'''
+
+with open('backend-events.js', 'w') as f:
+    f.write(events_service)
+
+print("✅ Created backend Redis client and event publisher")
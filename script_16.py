@@ -0,0 +1,177 @@
+# Create the location index for radius queries
+
+ai_geo = r'''"""Radius queries over user coordinates.
+
+users.latitude/longitude are filled from the free-text location by the
+geocode_location() triggers in MySQL, which resolve names against the
+offline ``places`` gazetteer. ``GeoGrid`` buckets located users into fixed
+latitude/longitude cells kept as sorted cell keys, so a radius query only
+visits the cells overlapping the circle's bounding box and checks the exact
+great-circle distance for the users in them.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEGREES = 0.25
+MAX_RADIUS_KM = 500
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distances from one point to arrays of points."""
+    lat, lon, lats, lons = (np.radians(value) for value in (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+class GeoGrid:
+    """Located user rows grouped by grid cell, CSR-style."""
+
+    def __init__(self, lat, lon, cell_degrees=CELL_DEGREES):
+        self.lat = lat
+        self.lon = lon
+        self.cell_degrees = cell_degrees
+        self.columns = int(round(360 / cell_degrees))
+        located = np.flatnonzero(~np.isnan(lat) & ~np.isnan(lon))
+        keys = self._keys(lat[located], lon[located])
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.rows = located[order].astype(np.int32)
+
+    def _band(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90) / self.cell_degrees), 0, 180 / self.cell_degrees - 1).astype(np.int64)
+
+    def _column(self, lon):
+        return np.floor((np.asarray(lon) + 180) / self.cell_degrees).astype(np.int64) % self.columns
+
+    def _keys(self, lat, lon):
+        return self._band(lat) * self.columns + self._column(lon)
+
+    def within(self, lat, lon, km):
+        """Rows of the users within ``km`` of (lat, lon) and their distances."""
+        if np.isnan(lat) or np.isnan(lon) or len(self.rows) == 0:
+            return self.rows[:0], np.empty(0)
+
+        # Bounding box of the circle; it wraps in longitude or covers a pole
+        angle = km / EARTH_RADIUS_KM
+        south, north = lat - math.degrees(angle), lat + math.degrees(angle)
+        bands = np.arange(self._band(max(south, -90)), self._band(min(north, 90)) + 1)
+        if south <= -90 or north >= 90 or math.sin(angle) >= math.cos(math.radians(lat)):
+            spans = [(0, self.columns - 1)]
+        else:
+            delta = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+            west, east = self._column(lon - delta), self._column(lon + delta)
+            spans = [(west, east)] if west <= east else [(west, self.columns - 1), (0, east)]
+
+        starts = np.concatenate([bands * self.columns + first for first, _ in spans])
+        ends = np.concatenate([bands * self.columns + last + 1 for _, last in spans])
+        lo, hi = np.searchsorted(self.keys, starts), np.searchsorted(self.keys, ends)
+        lengths = hi - lo
+        index = np.arange(lengths.sum()) + np.repeat(lo - (np.cumsum(lengths) - lengths), lengths)
+        rows = self.rows[index]
+
+        distances = haversine_km(lat, lon, self.lat[rows], self.lon[rows])
+        keep = distances <= km
+        return rows[keep], distances[keep]
+'''
+
+with open('ai-service-geo.py', 'w') as f:
+    f.write(ai_geo)
+
+print("✅ Created AI service location index")
+
+# Backend geohash helpers for radius filters in SQL
+geo_service = '''const db = require('../config/database');
+
+const GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz';
+const KM_PER_DEGREE = 111.195;
+const MAX_RADIUS_KM = 500;
+
+// Geohash of a point, as stored in users.geohash by ST_GeoHash()
+function encodeGeohash(lat, lng, length) {
+    let [latLo, latHi, lngLo, lngHi] = [-90, 90, -180, 180];
+    let hash = '';
+    let bits = 0;
+    let value = 0;
+    let evenBit = true;
+    while (hash.length < length) {
+        if (evenBit) {
+            const mid = (lngLo + lngHi) / 2;
+            value = value * 2 + (lng >= mid ? 1 : 0);
+            if (lng >= mid) lngLo = mid; else lngHi = mid;
+        } else {
+            const mid = (latLo + latHi) / 2;
+            value = value * 2 + (lat >= mid ? 1 : 0);
+            if (lat >= mid) latLo = mid; else latHi = mid;
+        }
+        evenBit = !evenBit;
+        if (++bits === 5) {
+            hash += GEOHASH_ALPHABET[value];
+            bits = 0;
+            value = 0;
+        }
+    }
+    return hash;
+}
+
+// The 3x3 block of geohash cells around a point, using the smallest cells
+// that are still at least radiusKm across so the block covers the circle.
+// Returns null when no block does (huge radius or near a pole).
+function coveringCells(lat, lng, radiusKm) {
+    const farthestLat = Math.min(90, Math.abs(lat) + radiusKm / KM_PER_DEGREE);
+    for (let length = 9; length >= 1; length--) {
+        const lngBits = Math.ceil(length * 5 / 2);
+        const latBits = Math.floor(length * 5 / 2);
+        const cellLat = 180 / 2 ** latBits;
+        const cellLng = 360 / 2 ** lngBits;
+        const widthKm = cellLng * KM_PER_DEGREE * Math.cos(farthestLat * Math.PI / 180);
+        if (cellLat * KM_PER_DEGREE < radiusKm || widthKm < radiusKm) {
+            continue;
+        }
+        const cells = new Set();
+        for (const dLat of [-1, 0, 1]) {
+            for (const dLng of [-1, 0, 1]) {
+                const probeLat = Math.max(-90, Math.min(90, lat + dLat * cellLat));
+                const probeLng = ((lng + dLng * cellLng + 540) % 360) - 180;
+                cells.add(encodeGeohash(probeLat, probeLng, length));
+            }
+        }
+        return [...cells];
+    }
+    return null;
+}
+
+// WHERE fragment keeping users within radiusKm of a point: geohash prefix
+// ranges on idx_geohash narrow the rows, the exact distance check follows
+function withinRadius(alias, lat, lng, radiusKm) {
+    const cells = coveringCells(lat, lng, radiusKm) || [];
+    const prefixes = cells.map(() => `${alias}.geohash LIKE ?`).join(' OR ');
+    return {
+        sql: `${prefixes ? `(${prefixes}) AND ` : ''}` +
+            `ST_Distance_Sphere(POINT(${alias}.longitude, ${alias}.latitude), POINT(?, ?)) <= ?`,
+        params: [...cells.map((cell) => `${cell}%`), lng, lat, radiusKm * 1000]
+    };
+}
+
+// SELECT expression for the distance from a point in km
+function distanceKm(alias) {
+    return `ST_Distance_Sphere(POINT(${alias}.longitude, ${alias}.latitude), POINT(?, ?)) / 1000`;
+}
+
+// Resolve a place name with the same gazetteer lookup the users triggers use
+async function geocodePlace(location) {
+    const [rows] = await db.execute(`
+        SELECT ST_Y(place) AS latitude, ST_X(place) AS longitude
+        FROM (SELECT geocode_location(?) AS place) geocoded
+    `, [location]);
+    return rows[0].latitude === null ? null : rows[0];
+}
+
+module.exports = { encodeGeohash, coveringCells, withinRadius, distanceKm, geocodePlace, MAX_RADIUS_KM };
+'''
+
+with open('backend-geo.js', 'w') as f:
+    f.write(geo_service)
+
+print("✅ Created backend geohash helpers")
@@ -0,0 +1,420 @@
+# Create the offline evaluation harness
+
+ai_evaluate = r'''"""Offline evaluation: replay historical trades against the recommender.
+
+A dataset file holds everything replay needs, so evaluation runs without a
+database:
+
+    python evaluate.py export --output dataset.npz
+    python evaluate.py export --synthetic 100000 --output synthetic.npz
+    python evaluate.py run dataset.npz --k 5 10 20 --workers 8 --output evaluation.json
+
+Every trade request is a query: what would the recommender have suggested
+to the requester just before they asked? The providers they requested
+within HORIZON_DAYS count as relevant, and a requester is asked again only
+once that window has passed. Replay is split into time slices holding equal
+numbers of queries. Each slice builds the model from everything created
+before its start, then applies user_skills, reviews and completed trades in
+time order through the model's incremental updates, querying in between.
+Slices run in a fork-based process pool that shares the dataset
+copy-on-write.
+
+Reports precision@k, recall@k, NDCG@k and hit rate for each k, overall and
+per slice, plus query latency and per-slice build time. Latency includes
+the update overlay growing through each slice, as it does between rebuilds
+in the service; more slices keep it smaller.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import time
+from itertools import islice
+
+import numpy as np
+
+from benchmark import latency_stats, synthetic_population
+from collaborative import TradeFactors
+from matrix import BUILD_CHUNK, PROFICIENCY_LEVELS, SKILL_TYPES, SkillMatrix
+from model import RecommenderModel
+from recommender import SkillRecommender
+from related import RelatedSkills
+
+HORIZON_DAYS = 7
+DAY = 86400
+DEFAULT_K = (5, 10, 20)
+
+EXPORT_SQL = {
+    'users': 'SELECT id, latitude, longitude FROM users WHERE is_active = TRUE',
+    'skills': 'SELECT id, name, category FROM skills',
+    'user_skills': """
+        SELECT us.user_id, us.skill_id, us.skill_type = 'seeking',
+               FIELD(us.proficiency_level, 'beginner', 'intermediate', 'expert'), UNIX_TIMESTAMP(us.created_at)
+        FROM user_skills us
+        JOIN users u ON us.user_id = u.id
+        WHERE us.is_active = TRUE AND u.is_active = TRUE
+    """,
+    'trades': """
+        SELECT t.id, t.requester_id, t.provider_id, rs.skill_id, ps.skill_id, UNIX_TIMESTAMP(t.created_at),
+               CASE WHEN t.status = 'completed' THEN UNIX_TIMESTAMP(COALESCE(t.completed_at, t.updated_at)) END
+        FROM trades t
+        JOIN user_skills rs ON rs.id = t.requester_skill_id
+        JOIN user_skills ps ON ps.id = t.provider_skill_id
+    """,
+    'reviews': 'SELECT trade_id, reviewer_id, reviewee_id, rating, UNIX_TIMESTAMP(created_at) FROM reviews',
+    'similarities': 'SELECT skill_id, similar_skill_id, similarity FROM skill_similarities',
+}
+
+# Array names per exported table, in SELECT order
+COLUMNS = {
+    'users': (('id', np.int64), ('lat', np.float64), ('lon', np.float64)),
+    'skills': (('id', np.int64), ('name', str), ('category', str)),
+    'user_skills': (('user_id', np.int64), ('skill_id', np.int64), ('type', np.int8), ('level', np.int8),
+                    ('created_at', np.float64)),
+    'trades': (('id', np.int64), ('requester_id', np.int64), ('provider_id', np.int64),
+               ('requester_skill_id', np.int64), ('provider_skill_id', np.int64),
+               ('created_at', np.float64), ('completed_at', np.float64)),
+    'reviews': (('trade_id', np.int64), ('reviewer_id', np.int64), ('reviewee_id', np.int64),
+                ('rating', np.float64), ('created_at', np.float64)),
+    'similarities': (('skill_id', np.int64), ('similar_skill_id', np.int64), ('similarity', np.float64)),
+}
+
+logger = logging.getLogger('evaluate')
+
+
+def to_columns(table, rows):
+    """Arrays named ``<table>.<column>`` from streamed result rows; NULL becomes NaN."""
+    columns = COLUMNS[table]
+    parts = [[] for _ in columns]
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, BUILD_CHUNK))
+        if not chunk:
+            break
+        for part, (_, dtype), values in zip(parts, columns, zip(*chunk)):
+            part.append(np.array([np.nan if value is None else value for value in values], dtype=dtype))
+    return {
+        f'{table}.{name}': np.concatenate(part) if part else np.empty(0, dtype=dtype)
+        for part, (name, dtype) in zip(parts, columns)
+    }
+
+
+def export_dataset(conn):
+    from db import stream
+
+    data = {}
+    for table, sql in EXPORT_SQL.items():
+        data.update(to_columns(table, stream(conn, sql)))
+    return data
+
+
+def synthetic_dataset(users, seed=0, now=None, days=60):
+    """A dataset from a benchmark population, with trades that follow skill demand.
+
+    Most user_skills rows exist before the replay period; requesters ask a
+    random offerer of one of their sought skills.
+    """
+    rng = np.random.default_rng(seed)
+    now = time.time() if now is None else now
+    population = synthetic_population(users, seed=seed, now=now)
+    data = to_columns('users', [row[:1] + row[3:] for row in population['users']])
+    data.update(to_columns('skills', population['skills']))
+    data.update(to_columns('similarities', []))
+
+    _, owner, skill, kind, level = zip(*population['user_skills'])
+    owner, skill = np.array(owner), np.array(skill)
+    seeking = np.array(kind) == 'seeking'
+    created = now - days * DAY * np.where(rng.random(len(owner)) < 0.8, rng.uniform(1, 2, len(owner)), rng.random(len(owner)))
+    data.update({
+        'user_skills.user_id': owner, 'user_skills.skill_id': skill, 'user_skills.type': seeking.astype(np.int8),
+        'user_skills.level': np.array([PROFICIENCY_LEVELS.index(v) + 1 for v in level], dtype=np.int8),
+        'user_skills.created_at': created,
+    })
+
+    # Each trade pairs a seeking row with a random offering row of the same skill
+    offers = np.flatnonzero(~seeking)
+    offers = offers[np.argsort(skill[offers], kind='stable')]
+    starts = np.searchsorted(skill[offers], skill)
+    counts = np.searchsorted(skill[offers], skill, side='right') - starts
+    seeks = np.flatnonzero(seeking & (counts > 0))
+    request = rng.choice(seeks, size=users * 2)
+    provide = offers[starts[request] + (rng.random(len(request)) * counts[request]).astype(np.int64)]
+    keep = owner[request] != owner[provide]
+    request, provide = request[keep], provide[keep]
+    created_at = np.maximum(created[request], created[provide]) + rng.uniform(0, days * DAY, len(request))
+    keep = created_at < now
+    request, provide, created_at = request[keep], provide[keep], created_at[keep]
+    completed_at = np.where(rng.random(len(request)) < 0.6, created_at + rng.uniform(0, 14 * DAY, len(request)), np.nan)
+    data.update({
+        'trades.id': np.arange(1, len(request) + 1), 'trades.requester_id': owner[request],
+        'trades.provider_id': owner[provide], 'trades.requester_skill_id': skill[request],
+        'trades.provider_skill_id': skill[provide], 'trades.created_at': created_at,
+        'trades.completed_at': completed_at,
+    })
+
+    # Requesters review most completed trades
+    reviewed = np.flatnonzero(~np.isnan(completed_at) & (rng.random(len(request)) < 0.7))
+    data.update({
+        'reviews.trade_id': reviewed + 1, 'reviews.reviewer_id': owner[request][reviewed],
+        'reviews.reviewee_id': owner[provide][reviewed],
+        'reviews.rating': rng.choice(np.arange(1, 6), size=len(reviewed), p=(0.03, 0.07, 0.2, 0.35, 0.35)).astype(np.float64),
+        'reviews.created_at': completed_at[reviewed] + rng.uniform(0, 3 * DAY, len(reviewed)),
+    })
+    return data
+
+
+def load_dataset(path):
+    with np.load(path) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
+def build_queries(data, horizon=HORIZON_DAYS * DAY):
+    """(time, requester_id, relevant provider ids) per query, in time order."""
+    requester, provider = data['trades.requester_id'], data['trades.provider_id']
+    created = data['trades.created_at']
+    order = np.lexsort((created, requester))
+    requester, provider, created = requester[order], provider[order], created[order]
+    queries = []
+    start = 0
+    for end in np.append(np.flatnonzero(np.diff(requester)) + 1, len(requester)).tolist():
+        asked_until = -np.inf
+        for i in range(start, end):
+            if created[i] < asked_until:
+                continue
+            asked_until = created[i] + horizon
+            window = np.searchsorted(created[start:end], asked_until, side='left') + start
+            queries.append((float(created[i]), int(requester[i]), frozenset(provider[i:window].tolist())))
+        start = end
+    queries.sort(key=lambda query: query[0])
+    return queries
+
+
+def rank_metrics(recommended, relevant, ks):
+    """precision, recall, NDCG and hit for one ranked list at each k."""
+    gains = np.array([user_id in relevant for user_id in recommended], dtype=np.float64)
+    discounts = 1 / np.log2(np.arange(2, max(ks) + 2))
+    metrics = {}
+    for k in ks:
+        hits = gains[:k].sum()
+        ideal = discounts[:min(len(relevant), k)].sum()
+        metrics[k] = (hits / k, hits / len(relevant), float(gains[:k] @ discounts[:len(gains[:k])]) / ideal, float(hits > 0))
+    return metrics
+
+
+def build_model(data, until, collaborative=False, related=False):
+    """Model from the dataset rows created before ``until``.
+
+    Also returns the running review totals (user_id -> [sum, count]) and
+    completed trade counts it was built with.
+    """
+    users = [(user_id, f'user{user_id}', '', None if lat != lat else lat, None if lon != lon else lon)
+             for user_id, lat, lon in zip(*(data[f'users.{name}'].tolist() for name in ('id', 'lat', 'lon')))]
+    skills = list(zip(*(data[f'skills.{name}'].tolist() for name in ('id', 'name', 'category'))))
+    before = data['user_skills.created_at'] < until
+    user_skills = zip(
+        data['user_skills.user_id'][before].tolist(), data['user_skills.skill_id'][before].tolist(),
+        [SKILL_TYPES[code] for code in data['user_skills.type'][before].tolist()],
+        [PROFICIENCY_LEVELS[code - 1] for code in data['user_skills.level'][before].tolist()],
+    )
+    reviews = {}
+    before = data['reviews.created_at'] < until
+    for user_id, rating in zip(data['reviews.reviewee_id'][before].tolist(), data['reviews.rating'][before].tolist()):
+        total = reviews.setdefault(user_id, [0.0, 0])
+        total[0] += rating
+        total[1] += 1
+    done = data['trades.completed_at'] < until
+    users_done, counts = np.unique(
+        np.concatenate([data['trades.requester_id'][done], data['trades.provider_id'][done]]), return_counts=True,
+    )
+    completed = dict(zip(users_done.tolist(), counts.tolist()))
+    ratings = [(user_id, total / count) for user_id, (total, count) in reviews.items()]
+    matrix = SkillMatrix(users, skills, user_skills, ratings, completed.items())
+
+    factors = similar = None
+    if collaborative:
+        given = {
+            (trade_id, reviewer_id): rating for trade_id, reviewer_id, rating in zip(
+                *(data[f'reviews.{name}'][before].tolist() for name in ('trade_id', 'reviewer_id', 'rating')))
+        }
+        interactions = [
+            (user_id, skill_id, given.get((trade_id, user_id)))
+            for trade_id, requester_id, provider_id, requester_skill, provider_skill in zip(*(
+                data[f'trades.{name}'][done].tolist()
+                for name in ('id', 'requester_id', 'provider_id', 'requester_skill_id', 'provider_skill_id')))
+            for user_id in (requester_id, provider_id)
+            for skill_id in (requester_skill, provider_skill)
+        ]
+        factors = TradeFactors(matrix, interactions)
+    if related:
+        similar = RelatedSkills(matrix, zip(*(
+            data[f'similarities.{name}'].tolist() for name in ('skill_id', 'similar_skill_id', 'similarity'))))
+    model = RecommenderModel.from_parts(matrix, None, SkillRecommender(matrix, factors, similar), None)
+    return model, reviews, completed
+
+
+# Timeline event kinds; queries sort first so they never see events at their own time
+QUERY, USER_SKILL, REVIEW, COMPLETED = range(4)
+
+
+def _timeline(data, start, end, queries):
+    def between(times):
+        return np.flatnonzero((times >= start) & (times < end)).tolist()
+
+    events = [(when, QUERY, query) for when, *query in queries]
+    added = data['user_skills.created_at']
+    events += [(added[i], USER_SKILL, i) for i in between(added)]
+    reviewed = data['reviews.created_at']
+    events += [(reviewed[i], REVIEW, i) for i in between(reviewed)]
+    completed = data['trades.completed_at']
+    events += [(completed[i], COMPLETED, i) for i in between(completed)]
+    events.sort(key=lambda event: (event[0], event[1]))
+    return events
+
+
+def replay_slice(data, start, end, queries, ks=DEFAULT_K, collaborative=False, related=False):
+    """Replay one time slice and total its queries' metrics."""
+    started = time.perf_counter()
+    model, reviews, completed = build_model(data, start, collaborative, related)
+    build_seconds = time.perf_counter() - started
+    skills = {
+        skill_id: (skill_id, name, category) for skill_id, name, category in
+        zip(*(data[f'skills.{name}'].tolist() for name in ('id', 'name', 'category')))
+    }
+
+    def update_stats(user_id):
+        total, count = reviews.get(user_id, (0.0, 0))
+        model.update_user_stats(user_id, total / count if count else None, completed.get(user_id, 0))
+
+    totals = {k: np.zeros(4) for k in ks}
+    timings = []
+    for _, kind, event in _timeline(data, start, end, queries):
+        if kind == QUERY:
+            requester_id, relevant = event
+            query_started = time.perf_counter()
+            recommended = model.recommender.get_recommendations(requester_id, max(ks))
+            timings.append(time.perf_counter() - query_started)
+            for k, values in rank_metrics([r['user_id'] for r in recommended], relevant, ks).items():
+                totals[k] += values
+        elif kind == USER_SKILL:
+            user_id = int(data['user_skills.user_id'][event])
+            model.add_user_skill(
+                (user_id, f'user{user_id}', ''), skills[int(data['user_skills.skill_id'][event])],
+                SKILL_TYPES[data['user_skills.type'][event]], PROFICIENCY_LEVELS[data['user_skills.level'][event] - 1],
+            )
+        elif kind == REVIEW:
+            user_id = int(data['reviews.reviewee_id'][event])
+            total = reviews.setdefault(user_id, [0.0, 0])
+            total[0] += float(data['reviews.rating'][event])
+            total[1] += 1
+            update_stats(user_id)
+        else:
+            for column in ('trades.requester_id', 'trades.provider_id'):
+                user_id = int(data[column][event])
+                completed[user_id] = completed.get(user_id, 0) + 1
+                update_stats(user_id)
+    return {'start': start, 'end': end, 'queries': len(queries), 'build_seconds': build_seconds,
+            'totals': totals, 'timings': timings}
+
+
+# Worker state for the process pool (inherited through fork)
+_dataset = None
+
+
+def _slice_worker(args):
+    return replay_slice(_dataset, *args)
+
+
+def _averages(totals, queries):
+    return {
+        str(k): dict(zip(('precision', 'recall', 'ndcg', 'hit_rate'), np.round(values / max(queries, 1), 5).tolist()))
+        for k, values in totals.items()
+    }
+
+
+def _timestamp(when):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(when)) if np.isfinite(when) else None
+
+
+def evaluate(data, ks=DEFAULT_K, slices=8, workers=1, horizon_days=HORIZON_DAYS, collaborative=False, related=False):
+    """Replay the dataset and summarise ranking quality and latency."""
+    queries = build_queries(data, horizon_days * DAY)
+    bounds = np.linspace(0, len(queries), slices + 1).astype(int).tolist()
+    tasks = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if lo < hi:
+            end = queries[hi][0] if hi < len(queries) else np.inf
+            tasks.append((queries[lo][0], end, queries[lo:hi], ks, collaborative, related))
+
+    if workers <= 1:
+        results = [replay_slice(data, *task) for task in tasks]
+    else:
+        global _dataset
+        _dataset = data
+        with multiprocessing.get_context('fork').Pool(min(workers, len(tasks) or 1)) as pool:
+            results = pool.map(_slice_worker, tasks, chunksize=1)
+
+    totals = {k: sum(result['totals'][k] for result in results) for k in ks}
+    timings = [timing for result in results for timing in result['timings']]
+    return {
+        'queries': len(queries),
+        'horizon_days': horizon_days,
+        'metrics': _averages(totals, len(queries)),
+        'latency': latency_stats(timings) if timings else None,
+        'slices': [
+            {
+                'start': _timestamp(result['start']), 'end': _timestamp(result['end']),
+                'queries': result['queries'], 'build_seconds': round(result['build_seconds'], 3),
+                'metrics': _averages(result['totals'], result['queries']),
+            }
+            for result in results
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate recommendations by replaying historical trades')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help='write a dataset file from MySQL or a synthetic population')
+    export.add_argument('--output', required=True)
+    export.add_argument('--synthetic', type=int, metavar='USERS', help='generate this many users instead of querying MySQL')
+    export.add_argument('--seed', type=int, default=0)
+    run = commands.add_parser('run', help='replay a dataset file')
+    run.add_argument('dataset')
+    run.add_argument('--k', type=int, nargs='+', default=list(DEFAULT_K))
+    run.add_argument('--slices', type=int, default=8)
+    run.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    run.add_argument('--horizon-days', type=float, default=HORIZON_DAYS)
+    run.add_argument('--collaborative', action='store_true', help='blend trade factors trained at each slice start')
+    run.add_argument('--related', action='store_true', help='expand seeks with the exported related skills')
+    run.add_argument('--output', default='evaluation.json')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    started = time.perf_counter()
+    if args.command == 'export':
+        if args.synthetic:
+            data = synthetic_dataset(args.synthetic, args.seed)
+        else:
+            from db import connect
+            with connect() as conn:
+                data = export_dataset(conn)
+        np.savez_compressed(args.output, **data)
+        logger.info('Wrote %s (%d trades) in %.1fs', args.output, len(data['trades.id']), time.perf_counter() - started)
+        return
+
+    results = evaluate(load_dataset(args.dataset), sorted(set(args.k)), args.slices, args.workers,
+                       args.horizon_days, args.collaborative, args.related)
+    results['seconds'] = round(time.perf_counter() - started, 3)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps({'queries': results['queries'], 'metrics': results['metrics'], 'latency': results['latency']}))
+
+
+if __name__ == '__main__':
+    main()
+'''
+
+with open('ai-service-evaluate.py', 'w') as f:
+    f.write(ai_evaluate)
+
+print("✅ Created AI service offline evaluation harness")
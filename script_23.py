@@ -0,0 +1,168 @@
+# Create the in-memory skill-name autocomplete index
+
+ai_autocomplete = r'''"""Skill-name autocomplete over a sorted prefix array.
+
+``SkillAutocomplete`` normalises every skill name (lower case, single
+spaces) and keeps one sorted key per word start, so "learn" finds both
+"learning design" and "machine learning". A prefix is two bisections into
+that array, and the skills in the range are ranked by popularity: the
+number of user_skills rows holding them, shorter names first on ties.
+
+When fewer than ``limit`` skills start with the query, the rest come from
+a bigram index over the words of each name, scored by the share of the
+query's bigrams a name contains. That absorbs most single typos
+("pyhton", "javscript").
+
+Keys, bigrams and popularity are built from the SkillMatrix and kept
+current by ``add_entry`` as user_skills rows, and the skills they create,
+arrive.
+"""
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+import numpy as np
+
+from matrix import SKILL_TYPES
+
+MIN_SIMILARITY = 0.5
+# Sorts after every character a key can continue with
+PREFIX_END = chr(0x10FFFF)
+# Shared bigrams rank above any popularity below 2**40
+RANK_SHIFT = 40
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def word_keys(name):
+    """The name from each of its word starts on."""
+    words = name.split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+def bigrams(text):
+    grams = set()
+    for word in text.split():
+        padded = ' ' + word
+        grams.update(padded[i:i + 2] for i in range(len(padded) - 1))
+    return grams
+
+
+class SkillAutocomplete:
+    def __init__(self, matrix):
+        self.matrix = m = matrix
+        names = [normalize(name) for name in m.skill_names]
+        self.n_skills = n = len(names)
+
+        self.popularity = np.zeros(n, dtype=np.int64)
+        for plane in (m.offering_by_skill, m.seeking_by_skill):
+            self.popularity[:plane.shape[1]] += np.diff(plane.indptr)
+        for skill_type in SKILL_TYPES:
+            for col, rows in m.delta_by_skill[skill_type].items():
+                self.popularity[col] += len(rows)
+        self.lengths = np.array([len(name) for name in names], dtype=np.int32)
+
+        pairs = sorted((key, col) for col, name in enumerate(names) for key in word_keys(name))
+        self.keys = [key for key, _ in pairs]
+        self.key_cols = np.array([col for _, col in pairs], dtype=np.int32)
+
+        self.gram_ids = {}
+        gram_of, col_of = [], []
+        for col, name in enumerate(names):
+            for gram in bigrams(name):
+                gram_of.append(self.gram_ids.setdefault(gram, len(self.gram_ids)))
+                col_of.append(col)
+        gram_of = np.array(gram_of, dtype=np.int32)
+        self.gram_cols = np.array(col_of, dtype=np.int32)[np.argsort(gram_of, kind='stable')]
+        self.gram_indptr = np.zeros(len(self.gram_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_of, minlength=len(self.gram_ids)), out=self.gram_indptr[1:])
+        # Bigrams of skills added since the build
+        self.extra_grams = defaultdict(list)
+
+    def _grow(self):
+        """Index skills added to the matrix since."""
+        m = self.matrix
+        for col in range(self.n_skills, len(m.skill_names)):
+            name = normalize(m.skill_names[col])
+            for key in word_keys(name):
+                i = bisect_right(self.keys, key)
+                self.keys.insert(i, key)
+                self.key_cols = np.insert(self.key_cols, i, col)
+            for gram in bigrams(name):
+                self.extra_grams[gram].append(col)
+            self.popularity = np.append(self.popularity, 0)
+            self.lengths = np.append(self.lengths, np.int32(len(name)))
+        self.n_skills = len(m.skill_names)
+
+    def add_entry(self, col):
+        """Count a user_skills row just added to the matrix.
+
+        Call with the matrix lock held, after ``SkillMatrix.add_entry``.
+        """
+        self._grow()
+        self.popularity[col] += 1
+
+    def _best(self, cols, limit, shared=None):
+        """The ``limit`` best of ``cols``: most ``shared`` bigrams, most popular, shortest."""
+        rank = self.popularity[cols]
+        if shared is not None:
+            rank = (shared.astype(np.int64) << RANK_SHIFT) + rank
+        if len(cols) > limit:
+            # Only the ranks tied with the limit-th best need the full sort
+            cutoff = np.partition(rank, len(rank) - limit)[len(rank) - limit]
+            keep = rank >= cutoff
+            cols, rank = cols[keep], rank[keep]
+        order = np.lexsort((cols, self.lengths[cols], -rank))
+        return cols[order[:limit]]
+
+    def _prefix(self, query, limit):
+        lo = bisect_left(self.keys, query)
+        hi = bisect_left(self.keys, query + PREFIX_END, lo)
+        cols = np.sort(self.key_cols[lo:hi])
+        # One column per skill matching at several word starts
+        cols = cols[np.diff(cols, prepend=-1) != 0]
+        return self._best(cols, limit)
+
+    def _similar(self, query, limit):
+        grams = bigrams(query)
+        postings = []
+        for gram in grams:
+            gram_id = self.gram_ids.get(gram)
+            if gram_id is not None:
+                postings.append(self.gram_cols[self.gram_indptr[gram_id]:self.gram_indptr[gram_id + 1]])
+            if gram in self.extra_grams:
+                postings.append(np.array(self.extra_grams[gram], dtype=np.int32))
+        if not postings:
+            return np.zeros(0, dtype=np.int32)
+        shared = np.bincount(np.concatenate(postings), minlength=self.n_skills)
+        cols = np.flatnonzero(shared >= MIN_SIMILARITY * len(grams))
+        return self._best(cols, limit, shared[cols])
+
+    def search(self, q, limit=10):
+        """Skills completing ``q``, prefix matches first, then similar names."""
+        query = normalize(q)
+        if not query or limit <= 0:
+            return []
+        m = self.matrix
+        with m.lock:
+            self._grow()
+            cols = self._prefix(query, limit).tolist()
+            if len(cols) < limit:
+                seen = set(cols)
+                cols += [col for col in self._similar(query, limit + len(cols)).tolist() if col not in seen]
+            return [
+                {
+                    'id': int(m.skill_ids[col]),
+                    'name': m.skill_names[col],
+                    'category': m.categories[m.skill_category[col]],
+                    'popularity': int(self.popularity[col]),
+                }
+                for col in cols[:limit]
+            ]
+'''
+
+with open('ai-service-autocomplete.py', 'w') as f:
+    f.write(ai_autocomplete)
+
+print("✅ Created AI service skill-name autocomplete")
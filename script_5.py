@@ -0,0 +1,958 @@
+# Create the Python AI recommendation service (ai-service/)
+
+# 1. Database access
+ai_db = r'''"""MySQL access for the SkillSwap recommendation service."""
+import os
+
+import pymysql
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'user': os.environ.get('DB_USER', 'skillswap_user'),
+    'password': os.environ.get('DB_PASSWORD', 'password'),
+    'database': os.environ.get('DB_NAME', 'skillswap'),
+    'charset': 'utf8mb4',
+}
+
+
+def connect(**overrides):
+    """Open a new connection using the service configuration."""
+    return pymysql.connect(**{**DB_CONFIG, **overrides})
+
+
+def stream(conn, sql, params=None, chunk_size=65536):
+    """Yield result rows without buffering the whole result set client-side."""
+    with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+'''
+
+with open('ai-service-db.py', 'w') as f:
+    f.write(ai_db)
+
+print("✅ Created AI service database module")
+
+# 2. Sparse user x skill matrix
+ai_matrix = r'''"""Precomputed user x skill matrix backing the recommender.
+
+Active ``user_skills`` rows are loaded once into two CSR planes, one for
+skills a user offers and one for skills a user seeks. Cell values hold the
+proficiency level (1 = beginner, 2 = intermediate, 3 = expert) so scoring
+never has to go back to MySQL. Column-major copies of both planes give the
+skill -> users postings used to find candidates.
+
+Rows are streamed from MySQL and converted chunk by chunk into parallel
+NumPy columns, so no per-row Python objects outlive a chunk. The planes
+cost about 10 bytes per user_skills row (int32 index and int8 level, once
+per orientation); names are interned and kept once per user and skill.
+
+Changes arriving after the planes were built (see events.py) are kept in a
+small per-row overlay instead of rebuilding the CSR arrays; new users and
+skills get rows and columns past the end of the base planes.
+"""
+import sys
+import threading
+import time
+from itertools import islice
+
+import numpy as np
+from scipy import sparse
+
+from db import stream
+
+SKILL_TYPES = ('offering', 'seeking')
+PROFICIENCY_LEVELS = ('beginner', 'intermediate', 'expert')
+LEVEL_CODES = {level: code for code, level in enumerate(PROFICIENCY_LEVELS, 1)}
+BUILD_CHUNK = 65536
+
+USERS_SQL = 'SELECT id, username, full_name, latitude, longitude FROM users WHERE is_active = TRUE ORDER BY id'
+
+SKILLS_SQL = 'SELECT id, name, category FROM skills ORDER BY id'
+
+USER_SKILLS_SQL = """
+    SELECT us.user_id, us.skill_id, us.skill_type, us.proficiency_level
+    FROM user_skills us
+    JOIN users u ON us.user_id = u.id
+    WHERE us.is_active = TRUE AND u.is_active = TRUE
+"""
+
+# user_stats is kept current by triggers on reviews and trades
+RATINGS_SQL = 'SELECT user_id, avg_rating FROM user_stats WHERE review_count > 0'
+
+TRADES_SQL = 'SELECT user_id, total_trades FROM user_stats WHERE total_trades > 0'
+
+USER_SQL = 'SELECT id, username, full_name, latitude, longitude FROM users WHERE id = %s'
+
+USER_STATS_SQL = 'SELECT avg_rating, total_trades FROM user_stats WHERE user_id = %(user_id)s'
+
+
+class UserSkillColumns:
+    """Growable parallel arrays of (user row, skill column, type, level)."""
+
+    __slots__ = ('rows', 'cols', 'types', 'levels', 'size')
+
+    def __init__(self, capacity=BUILD_CHUNK):
+        self.rows = np.empty(capacity, dtype=np.int32)
+        self.cols = np.empty(capacity, dtype=np.int32)
+        self.types = np.empty(capacity, dtype=np.int8)
+        self.levels = np.empty(capacity, dtype=np.int8)
+        self.size = 0
+
+    def extend(self, rows, cols, types, levels):
+        end = self.size + len(rows)
+        if end > len(self.rows):
+            capacity = max(end, 2 * len(self.rows))
+            for name in self.__slots__[:4]:
+                column = getattr(self, name)
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                setattr(self, name, grown)
+        self.rows[self.size:end] = rows
+        self.cols[self.size:end] = cols
+        self.types[self.size:end] = types
+        self.levels[self.size:end] = levels
+        self.size = end
+
+    def plane(self, skill_type, shape):
+        """CSR plane of the given type built straight from the columns."""
+        keep = self.types[:self.size] == SKILL_TYPES.index(skill_type)
+        plane = sparse.csr_matrix(
+            (self.levels[:self.size][keep], (self.rows[:self.size][keep], self.cols[:self.size][keep])),
+            shape=shape,
+        )
+        plane.sum_duplicates()
+        return plane
+
+
+def _id_lookup(ids):
+    """Vectorised id -> position lookup; unknown ids map to -1."""
+    order = np.argsort(ids, kind='stable')
+    # Trailing sentinel so searchsorted never points past the end
+    sorted_ids = np.append(ids[order], -1)
+    positions = np.append(order, -1)
+
+    def lookup(values):
+        values = np.asarray(values, dtype=np.int64)
+        found = np.searchsorted(sorted_ids[:-1], values)
+        return np.where(sorted_ids[found] == values, positions[found], -1)
+
+    return lookup
+
+
+class SkillMatrix:
+    """In-memory snapshot of users, skills and their links."""
+
+    def __init__(self, users, skills, user_skills, ratings=(), trades=()):
+        self.built_at = time.time()
+        self.version = f'{int(self.built_at * 1000):x}'
+
+        self.user_ids = np.array([row[0] for row in users], dtype=np.int64)
+        self.usernames = [row[1] for row in users]
+        self.full_names = [row[2] for row in users]
+        # NaN where the location is unknown
+        self.user_lat = np.array([row[3] for row in users], dtype=np.float64)
+        self.user_lon = np.array([row[4] for row in users], dtype=np.float64)
+        self.user_index = {int(user_id): i for i, user_id in enumerate(self.user_ids)}
+
+        self.skill_ids = np.array([row[0] for row in skills], dtype=np.int64)
+        self.skill_names = [sys.intern(row[1]) for row in skills]
+        self.categories, codes = np.unique([row[2] for row in skills], return_inverse=True)
+        self.categories = [sys.intern(category) for category in self.categories.tolist()]
+        self.skill_category = codes.astype(np.int32)
+        self.skill_index = {int(skill_id): i for i, skill_id in enumerate(self.skill_ids)}
+
+        shape = (len(self.user_ids), len(self.skill_ids))
+        user_rows, skill_cols = _id_lookup(self.user_ids), _id_lookup(self.skill_ids)
+        columns = UserSkillColumns()
+        user_skills = iter(user_skills)
+        while True:
+            chunk = list(islice(user_skills, BUILD_CHUNK))
+            if not chunk:
+                break
+            user_ids, skill_ids, types, levels = zip(*chunk)
+            rows, cols = user_rows(user_ids), skill_cols(skill_ids)
+            known = (rows >= 0) & (cols >= 0)
+            columns.extend(
+                rows[known],
+                cols[known],
+                (np.array(types) == 'seeking')[known],
+                np.fromiter((LEVEL_CODES[level] for level in levels), dtype=np.int8, count=len(levels))[known],
+            )
+
+        self.offering = columns.plane('offering', shape)
+        self.seeking = columns.plane('seeking', shape)
+        del columns
+        self.offering_by_skill = self.offering.tocsc()
+        self.seeking_by_skill = self.seeking.tocsc()
+
+        self.user_rating = np.full(shape[0], np.nan)
+        for user_id, rating in ratings:
+            row = self.user_index.get(user_id)
+            if row is not None:
+                self.user_rating[row] = float(rating)
+
+        self.total_trades = np.zeros(shape[0], dtype=np.int32)
+        for user_id, count in trades:
+            row = self.user_index.get(user_id)
+            if row is not None:
+                self.total_trades[row] = count
+
+        # Entries added since the planes were built: skill_type -> row -> {col: level},
+        # and the same entries by skill: skill_type -> col -> [rows]
+        self.delta = {skill_type: {} for skill_type in SKILL_TYPES}
+        self.delta_by_skill = {skill_type: {} for skill_type in SKILL_TYPES}
+        self.lock = threading.RLock()
+
+    @classmethod
+    def load(cls, conn):
+        """Build a matrix from the current database contents."""
+        with conn.cursor() as cursor:
+            tables = {}
+            for name, sql in (('users', USERS_SQL), ('skills', SKILLS_SQL),
+                              ('ratings', RATINGS_SQL), ('trades', TRADES_SQL)):
+                cursor.execute(sql)
+                tables[name] = cursor.fetchall()
+        return cls(user_skills=stream(conn, USER_SKILLS_SQL), **tables)
+
+    @property
+    def shape(self):
+        return len(self.user_ids), len(self.skill_ids)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the four sparse planes."""
+        planes = (self.offering, self.seeking, self.offering_by_skill, self.seeking_by_skill)
+        return sum(p.data.nbytes + p.indices.nbytes + p.indptr.nbytes for p in planes)
+
+    def plane(self, skill_type):
+        return self.offering if skill_type == 'offering' else self.seeking
+
+    def row_skills(self, skill_type, row):
+        """Return the skill columns and levels in one user's row."""
+        cols, levels, _ = self.rows_entries(skill_type, np.array([row]))
+        return cols, levels
+
+    def rows_entries(self, skill_type, rows):
+        """Return (cols, levels, rows) for every entry in the given rows."""
+        plane = self.plane(skill_type)
+        base = rows[rows < plane.shape[0]]
+        # Gather the rows' CSR slices directly; plane[base] costs more in scipy overhead than the copy
+        starts = plane.indptr[base]
+        lengths = plane.indptr[base + 1] - starts
+        index = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        cols, levels, owners = [plane.indices[index]], [plane.data[index]], [np.repeat(base, lengths)]
+        delta = self.delta[skill_type]
+        if delta:
+            for row in rows.tolist():
+                added = delta.get(row)
+                if added:
+                    cols.append(np.fromiter(added.keys(), dtype=np.int32, count=len(added)))
+                    levels.append(np.fromiter(added.values(), dtype=np.int8, count=len(added)))
+                    owners.append(np.full(len(added), row))
+        return np.concatenate(cols), np.concatenate(levels), np.concatenate(owners)
+
+    def skill_rows(self, skill_type, col):
+        """Return the user rows holding one skill column."""
+        plane = self.offering_by_skill if skill_type == 'offering' else self.seeking_by_skill
+        rows = plane.indices[plane.indptr[col]:plane.indptr[col + 1]] if col < plane.shape[1] else plane.indices[:0]
+        added = self.delta_by_skill[skill_type].get(col)
+        if added:
+            rows = np.concatenate([rows, np.array(added, dtype=rows.dtype)])
+        return rows
+
+    def add_user(self, user_id, username, full_name, latitude=None, longitude=None):
+        """Return the row for a user, appending one if the user is new."""
+        row = self.user_index.get(user_id)
+        if row is None:
+            row = len(self.user_ids)
+            self.user_ids = np.append(self.user_ids, user_id)
+            self.usernames.append(username)
+            self.full_names.append(full_name)
+            self.user_lat = np.append(self.user_lat, np.nan if latitude is None else latitude)
+            self.user_lon = np.append(self.user_lon, np.nan if longitude is None else longitude)
+            self.user_rating = np.append(self.user_rating, np.nan)
+            self.total_trades = np.append(self.total_trades, np.int32(0))
+            self.user_index[user_id] = row
+        return row
+
+    def add_skill(self, skill_id, name, category):
+        """Return the column for a skill, appending one if the skill is new."""
+        col = self.skill_index.get(skill_id)
+        if col is None:
+            if category not in self.categories:
+                self.categories.append(sys.intern(category))
+            col = len(self.skill_ids)
+            self.skill_ids = np.append(self.skill_ids, skill_id)
+            self.skill_names.append(sys.intern(name))
+            self.skill_category = np.append(self.skill_category, np.int32(self.categories.index(category)))
+            self.skill_index[skill_id] = col
+        return col
+
+    def add_entry(self, row, col, skill_type, level):
+        """Record a new user_skills row; returns False if it is already known."""
+        plane = self.plane(skill_type)
+        if row < plane.shape[0] and col < plane.shape[1] and plane[row, col]:
+            return False
+        added = self.delta[skill_type].setdefault(row, {})
+        if col in added:
+            return False
+        added[col] = level
+        self.delta_by_skill[skill_type].setdefault(col, []).append(row)
+        return True
+'''
+
+with open('ai-service-matrix.py', 'w') as f:
+    f.write(ai_matrix)
+
+print("✅ Created AI service skill matrix")
+
+# 3. Recommender
+ai_recommender = r'''"""Content-based skill recommendations served from a SkillMatrix.
+
+Scoring mirrors ``SkillRecommender.getRecommendations`` in the Express
+backend: +10 when a candidate offers a skill the user seeks, +8 when they
+seek a skill the user offers, +3 for any other skill in one of the user's
+categories, then rating x 2, min(trades x 0.5, 10) and a proficiency bonus.
+Each candidate user is represented by their best scoring skill.
+
+Skills in other categories match through ``CategoryStats`` (categories.py):
+CATEGORY_SCORE x the share of offerers of the user's offered categories
+who also seek that category, when the share is at least MIN_AFFINITY. Like
+the flat category weight it is the same for every entry of a category.
+
+Every match kind adds a constant weight to a per-entry score that does not
+depend on the requesting user, so postings are pre-sorted by that score
+(per skill for exact matches, per category for category matches). The top
+``limit + 1`` users of each relevant list are guaranteed to contain the
+final top ``limit``, which keeps a request independent of population size.
+Users whose entries changed since the lists were sorted are tracked in a
+per-list overlay, and users whose score dropped widen every head by one.
+The candidates' entries are then scored as arrays, reduced to each user's
+best entry without sorting, and only the top ``limit`` users are ordered.
+
+With ``TradeFactors`` (collaborative.py) every matched entry also gets
+COLLABORATIVE_WEIGHT x the user's predicted preference for its skill. That
+is constant along an exact-match list, so those heads still suffice, but
+varies within a category list: once the heads are scored, each category
+list is read further down to every entry that could still reach the k-th
+best total given the highest preference in that category. Postings keep
+their sort scores for this. Users without factors are scored as before.
+
+With ``RelatedSkills`` (related.py) an offered skill that is related to one
+the user seeks matches with RELATED_SCORE x their similarity, unless a
+category or exact match weighs more. The weight is the same for every
+offer of that skill, so its list is read like an exact-match list.
+
+Location options use the GeoGrid over users' coordinates. ``within_km``
+replaces the postings with every user inside the radius; ``boost_km`` adds
+the users inside it to the candidates and PROXIMITY_SCORE to their
+entries, so scores of everyone else are unchanged and the heads still
+suffice for them.
+"""
+import heapq
+from collections import defaultdict
+
+import numpy as np
+
+from categories import CategoryStats
+from geo import GeoGrid, haversine_km
+from matrix import PROFICIENCY_LEVELS, SKILL_TYPES
+
+EXACT_OFFER_SCORE = 10
+EXACT_SEEK_SCORE = 8
+CATEGORY_SCORE = 3
+# Cross-category matches below this share of co-occurring users are noise
+MIN_AFFINITY = 0.05
+RATING_WEIGHT = 2
+TRADE_WEIGHT = 0.5
+MAX_TRADE_BONUS = 10
+PROXIMITY_SCORE = 5
+RELATED_SCORE = 6
+COLLABORATIVE_WEIGHT = 4
+# Covers float32 rounding of the stored posting scores
+SCORE_MARGIN = 1e-3
+
+
+class RankedPostings:
+    """CSR-style lists of user rows, each sorted by descending entry score.
+
+    ``extra`` holds current scores for users whose entries changed after the
+    lists were built (key -> {row: score}); they are merged in by ``head``.
+    """
+
+    def __init__(self, keys, rows, scores, user_ids, n_keys):
+        order = np.lexsort((user_ids[rows], -scores, keys))
+        self.rows = rows[order]
+        self.scores = scores[order].astype(np.float32)
+        self.indptr = np.zeros(n_keys + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=n_keys), out=self.indptr[1:])
+        self.extra = defaultdict(dict)
+
+    def head(self, key, k, slack=0):
+        rows = self.rows[0:0]
+        if key < len(self.indptr) - 1:
+            start = self.indptr[key]
+            rows = self.rows[start:min(start + k + slack, self.indptr[key + 1])]
+        extra = self.extra.get(key)
+        if extra:
+            top = heapq.nlargest(k, extra.items(), key=lambda item: (item[1], -item[0]))
+            rows = np.concatenate([rows, [row for row, _ in top]]).astype(self.rows.dtype)
+        return rows
+
+    def above(self, key, threshold):
+        """Every row of a list whose score may be ``threshold`` or more."""
+        rows = self.rows[0:0]
+        if key < len(self.indptr) - 1:
+            start, end = self.indptr[key], self.indptr[key + 1]
+            count = np.searchsorted(-self.scores[start:end], SCORE_MARGIN - threshold, side='right')
+            rows = self.rows[start:start + count]
+        extra = self.extra.get(key)
+        if extra:
+            rows = np.concatenate([rows, [row for row, score in extra.items() if score >= threshold]])
+        return rows.astype(self.rows.dtype)
+
+
+def top_k(scores, ids, k):
+    """Positions of the ``k`` highest scores, ties broken by ascending id, in rank order.
+
+    Only entries tied with or above the k-th best score are sorted.
+    """
+    if len(scores) > k:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        pick = np.flatnonzero(scores >= kth)
+    else:
+        pick = np.arange(len(scores))
+    return pick[np.lexsort((ids[pick], -scores[pick]))[:k]]
+
+
+def bonus_scores(rating, trades):
+    """Per-user part of the score: rating x 2 plus min(trades x 0.5, 10)."""
+    return np.nan_to_num(rating) * RATING_WEIGHT + np.minimum(trades * TRADE_WEIGHT, MAX_TRADE_BONUS)
+
+
+class SkillRecommender:
+    def __init__(self, matrix, factors=None, related=None):
+        self.matrix = m = matrix
+        # TradeFactors blended into the score and RelatedSkills expanding seeks, if any
+        self.factors = factors
+        self.related = related
+        self.user_bonus = bonus_scores(m.user_rating, m.total_trades)
+        self.base_bonus = self.user_bonus.copy()
+        # Users scored lower now than when the postings were sorted
+        self.demoted = set()
+        self.offer_postings = self._rank_plane(m.offering_by_skill)
+        self.seek_postings = self._rank_plane(m.seeking_by_skill)
+        self.category_postings = self._rank_categories()
+        # Users added after the build join the grid on the next reload
+        self.grid = GeoGrid(m.user_lat, m.user_lon)
+        self.categories = CategoryStats(m)
+
+    def _entry_scores(self, rows, levels):
+        return (levels - 1) + self.user_bonus[rows]
+
+    def _rank_plane(self, plane_by_skill):
+        keys = np.repeat(np.arange(plane_by_skill.shape[1]), np.diff(plane_by_skill.indptr))
+        rows = plane_by_skill.indices
+        scores = self._entry_scores(rows, plane_by_skill.data)
+        return RankedPostings(keys, rows, scores, self.matrix.user_ids, plane_by_skill.shape[1])
+
+    def _rank_categories(self):
+        m = self.matrix
+        rows, cols, levels = [], [], []
+        for plane in (m.offering, m.seeking):
+            coo = plane.tocoo()
+            rows.append(coo.row)
+            cols.append(coo.col)
+            levels.append(coo.data)
+        rows = np.concatenate(rows)
+        keys = m.skill_category[np.concatenate(cols)]
+        scores = self._entry_scores(rows, np.concatenate(levels))
+
+        # Keep each user's best entry per category
+        order = np.lexsort((-scores, rows, keys))
+        keys, rows, scores = keys[order], rows[order], scores[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+        return RankedPostings(keys[first], rows[first], scores[first], m.user_ids, len(m.categories))
+
+    def refresh_user(self, row):
+        """Re-score one user's postings after their skills or stats changed.
+
+        Call with the matrix lock held, after updating the matrix.
+        """
+        m = self.matrix
+        if row >= len(self.user_bonus):
+            self.user_bonus = np.resize(self.user_bonus, len(m.user_ids))
+        self.user_bonus[row] = bonus_scores(m.user_rating[row], m.total_trades[row])
+        if row < len(self.base_bonus) and self.user_bonus[row] < self.base_bonus[row]:
+            self.demoted.add(row)
+        else:
+            self.demoted.discard(row)
+
+        best_by_category = {}
+        for skill_type, postings in (('offering', self.offer_postings), ('seeking', self.seek_postings)):
+            cols, levels = m.row_skills(skill_type, row)
+            for col, score in zip(cols.tolist(), self._entry_scores(row, levels).tolist()):
+                postings.extra[col][row] = score
+                category = int(m.skill_category[col])
+                best_by_category[category] = max(best_by_category.get(category, score), score)
+        for category, score in best_by_category.items():
+            self.category_postings.extra[category][row] = score
+
+    def get_recommendations(self, user_id, limit=5, within_km=None, boost_km=None):
+        m = self.matrix
+        with m.lock:
+            row = m.user_index.get(int(user_id))
+            if row is None or limit <= 0:
+                return []
+
+            offered, _ = m.row_skills('offering', row)
+            sought, _ = m.row_skills('seeking', row)
+            category_weights = self._category_weights(offered, sought)
+            preference = self._preference(row)
+
+            # Match weight of every skill column, as an offer and as a seek
+            seek_weights = category_weights[m.skill_category]
+            offer_weights = seek_weights.copy()
+            expanded = self._expand(sought, offer_weights)
+            offer_weights[sought] = EXACT_OFFER_SCORE
+            seek_weights[offered] = EXACT_SEEK_SCORE
+
+            # Candidates: head of every list this user can match through
+            lat, lon = m.user_lat[row], m.user_lon[row]
+            if within_km is not None:
+                heads = [self.grid.within(lat, lon, within_km)[0]]
+            else:
+                k = limit + 1
+                slack = len(self.demoted)
+                heads = [self.offer_postings.head(col, k, slack) for col in np.concatenate([sought, expanded])]
+                heads += [self.seek_postings.head(col, k, slack) for col in offered]
+                heads += [self.category_postings.head(cat, k, slack) for cat in np.flatnonzero(category_weights)]
+            nearby = self.grid.within(lat, lon, boost_km)[0] if boost_km else None
+            if nearby is not None:
+                heads.append(nearby)
+            if not heads:
+                return []
+            candidates = np.unique(np.concatenate(heads))
+            candidates = candidates[candidates != row]
+            if len(candidates) == 0:
+                return []
+
+            match = (offer_weights, seek_weights, preference, nearby)
+            entries, totals, best = self._score(candidates, *match)
+            if preference is not None and within_km is None:
+                deeper = np.setdiff1d(self._category_tails(category_weights, preference, totals, limit),
+                                      np.append(candidates, row))
+                if len(deeper):
+                    candidates = np.union1d(candidates, deeper)
+                    entries, totals, best = self._score(candidates, *match)
+
+            users, skills, levels, types, scores = entries
+            scored = np.flatnonzero(best < len(scores))
+            ranked = scored[top_k(totals[scored], m.user_ids[candidates[scored]], limit)]
+            rows = candidates[ranked]
+            distances = haversine_km(lat, lon, m.user_lat[rows], m.user_lon[rows])
+            return [
+                self._format(best[i], users, skills, levels, types, totals[i], distance)
+                for i, distance in zip(ranked, distances)
+            ]
+
+    def _category_weights(self, offered, sought):
+        """Match weight of each category: flat for the user's own, by affinity for the rest."""
+        m = self.matrix
+        weights = CATEGORY_SCORE * self.categories.affinity(np.unique(m.skill_category[offered]))
+        weights[weights < CATEGORY_SCORE * MIN_AFFINITY] = 0
+        weights[m.skill_category[np.concatenate([offered, sought])]] = CATEGORY_SCORE
+        return weights
+
+    def _preference(self, row):
+        """Collaborative term per skill column for a user, or None without factors."""
+        if self.factors is None:
+            return None
+        predicted = self.factors.preferences(row, len(self.matrix.skill_ids))
+        return None if predicted is None else COLLABORATIVE_WEIGHT * predicted
+
+    def _expand(self, sought, offer_weights):
+        """Raise the offer weights of skills related to sought ones; returns their columns."""
+        if self.related is None or len(sought) == 0:
+            return sought[:0]
+        expanded = []
+        for col in sought.tolist():
+            cols, similarities = self.related.related(col)
+            offer_weights[cols] = np.maximum(offer_weights[cols], RELATED_SCORE * similarities)
+            expanded.append(cols)
+        return np.setdiff1d(np.concatenate(expanded), sought).astype(sought.dtype)
+
+    def _score(self, candidates, offer_weights, seek_weights, preference, nearby):
+        """Score the candidates' matching entries.
+
+        Returns the entry columns, each candidate's best total (-inf if
+        nothing matched) and the first entry reaching it.
+        """
+        users, skills, levels, types, scores = (
+            np.concatenate(parts) for parts in zip(
+                self._score_rows('offering', candidates, offer_weights, 0),
+                self._score_rows('seeking', candidates, seek_weights, 1),
+            )
+        )
+        if preference is not None:
+            scores = scores + preference[skills]
+        if nearby is not None and len(nearby):
+            scores = scores + np.where(np.isin(users, nearby), PROXIMITY_SCORE, 0)
+
+        # Best score per candidate user, then the first entry reaching it
+        slot = np.searchsorted(candidates, users)
+        totals = np.full(len(candidates), -np.inf)
+        np.maximum.at(totals, slot, scores)
+        reached = np.flatnonzero(scores == totals[slot])
+        best = np.full(len(candidates), len(scores))
+        np.minimum.at(best, slot[reached], reached)
+        return (users, skills, levels, types, scores), totals, best
+
+    def _category_tails(self, category_weights, preference, totals, limit):
+        """Category-list rows past the heads that could still reach the top ``limit``."""
+        reached = totals[totals > -np.inf]
+        if len(reached) < limit:
+            # The heads already held every row of every list
+            return self.category_postings.rows[0:0]
+        kth = np.partition(reached, len(reached) - limit)[len(reached) - limit]
+        m = self.matrix
+        ceiling = np.zeros(len(m.categories))
+        np.maximum.at(ceiling, m.skill_category, preference)
+        return np.concatenate([
+            self.category_postings.above(category, kth - category_weights[category] - ceiling[category])
+            for category in np.flatnonzero(category_weights)
+        ])
+
+    def _score_rows(self, skill_type, candidates, weights, type_code):
+        skills, levels, users = self.matrix.rows_entries(skill_type, candidates)
+        weight = weights[skills]
+        keep = weight > 0
+        users, skills, levels = users[keep], skills[keep], levels[keep]
+        scores = weight[keep] + self._entry_scores(users, levels)
+        types = np.full(len(users), type_code, dtype=np.int8)
+        return users, skills, levels, types, scores
+
+    def _format(self, entry, users, skills, levels, types, score, distance):
+        m = self.matrix
+        row = users[entry]
+        col = skills[entry]
+        rating = m.user_rating[row]
+        return {
+            'user_id': int(m.user_ids[row]),
+            'username': m.usernames[row],
+            'full_name': m.full_names[row],
+            'skill_id': int(m.skill_ids[col]),
+            'skill_name': m.skill_names[col],
+            'category': m.categories[m.skill_category[col]],
+            'skill_type': SKILL_TYPES[types[entry]],
+            'proficiency_level': PROFICIENCY_LEVELS[levels[entry] - 1],
+            'user_rating': None if np.isnan(rating) else float(rating),
+            'total_trades': int(m.total_trades[row]),
+            'score': float(score),
+            'distance_km': None if np.isnan(distance) else round(float(distance), 1),
+        }
+'''
+
+with open('ai-service-recommender.py', 'w') as f:
+    f.write(ai_recommender)
+
+print("✅ Created AI service recommender")
+
+# 4. Flask application
+ai_app = r'''"""HTTP entry point for the SkillSwap AI recommendation service."""
+import logging
+import os
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request
+
+from batch import recommend_batch
+from db import connect
+from events import ChangeFeed
+from geo import MAX_RADIUS_KM
+from minhash import MinHashLSH
+from model import RecommenderModel
+from snapshot import (
+    SnapshotError, builder_lock, current_snapshot, open_snapshot, snapshot_built_at, write_snapshot,
+)
+
+REFRESH_INTERVAL = int(os.environ.get('MODEL_REFRESH_INTERVAL', 300))
+LSH_MIN_USERS = int(os.environ.get('LSH_MIN_USERS', 100000))
+LSH_BANDS = int(os.environ.get('LSH_BANDS', 64))
+LSH_ROWS = int(os.environ.get('LSH_ROWS', 2))
+ALS_FACTORS = int(os.environ.get('ALS_FACTORS', 32))
+ALS_ITERATIONS = int(os.environ.get('ALS_ITERATIONS', 10))
+ALS_WORKERS = int(os.environ.get('ALS_WORKERS', os.cpu_count()))
+# Directory of model snapshots shared by the workers on a host; unset to
+# build each worker's model from MySQL
+MODEL_PATH = os.environ.get('MODEL_PATH')
+SNAPSHOT_VERIFY = os.environ.get('SNAPSHOT_VERIFY', '1') != '0'
+MAX_LIMIT = 100
+MAX_BATCH_USERS = 10000
+
+logger = logging.getLogger('ai-recommender')
+
+_feed = ChangeFeed()
+
+
+def _build_model():
+    with connect() as conn:
+        return RecommenderModel.load(
+            conn, lsh_min_users=LSH_MIN_USERS, lsh_bands=LSH_BANDS, lsh_rows=LSH_ROWS,
+            factor_options={'factors': ALS_FACTORS, 'iterations': ALS_ITERATIONS, 'workers': ALS_WORKERS},
+        )
+
+
+def _replayable(path):
+    """True if the change events since ``path`` was built can be replayed onto it."""
+    if path is None:
+        return False
+    try:
+        return _feed.covers(snapshot_built_at(path))
+    except SnapshotError:
+        # Written by a release with another snapshot format
+        return False
+
+
+def _snapshot_stale(path):
+    return not _replayable(path) or time.time() - snapshot_built_at(path) >= REFRESH_INTERVAL
+
+
+def _load_snapshot():
+    """Map the current snapshot, building a new one first if it is stale.
+
+    Only the worker holding the builder lock queries MySQL; the others keep
+    serving the snapshot they have while it writes a new one. A worker with
+    no model yet waits for it too if the events since the current snapshot
+    can no longer be replayed.
+    """
+    os.makedirs(MODEL_PATH, exist_ok=True)
+    path = current_snapshot(MODEL_PATH)
+    if _snapshot_stale(path):
+        wait = _feed.model is None and not _replayable(path)
+        with builder_lock(MODEL_PATH, wait=wait) as acquired:
+            if acquired and _snapshot_stale(current_snapshot(MODEL_PATH)):
+                started = time.time()
+                write_snapshot(_build_model(), MODEL_PATH, built_at=started)
+        path = current_snapshot(MODEL_PATH)
+    current = _feed.model
+    if current is not None and current.snapshot is not None and current.snapshot.path == path:
+        return current
+    if current is not None and not _replayable(path):
+        # Missing events; keep the live model until a new snapshot is written
+        return current
+    return open_snapshot(path, verify=SNAPSHOT_VERIFY)
+
+
+def load_model():
+    """Load the model from a snapshot or MySQL and swap it in.
+
+    Change events published after its data was read are replayed onto it
+    before the swap, so no update is lost between reloads.
+    """
+    if MODEL_PATH:
+        model = _load_snapshot()
+        if model is _feed.model:
+            return model
+        since = model.snapshot.built_at
+    else:
+        since = time.time()
+        model = _build_model()
+    _feed.install(model, since=since)
+    logger.info('Loaded model %s (%d users x %d skills)', model.version, *model.matrix.shape)
+    return model
+
+
+def _as_int(value):
+    """A JSON integer, or a string holding one, as an int; None for anything else."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(REFRESH_INTERVAL)
+        try:
+            load_model()
+        except Exception:
+            logger.exception('Model refresh failed')
+
+
+def create_app():
+    logging.basicConfig(level=logging.INFO)
+    app = Flask(__name__)
+
+    @app.get('/health')
+    def health():
+        model = _feed.model
+        if model is None:
+            return jsonify({'status': 'LOADING'}), 503
+        users, skills = model.matrix.shape
+        return jsonify({
+            'status': 'OK',
+            'model_version': model.version,
+            'users': users,
+            'skills': skills,
+            'applied_events': model.applied_events,
+            'snapshot_age_seconds': round(model.snapshot.age, 1) if model.snapshot else None,
+        })
+
+    @app.get('/recommendations/<int:user_id>')
+    def recommendations(user_id):
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        limit = min(request.args.get('limit', 5, type=int), MAX_LIMIT)
+        within_km = request.args.get('within_km', type=float)
+        boost_km = request.args.get('boost_km', type=float)
+        for radius in (within_km, boost_km):
+            if radius is not None and not 0 < radius <= MAX_RADIUS_KM:
+                return jsonify({'error': f'Radius must be between 0 and {MAX_RADIUS_KM} km'}), 400
+        return jsonify({
+            'recommendations': model.recommender.get_recommendations(user_id, limit, within_km, boost_km),
+            'model_version': model.version,
+        })
+
+    @app.post('/recommendations/batch')
+    def recommendations_batch():
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        body = request.get_json(silent=True) or {}
+        user_ids = body.get('user_ids')
+        if not isinstance(user_ids, list) or len(user_ids) > MAX_BATCH_USERS:
+            return jsonify({'error': f'user_ids must be a list of at most {MAX_BATCH_USERS} ids'}), 400
+        limit = _as_int(body.get('limit', 5))
+        if limit is None:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, MAX_LIMIT))
+        # Parse every id up front: once streaming starts the 200 has been sent
+        parsed = [_as_int(user_id) for user_id in user_ids]
+        if None in parsed:
+            bad = user_ids[parsed.index(None)]
+            return jsonify({'error': f'user_ids must be integers, got {bad!r}'}), 400
+        lines = recommend_batch(model.recommender, parsed, limit)
+        return Response((line + '\n' for line in lines), mimetype='application/x-ndjson')
+
+    @app.get('/matches/<int:user_id>')
+    def matches(user_id):
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        limit = request.args.get('limit', type=int)
+        return jsonify({'matches': model.reciprocal.reciprocal_matches(user_id, limit)})
+
+    @app.get('/trending')
+    def trending():
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        limit = min(request.args.get('limit', 10, type=int), MAX_LIMIT)
+        return jsonify({'trending': model.trending.top(limit)})
+
+    @app.get('/categories')
+    def categories():
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        return jsonify({'categories': model.recommender.categories.summary(), 'model_version': model.version})
+
+    @app.get('/autocomplete')
+    def autocomplete():
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        limit = min(request.args.get('limit', 10, type=int), MAX_LIMIT)
+        return jsonify({'skills': model.autocomplete.search(request.args.get('q', ''), limit)})
+
+    @app.get('/similar/<int:user_id>')
+    def similar(user_id):
+        model = _feed.model
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        limit = min(request.args.get('limit', 10, type=int), MAX_LIMIT)
+        index = model.lsh
+        if index is None or request.args.get('exact', type=int):
+            index = model.bitsets
+        return jsonify({
+            'similar': [
+                {'user_id': other_id, 'similarity': similarity}
+                for other_id, similarity in index.similar_users(user_id, limit)
+            ],
+            'approximate': isinstance(index, MinHashLSH),
+            'model_version': model.version,
+        })
+
+    # Subscribe first, so events published while the model loads are replayed
+    _feed.start()
+    load_model()
+    threading.Thread(target=_refresh_loop, daemon=True).start()
+    return app
+
+
+if __name__ == '__main__':
+    create_app().run(host='0.0.0.0', port=int(os.environ.get('PORT', 9000)))
+'''
+
+with open('ai-service-app.py', 'w') as f:
+    f.write(ai_app)
+
+print("✅ Created AI service Flask app")
+
+# 5. Requirements and Dockerfile
+ai_requirements = '''flask==3.0.3
+gunicorn==22.0.0
+numpy==2.0.2
+scipy==1.14.1
+PyMySQL==1.1.1
+redis==5.0.8
+'''
+
+with open('ai-service-requirements.txt', 'w') as f:
+    f.write(ai_requirements)
+
+ai_dockerfile = '''# Use Python official image
+FROM python:3.11-slim
+
+# Set working directory
+WORKDIR /app
+
+# Install dependencies
+COPY requirements.txt ./
+RUN pip install --no-cache-dir -r requirements.txt
+
+# Copy source code
+COPY . .
+
+# Create model directory
+RUN mkdir -p models
+
+# Expose port
+EXPOSE 9000
+
+# Health check
+HEALTHCHECK --interval=30s --timeout=3s --start-period=30s --retries=3 CMD python -c "import urllib.request; urllib.request.urlopen('http://localhost:9000/health')" || exit 1
+
+# Start the service
+CMD ["gunicorn", "--workers", "2", "--bind", "0.0.0.0:9000", "app:create_app()"]
+'''
+
+with open('ai-service-Dockerfile', 'w') as f:
+    f.write(ai_dockerfile)
+
+print("✅ Created AI service requirements and Dockerfile")
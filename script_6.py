@@ -0,0 +1,203 @@
+# Create the batched skill-set similarity engine for the AI service
+
+ai_similarity = r'''"""Batched Jaccard similarity between users' skill sets.
+
+Vectorised counterpart of ``SkillRecommender.calculateSimilarity`` in the
+Express backend. Each user's skill set is packed into a row of 64-bit words
+so one user is compared against everyone with a single AND + popcount over
+the bitset matrix. The all-pairs pass works in blocks of rows and only
+visits pairs that share at least one skill: intersection counts come from a
+sparse block product, set sizes from the bitset popcounts.
+
+Run as a script to refresh the ``user_similarities`` table:
+
+    python similarity.py --top 20 --workers 8
+"""
+import argparse
+import logging
+import multiprocessing
+import time
+
+import numpy as np
+
+from db import connect
+from matrix import SkillMatrix
+
+PLANES = ('all', 'offering', 'seeking')
+ROW_CHUNK = 65536
+PACK_CHUNK = 8192
+
+logger = logging.getLogger('similarity')
+
+
+def skill_sets(matrix, plane='all'):
+    """Binary user x skill CSR matrix for the requested plane."""
+    if plane == 'offering':
+        sets = matrix.offering
+    elif plane == 'seeking':
+        sets = matrix.seeking
+    else:
+        sets = matrix.offering + matrix.seeking
+    sets = sets.astype(bool).astype(np.int32)
+    sets.sort_indices()
+    return sets
+
+
+class SkillBitsets:
+    """Packed per-user skill bitsets with popcount-based Jaccard queries."""
+
+    def __init__(self, matrix, plane='all'):
+        self.matrix = matrix
+        self.sets = skill_sets(matrix, plane)
+        self.sets_t = self.sets.T.tocsr()
+        n_users, n_skills = self.sets.shape
+        self.words = max(1, (n_skills + 63) // 64)
+
+        self.bits = np.zeros((n_users, self.words), dtype=np.uint64)
+        packed = self.bits.view(np.uint8)
+        for start in range(0, n_users, PACK_CHUNK):
+            dense = self.sets[start:start + PACK_CHUNK].toarray().astype(bool)
+            chunk = np.packbits(dense, axis=1, bitorder='little')
+            packed[start:start + len(chunk), :chunk.shape[1]] = chunk
+        self.sizes = np.bitwise_count(self.bits).sum(axis=1, dtype=np.int32)
+
+    def one_vs_all(self, row):
+        """Jaccard similarity of one user row against every row."""
+        query = self.bits[row]
+        inter = np.empty(len(self.bits), dtype=np.int32)
+        for start in range(0, len(self.bits), ROW_CHUNK):
+            block = self.bits[start:start + ROW_CHUNK]
+            np.bitwise_count(block & query).sum(axis=1, dtype=np.int32, out=inter[start:start + len(block)])
+        union = self.sizes + self.sizes[row] - inter
+        return np.divide(inter, union, out=np.zeros(len(union)), where=union > 0)
+
+    def similar_users(self, user_id, limit=10):
+        """Top ``limit`` most similar users as (user_id, similarity) pairs."""
+        row = self.matrix.user_index.get(int(user_id))
+        if row is None or row >= len(self.bits):
+            return []
+        similarity = self.one_vs_all(row)
+        similarity[row] = 0
+        limit = min(limit, len(similarity))
+        if limit <= 0:
+            return []
+        kth = -np.partition(-similarity, limit - 1)[limit - 1]
+        top = np.flatnonzero((similarity >= kth) & (similarity > 0))
+        top = top[np.lexsort((top, -similarity[top]))][:limit]
+        return [(int(self.matrix.user_ids[i]), float(similarity[i])) for i in top]
+
+    def block_top_k(self, start, end, k):
+        """Top-k neighbours for rows ``start:end`` over the whole population.
+
+        Returns parallel arrays (rows, neighbours, similarities) sorted by row
+        and then by descending similarity.
+        """
+        inter = self.sets[start:end] @ self.sets_t
+        inter.sort_indices()
+        rows = np.repeat(np.arange(start, end), np.diff(inter.indptr))
+        keep = rows != inter.indices
+        rows, cols, counts = rows[keep], inter.indices[keep], inter.data[keep]
+        similarity = counts / (self.sizes[rows] + self.sizes[cols] - counts)
+
+        # Similarities lie in (0, 1], so this key orders by row, then by
+        # descending similarity; the stable sort keeps ties in column order.
+        order = np.argsort(rows + (1 - similarity) / 2, kind='stable')
+        rows, cols, similarity = rows[order], cols[order], similarity[order]
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+        keep = rank < k
+        return rows[keep], cols[keep], similarity[keep]
+
+
+# Worker state for the all-pairs pass (inherited through fork)
+_bitsets = None
+
+
+def _block_worker(args):
+    start, end, k = args
+    return (start, end, *_bitsets.block_top_k(start, end, k))
+
+
+def all_pairs_top_k(bitsets, k=20, block_size=1024, workers=1):
+    """Yield (start, end, rows, cols, similarity) for every block of user rows."""
+    global _bitsets
+    _bitsets = bitsets
+    n_users = len(bitsets.bits)
+    tasks = [(start, min(start + block_size, n_users), k) for start in range(0, n_users, block_size)]
+    if workers <= 1:
+        yield from map(_block_worker, tasks)
+        return
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        yield from pool.imap(_block_worker, tasks)
+
+
+def write_similarities(conn, matrix, blocks):
+    """Replace ``user_similarities`` rows block by block.
+
+    A block replaces the rows of every user id from its first user up to
+    the next block's first user, so users left without neighbours, and
+    ids no longer in the matrix, lose their old lists too. Needs
+    ``matrix.user_ids`` ascending, as ``SkillMatrix.load`` reads them.
+    """
+    n_users = len(matrix.user_ids)
+    written = 0
+    with conn.cursor() as cursor:
+        if n_users == 0:
+            cursor.execute('DELETE FROM user_similarities')
+            conn.commit()
+        for start, end, rows, cols, similarity in blocks:
+            # The first block also takes the ids below it, the last those above
+            bounds, params = [], []
+            if start > 0:
+                bounds.append('user_id >= %s')
+                params.append(int(matrix.user_ids[start]))
+            if end < n_users:
+                bounds.append('user_id < %s')
+                params.append(int(matrix.user_ids[end]))
+            sql = 'DELETE FROM user_similarities'
+            if bounds:
+                sql += ' WHERE ' + ' AND '.join(bounds)
+            cursor.execute(sql, params)
+            cursor.executemany(
+                'INSERT INTO user_similarities (user_id, similar_user_id, similarity) VALUES (%s, %s, %s)',
+                list(zip(matrix.user_ids[rows].tolist(), matrix.user_ids[cols].tolist(), np.round(similarity, 4).tolist())),
+            )
+            conn.commit()
+            written += len(rows)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh precomputed "people like you" lists')
+    parser.add_argument('--top', type=int, default=20, help='neighbours stored per user')
+    parser.add_argument('--block-size', type=int, default=1024, help='users per all-pairs block')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--plane', choices=PLANES, default='all')
+    parser.add_argument('--dry-run', action='store_true', help='compute without writing')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    started = time.perf_counter()
+    with connect() as conn:
+        matrix = SkillMatrix.load(conn)
+        bitsets = SkillBitsets(matrix, args.plane)
+        logger.info('Loaded %d users x %d skills in %.1fs', *matrix.shape, time.perf_counter() - started)
+
+        blocks = all_pairs_top_k(bitsets, args.top, args.block_size, args.workers)
+        if args.dry_run:
+            written = sum(len(rows) for _, _, rows, _, _ in blocks)
+        else:
+            written = write_similarities(conn, matrix, blocks)
+
+    elapsed = time.perf_counter() - started
+    logger.info('Computed %d neighbour rows for %d users in %.1fs', written, matrix.shape[0], elapsed)
+
+
+if __name__ == '__main__':
+    main()
+'''
+
+with open('ai-service-similarity.py', 'w') as f:
+    f.write(ai_similarity)
+
+print("✅ Created AI service similarity engine")